@@ -0,0 +1 @@
+# Local stand-in servers and benchmarks (not used by the bot at runtime)
@@ -0,0 +1,429 @@
+"""End-to-end benchmark of every bot command against local stand-ins.
+
+Builds the bot the way run_bot() does (InstrumentedBot, registry handlers,
+dispatch pools, outbox) but points it at bench/fake_telegram.py, and stubs
+everything else a command touches:
+
+- Gemini: bench/fake_gemini.py
+- qBittorrent WebUI and plain HTTP downloads: a small in-process server
+- aria2c, git, sudo, doas, systemctl, zerotier-cli: shell scripts on PATH
+- user.csv: a temporary file with the bench user as owner and superuser
+
+Each command is sent from its own chat, so every recorded Bot API call can be
+attributed to the command that caused it. A round pushes every command once
+and waits until the dispatcher and outbox are idle and no API call arrived
+for --settle seconds; the first round is a warm-up and is not counted.
+
+    python -m bench.commands --rounds 10
+    python -m bench.commands --latency 0.05 --flood-rate 0.02 --json after.json --compare before.json
+    python -m bench.commands --only ai,bash,start
+
+The outbox runs without per-chat and group intervals, and the Gemini rate
+limit is lifted, unless OUTBOX_* / GEMINI_RATE_PER_MIN are set in the
+environment. /shutdown exits the process and /memprofile slows every
+other handler down, so both only run when named in --only.
+"""
+import argparse
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.fake_gemini import FakeGemini
+from bench.fake_telegram import FakeTelegram
+
+BENCH_USER = 4242
+TOKEN = '123456:bench'
+MAGNET = 'magnet:?xt=urn:btih:0123456789abcdef0123456789abcdef01234567&dn=bench'
+
+# (name, update) per scenario; "/x" is a command, "cb:x" a /start button press.
+# {files} and {web} are filled in with the temp dir and the stub HTTP server.
+SCENARIOS = [
+    ('start', '/start'),
+    ('start_callback', 'cb:help'),
+    ('help', '/help'),
+    ('text', 'halo'),
+    ('bash', '/bash echo bench && ls {files}'),
+    ('sudo', '/sudo ls /'),
+    ('jobs', '/jobs'),
+    ('output', '/output 1'),
+    ('kill', '/kill 1'),
+    ('download', '/download {web}/files/bench.bin'),
+    ('downloads', '/downloads {web}/files/aria.bin'),
+    ('download_status', '/download_status'),
+    ('uploads', '/uploads {files}/sample.bin'),
+    ('kirim', '/kirim'),
+    ('torrent', '/torrent ' + MAGNET),
+    ('torrent_status', '/torrent_status'),
+    ('zero_tier_status', '/zero_tier_status'),
+    ('git_info', '/git_info'),
+    ('ai', '/ai halo onee-san'),
+    ('ai_api', '/ai_api bench-key'),
+    ('ai_reset', '/ai_reset'),
+    ('ai_status', '/ai_status'),
+    ('jadwal', '/jadwal'),
+    ('upload_jadwal', '/upload_jadwal'),
+    ('reminder_on', '/reminder_on'),
+    ('reminder_off', '/reminder_off'),
+    ('update', '/update'),
+    ('metrics', '/metrics'),
+    ('profile', '/profile 1'),
+    ('memprofile', '/memprofile 1'),
+    ('shutdown', '/shutdown'),
+]
+OPT_IN = ('memprofile', 'shutdown')
+# /update only runs in the owner's private chat; everything else gets a group chat of its own
+PRIVATE = ('update',)
+
+# Stand-ins for the programs commands run; each prints something plausible
+FAKE_PROGRAMS = {
+    'git': '''#!/bin/sh
+case "$*" in
+  *"rev-parse --short"*) echo abc1234 ;;
+  *"rev-parse --abbrev-ref"*) echo main ;;
+  *"rev-parse --is-inside-work-tree"*) echo true ;;
+  *"log -1 --format=%cd"*) echo 2024-01-01 ;;
+  *"log -1 --format=%s"*) echo "bench commit" ;;
+  *pull*) echo "Already up to date." ;;
+  *"stash list"*) ;;
+  *stash*) echo "No local changes to save" ;;
+  *log*) echo "abc1234 bench commit (bench, 1 day ago)" ;;
+esac
+exit 0
+''',
+    'aria2c': '''#!/bin/sh
+dir=.
+while [ $# -gt 1 ]; do
+  [ "$1" = "--dir" ] && dir="$2"
+  shift
+done
+sleep 0.2
+head -c 65536 /dev/zero > "$dir/$(basename "$1")"
+''',
+    'sudo': '#!/bin/sh\necho "[sudo] $*"\n',
+    'doas': '#!/bin/sh\necho "[doas] $*"\n',
+    'systemctl': '#!/bin/sh\necho active\n',
+    'zerotier-cli': '''#!/bin/sh
+case "$1" in
+  info) echo "200 info 0123456789 1.12.2 ONLINE" ;;
+  *) echo "200 listnetworks <nwid> <name> <mac> <status> <type> <dev> <ZT assigned ips>"
+     echo "200 listnetworks 8056c2e21c000001 bench 02:00:00:00:00:01 OK PRIVATE zt0 10.147.17.2/24" ;;
+esac
+''',
+}
+
+
+class FakeServices:
+    """qBittorrent WebUI (login, add, info) plus static files for /download"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, file_size: int = 65536):
+        torrents = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, body, content_type='application/json'):
+                raw = body if isinstance(body, bytes) else body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(raw)))
+                if self.path.endswith('/auth/login'):
+                    self.send_header('Set-Cookie', 'SID=bench; path=/')
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def do_GET(self):
+                if self.path.startswith('/files/'):
+                    self._reply(b'\0' * file_size, 'application/octet-stream')
+                elif self.path.startswith('/api/v2/torrents/info'):
+                    self._reply(json.dumps(torrents))
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if self.path.endswith('/auth/login'):
+                    self._reply('Ok.', 'text/plain')
+                elif self.path.endswith('/torrents/add'):
+                    torrents.append({'hash': f"{len(torrents):040x}", 'name': f"bench-{len(torrents)}",
+                                     'progress': 1.0, 'state': 'uploading', 'size': file_size,
+                                     'dlspeed': 0, 'eta': 0, 'save_path': '/tmp'})
+                    self._reply('Ok.', 'text/plain')
+                else:
+                    self.send_error(404)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='fake-services', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _install_programs(bin_dir: str):
+    os.makedirs(bin_dir, exist_ok=True)
+    for name, script in FAKE_PROGRAMS.items():
+        path = os.path.join(bin_dir, name)
+        with open(path, 'w') as f:
+            f.write(script)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def _prepare_environment(workdir: str, telegram: FakeTelegram, gemini: FakeGemini, services: FakeServices,
+                         superusers=(BENCH_USER,)):
+    """Point the bot at the stand-ins; must run before any bot module is imported"""
+    os.environ['PATH'] = os.path.join(workdir, 'bin') + os.pathsep + os.environ.get('PATH', '')
+    os.environ.update({
+        'TELEGRAM_BOT_TOKEN': TOKEN,
+        'TELEGRAM_API_BASE': telegram.base_url,
+        'GEMINI_API_BASE': gemini.base_url,
+        'GEMINI_API_KEY': 'bench',
+        'QB_URL': services.base_url,
+        'QB_USER': 'bench',
+        'QB_PASS': 'bench',
+        'SUPERUSER_IDS': ','.join(str(u) for u in superusers),
+        'DOWNLOAD_DIR': os.path.join(workdir, 'Downloads'),
+        'UPDATE_OFFSET_FILE': os.path.join(workdir, 'offset.json'),
+        'METRICS_SNAPSHOT_DIR': os.path.join(workdir, 'metrics'),
+        'METRICS_PORT': '0',
+    })
+    for name in ('OUTBOX_CHAT_INTERVAL', 'OUTBOX_GROUP_INTERVAL'):
+        os.environ.setdefault(name, '0')
+    os.environ.setdefault('OUTBOX_GLOBAL_RATE', '1000')
+    # The Gemini rate limit would otherwise turn most renders into 2s queue waits
+    os.environ.setdefault('GEMINI_RATE_PER_MIN', '100000')
+    os.environ.setdefault('GEMINI_BURST', '1000')
+    os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+
+class _KeepLogs:
+    """/bash and /sudo append to log files in the repository; put them back afterwards"""
+
+    def __init__(self, root: str, names=('bot_commands.log', 'sudo_commands.log', 'doas_commands.log')):
+        self.saved = {}
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                with open(path, 'rb') as f:
+                    self.saved[path] = f.read()
+            except OSError:
+                self.saved[path] = None
+
+    def restore(self):
+        for path, data in self.saved.items():
+            if data is None:
+                if os.path.exists(path):
+                    os.remove(path)
+            else:
+                with open(path, 'wb') as f:
+                    f.write(data)
+
+
+def _start_bot(workdir: str, users=(BENCH_USER,)):
+    """Build and start the bot like run_bot(); the first of `users` is the owner"""
+    import logging
+
+    from telegram.ext import Updater
+    from telegram.utils.request import Request
+
+    from bot import identity
+    from bot.api_metrics import InstrumentedBot
+    from bot.bot import error_handler
+    from bot.command_handler import setup_handlers
+    from bot.config import Config
+    from bot.hot_reload import record_baseline
+
+    logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL, logging.ERROR))
+    users_path = os.path.join(workdir, 'user.csv')
+    with open(users_path, 'w') as f:
+        f.write(''.join(f"{user}\n" for user in users))
+    identity._service = identity.IdentityService(users_path, os.path.join(workdir, '.env'))
+
+    request = Request(con_pool_size=16, connect_timeout=5.0, read_timeout=20.0)
+    bot = InstrumentedBot(token=TOKEN, base_url=Config.TELEGRAM_API_BASE, request=request)
+    updater = Updater(bot=bot, use_context=True)
+    dispatcher = setup_handlers(updater.dispatcher)
+    updater.dispatcher.add_error_handler(error_handler)
+    record_baseline()
+    updater.start_polling(poll_interval=0.0, timeout=10)
+    return updater, dispatcher
+
+
+def _idle(dispatcher) -> bool:
+    stats = dispatcher.stats()
+    return not stats['chats']['busy'] and all(
+        pool['running'] == 0 and pool['queued'] == 0 for name, pool in stats.items() if name != 'chats')
+
+
+def _wait_settled(telegram: FakeTelegram, dispatcher, settle: float, timeout: float) -> bool:
+    """Wait until handlers and the outbox are done and the API stayed quiet for `settle` seconds"""
+    from bot.outbox import get_outbox
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        calls = len(telegram.calls)
+        if _idle(dispatcher) and get_outbox().drain(max(0.1, deadline - time.monotonic())):
+            time.sleep(settle)
+            if len(telegram.calls) == calls and _idle(dispatcher):
+                return True
+        else:
+            time.sleep(0.05)
+    return False
+
+
+def _push(telegram: FakeTelegram, update: str, chat_id: int):
+    if update.startswith('cb:'):
+        telegram.push_callback(update[3:], user_id=BENCH_USER, chat_id=chat_id)
+    else:
+        telegram.push_update(update, user_id=BENCH_USER, chat_id=chat_id)
+
+
+def run(scenarios, rounds: int, settle: float, timeout: float, telegram: FakeTelegram, workdir: str, web: str):
+    """Drive the bot through `rounds` measured rounds; returns the result dict"""
+    from bot import command_metrics
+    from bot.outbox import get_outbox
+
+    updater, dispatcher = _start_bot(workdir)
+    chats = {name: BENCH_USER if name in PRIVATE else -(100000 + i) for i, (name, _) in enumerate(scenarios)}
+    texts = {name: text.format(files=workdir, web=web) for name, text in scenarios}
+    try:
+        time.sleep(0.2)  # let the first getUpdates arrive
+        timed_out = 0
+        for round_no in range(rounds + 1):
+            if round_no == 1:
+                command_metrics.reset()
+                since = time.monotonic()
+                calls_before = len(telegram.calls)
+                retries_before = get_outbox().retry_after
+            for name, _ in scenarios:
+                _push(telegram, texts[name], chats[name])
+            if not _wait_settled(telegram, dispatcher, settle, timeout):
+                timed_out += 1
+        elapsed = time.monotonic() - since - settle * rounds
+    finally:
+        updater.stop()
+
+    per_chat = telegram.calls_by_chat(since)
+    stats = command_metrics.stats()
+    commands = {}
+    for name, _ in scenarios:
+        wall = stats.get(name, {}).get('wall', {})
+        commands[name] = {
+            'updates': rounds,
+            'p50': wall.get('p50', 0.0),
+            'p99': wall.get('p99', 0.0),
+            'max': wall.get('max', 0.0),
+            'errors': stats.get(name, {}).get('errors', 0),
+            'api_calls_per_update': per_chat.get(chats[name], 0) / rounds,
+        }
+    updates = rounds * len(scenarios)
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'rounds': rounds,
+        'updates': updates,
+        'elapsed': elapsed,
+        'updates_per_second': updates / elapsed if elapsed > 0 else 0.0,
+        'api_calls': len(telegram.calls) - calls_before,
+        'outbox_retries': get_outbox().retry_after - retries_before,
+        'injected': dict(telegram.injected),
+        'timed_out_rounds': timed_out,
+        'commands': commands,
+    }
+
+
+def _delta(new: float, old: float) -> str:
+    if not old:
+        return ''
+    return f"{(new - old) / old * 100:+.0f}%"
+
+
+def report(result: dict, baseline: dict = None):
+    old = (baseline or {}).get('commands', {})
+    print(f"{'command':18s} {'n':>4s} {'p50':>8s} {'p99':>8s} {'max':>8s} {'api/upd':>8s} {'err':>4s}"
+          + (f" {'Δp99':>6s} {'Δapi':>6s}" if baseline else ''))
+    for name, st in result['commands'].items():
+        line = (f"{name:18s} {st['updates']:>4d} {st['p50'] * 1000:>6.1f}ms {st['p99'] * 1000:>6.1f}ms "
+                f"{st['max'] * 1000:>6.1f}ms {st['api_calls_per_update']:>8.1f} {st['errors']:>4d}")
+        if name in old:
+            line += (f" {_delta(st['p99'], old[name]['p99']):>6s}"
+                     f" {_delta(st['api_calls_per_update'], old[name]['api_calls_per_update']):>6s}")
+        print(line)
+    print(f"\n{result['updates']} updates in {result['elapsed']:.1f}s: {result['updates_per_second']:.1f} updates/s"
+          + (f" ({_delta(result['updates_per_second'], baseline['updates_per_second'])})" if baseline else ''))
+    print(f"Bot API calls: {result['api_calls']}, outbox 429 retries: {result['outbox_retries']}, "
+          f"injected: {result['injected']['flood']} flood / {result['injected']['errors']} errors")
+    if result['timed_out_rounds']:
+        print(f"⚠️ {result['timed_out_rounds']} round(s) did not settle within the timeout")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=5, help='measured rounds (after one warm-up round)')
+    parser.add_argument('--only', help='comma separated scenario names')
+    parser.add_argument('--latency', type=float, default=0.0, help='Bot API delay per call (s)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random Bot API delay up to this (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of Bot API calls answered with 500')
+    parser.add_argument('--flood-rate', type=float, default=0.0, help='share of Bot API calls answered with 429')
+    parser.add_argument('--gemini-latency', type=float, default=0.05, help='fake Gemini delay per request (s)')
+    parser.add_argument('--settle', type=float, default=0.5, help='quiet time that ends a round (s)')
+    parser.add_argument('--timeout', type=float, default=60.0, help='longest wait for a round (s)')
+    parser.add_argument('--json', help='write the result to this file')
+    parser.add_argument('--compare', help='result file of an earlier run to compare with')
+    args = parser.parse_args()
+
+    only = set(args.only.split(',')) if args.only else None
+    scenarios = [(name, text) for name, text in SCENARIOS
+                 if (name in only if only else name not in OPT_IN)]
+    if not scenarios:
+        parser.error('no scenarios selected')
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    workdir = tempfile.mkdtemp(prefix='bot-bench-')
+    _install_programs(os.path.join(workdir, 'bin'))
+    with open(os.path.join(workdir, 'sample.bin'), 'wb') as f:
+        f.write(os.urandom(32768))
+    telegram = FakeTelegram(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                            flood_rate=args.flood_rate).start()
+    gemini = FakeGemini(latency=args.gemini_latency).start()
+    services = FakeServices().start()
+    _prepare_environment(workdir, telegram, gemini, services)
+
+    logs = _KeepLogs(root)
+    try:
+        result = run(scenarios, args.rounds, args.settle, args.timeout, telegram, workdir, services.base_url)
+    finally:
+        logs.restore()
+        for server in (telegram, gemini, services):
+            server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(result, baseline)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=1, sort_keys=True)
+    # Handler threads (download monitors, schedulers) may still be alive
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
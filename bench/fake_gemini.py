@@ -0,0 +1,146 @@
+"""Local stand-in for the Gemini generateContent API.
+
+Answers generateContent (and streamGenerateContent?alt=sse) by echoing the prompt, with optional injected latency
+and error responses, so the bot's Gemini client can be exercised without
+network access:
+
+    python -m bench.fake_gemini --port 8099 --latency 0.5 --error-rate 0.1
+    GEMINI_API_BASE=http://127.0.0.1:8099/v1beta python main.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeGemini:
+    """Threaded HTTP server imitating the Gemini v1beta models API"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, error_status: int = 503,
+                 stream_delay: float = 0.0):
+        self.latency = latency
+        self.stream_delay = stream_delay
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1beta"
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                with fake._lock:
+                    fake.requests += 1
+                    fake.connections.add(self.client_address)
+                fake._sleep()
+
+                if fake.error_rate and random.random() < fake.error_rate:
+                    with fake._lock:
+                        fake.errors += 1
+                    self._send_json(fake.error_status, {'error': {'code': fake.error_status, 'message': 'injected error'}})
+                    return
+
+                try:
+                    payload = json.loads(body or b'{}')
+                    prompt = payload['contents'][-1]['parts'][0]['text']
+                except Exception:
+                    self._send_json(400, {'error': {'code': 400, 'message': 'bad request'}})
+                    return
+                if ':streamGenerateContent' in self.path:
+                    self._send_stream(fake.response_for(prompt))
+                else:
+                    self._send_json(200, fake.response_for(prompt))
+
+            def _send_stream(self, data):
+                # Split the answer into word chunks sent as SSE events, like alt=sse
+                text = data['candidates'][0]['content']['parts'][0]['text']
+                words = text.split(' ')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for i, word in enumerate(words):
+                    chunk = word + (' ' if i < len(words) - 1 else '')
+                    event = {'candidates': [{'content': {'role': 'model', 'parts': [{'text': chunk}]}}]}
+                    raw = f"data: {json.dumps(event)}\r\n\r\n".encode('utf-8')
+                    self.wfile.write(f"{len(raw):x}\r\n".encode('ascii') + raw + b"\r\n")
+                    if fake.stream_delay:
+                        time.sleep(fake.stream_delay)
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _send_json(self, status, data):
+                raw = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        return Handler
+
+    def _sleep(self):
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    @staticmethod
+    def response_for(prompt: str) -> dict:
+        # Echo the last line of the prompt (the original text for ai_render)
+        text = prompt.rsplit('\n', 1)[-1]
+        return {'candidates': [{'content': {'role': 'model', 'parts': [{'text': f"<b>{text}</b> 🌸"}]}}]}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-gemini', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.0, help='fixed delay per request (s)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random delay up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with an error')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--stream-delay', type=float, default=0.0, help='delay between streamed chunks (s)')
+    args = parser.parse_args()
+
+    fake = FakeGemini(args.host, args.port, args.latency, args.jitter, args.error_rate, args.error_status,
+                      args.stream_delay)
+    print(f"Fake Gemini listening on {fake.base_url}")
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
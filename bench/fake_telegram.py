@@ -0,0 +1,284 @@
+"""Local stand-in for the Telegram Bot API.
+
+Serves /bot<token>/<method> like api.telegram.org. Updates pushed with
+push_update(), push_callback() or push_raw() are handed out through
+getUpdates (long polling) or, once setWebhook was called, POSTed to the
+webhook with the secret token header. Every other call is recorded in
+`calls` and answered with a plausible result, after an optional delay
+(latency + random jitter). A share of those calls can fail on purpose:
+`flood_rate` answers 429 with retry_after, `error_rate` answers 500.
+
+A script of updates (JSON lines, see play()) can be fed at any speed:
+
+    python -m bench.fake_telegram --port 8098 --latency 0.05 --flood-rate 0.01
+    python -m bench.fake_telegram --script updates.jsonl --speed 10
+    TELEGRAM_API_BASE=http://127.0.0.1:8098/bot python main.py
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+import requests
+
+BOT_USER = {'id': 1000, 'is_bot': True, 'first_name': 'BenchBot', 'username': 'bench_bot'}
+
+# Calls that set up the bot are never failed on purpose
+_NO_FAULTS = ('getUpdates', 'getMe', 'setWebhook', 'deleteWebhook', 'setMyCommands')
+
+_MULTIPART_CHAT_ID = re.compile(rb'name="chat_id"\r\n\r\n(-?\d+)')
+
+
+class FakeTelegram:
+    """Threaded HTTP server imitating the parts of the Bot API the bot uses"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, flood_rate: float = 0.0, flood_retry_after: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.flood_rate = flood_rate
+        self.flood_retry_after = flood_retry_after
+        self.injected = {'errors': 0, 'flood': 0}
+        self.calls = []  # (method, params, monotonic time)
+        self.webhook_url = None
+        self.webhook_secret = None
+        self._updates = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._webhook_pool = None
+        self._session = requests.Session()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                method = self.path.rsplit('/', 1)[-1].split('?')[0]
+                params = fake._parse(self.headers.get('Content-Type', ''), body)
+                status, payload = 200, None
+                if method not in _NO_FAULTS:
+                    if fake.latency or fake.jitter:
+                        time.sleep(fake.latency + random.uniform(0, fake.jitter))
+                    status, payload = fake._fault()
+                if payload is None:
+                    payload = {'ok': True, 'result': fake.handle(method, params)}
+                else:
+                    fake.record(method, params, failed=True)
+                raw = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            do_GET = do_POST
+
+        return Handler
+
+    @staticmethod
+    def _parse(content_type: str, body: bytes) -> dict:
+        if content_type.startswith('application/json'):
+            return json.loads(body or b'{}')
+        if content_type.startswith('application/x-www-form-urlencoded'):
+            return dict(parse_qsl(body.decode('utf-8')))
+        # multipart uploads (sendDocument): only the chat and the size matter here
+        match = _MULTIPART_CHAT_ID.search(body)
+        return {'_bytes': len(body), 'chat_id': int(match.group(1)) if match else None}
+
+    def _fault(self):
+        """(status, error payload) for an injected failure, or (200, None)"""
+        roll = random.random()
+        if roll < self.flood_rate:
+            self.injected['flood'] += 1
+            return 429, {'ok': False, 'error_code': 429,
+                         'description': f"Too Many Requests: retry after {self.flood_retry_after}",
+                         'parameters': {'retry_after': self.flood_retry_after}}
+        if roll < self.flood_rate + self.error_rate:
+            self.injected['errors'] += 1
+            return 500, {'ok': False, 'error_code': 500, 'description': 'Internal Server Error: injected'}
+        return 200, None
+
+    def record(self, method: str, params: dict, failed: bool = False):
+        with self._cond:
+            self.calls.append((method, dict(params, _failed=True) if failed else params, time.monotonic()))
+
+    def calls_by_chat(self, since: float = 0.0) -> dict:
+        """chat_id -> number of recorded calls addressed to it after `since` (monotonic)"""
+        counts = {}
+        with self._cond:
+            for method, params, at in self.calls:
+                if at >= since and params.get('chat_id') is not None:
+                    chat = int(params['chat_id'])
+                    counts[chat] = counts.get(chat, 0) + 1
+        return counts
+
+    def handle(self, method: str, params: dict):
+        if method == 'getUpdates':
+            return self._get_updates(params)
+        self.record(method, params)
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'setWebhook':
+            self.webhook_url = params.get('url')
+            self.webhook_secret = params.get('secret_token')
+            workers = int(params.get('max_connections') or 40)
+            self._webhook_pool = ThreadPoolExecutor(max_workers=workers)
+            self._session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=workers))
+            return True
+        if method == 'deleteWebhook':
+            self.webhook_url = None
+            return True
+        if method in ('sendMessage', 'editMessageText', 'sendDocument'):
+            return self._message(params)
+        return True
+
+    def _message(self, params: dict) -> dict:
+        return {
+            'message_id': params.get('message_id') or next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(params.get('chat_id') or 0), 'type': 'private'},
+            'from': BOT_USER,
+            'text': params.get('text', ''),
+        }
+
+    def _get_updates(self, params: dict) -> list:
+        offset = int(params.get('offset') or 0)
+        deadline = time.monotonic() + float(params.get('timeout') or 0)
+        with self._cond:
+            self._updates = [u for u in self._updates if u['update_id'] >= offset]
+            while not self._updates and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+            return list(self._updates[:int(params.get('limit') or 100)])
+
+    @staticmethod
+    def _message_update(update_id: int, text: str, user_id: int, chat_id: int) -> dict:
+        return {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id or user_id, 'type': 'private' if (chat_id or user_id) > 0 else 'group'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}"},
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+            if text.startswith('/') else [],
+        }
+
+    def push_update(self, text: str, user_id: int = 1, chat_id: int = None) -> int:
+        """Queue a text message update; returns its update_id"""
+        update_id = next(self._update_ids)
+        return self.push_raw({'update_id': update_id,
+                              'message': self._message_update(update_id, text, user_id, chat_id)})
+
+    def push_callback(self, data: str, user_id: int = 1, chat_id: int = None) -> int:
+        """Queue an inline keyboard press on a bot message; returns its update_id"""
+        update_id = next(self._update_ids)
+        message = self._message_update(update_id, 'menu', BOT_USER['id'], chat_id or user_id)
+        message['from'] = BOT_USER
+        return self.push_raw({'update_id': update_id, 'callback_query': {
+            'id': str(update_id), 'chat_instance': str(chat_id or user_id), 'data': data, 'message': message,
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}"}}})
+
+    def push_raw(self, update: dict) -> int:
+        """Queue an update as given (e.g. recorded traffic); a missing update_id is assigned"""
+        if 'update_id' not in update:
+            update = dict(update, update_id=next(self._update_ids))
+        if self.webhook_url:
+            self._webhook_pool.submit(self._deliver, update)
+        else:
+            with self._cond:
+                self._updates.append(update)
+                self._cond.notify_all()
+        return update['update_id']
+
+    def play(self, events, speed: float = 1.0) -> int:
+        """Push scripted updates; each event is a dict with `at` (seconds from
+        the start) and either `update` (a raw update), `callback` or `text`
+        (plus optional `user_id`/`chat_id`). speed 0 pushes as fast as possible.
+        Returns the number of updates pushed."""
+        started = time.monotonic()
+        pushed = 0
+        for event in events:
+            if speed > 0:
+                delay = started + float(event.get('at', 0)) / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            if 'update' in event:
+                self.push_raw(event['update'])
+            elif 'callback' in event:
+                self.push_callback(event['callback'], event.get('user_id', 1), event.get('chat_id'))
+            else:
+                self.push_update(event['text'], event.get('user_id', 1), event.get('chat_id'))
+            pushed += 1
+        return pushed
+
+    def _deliver(self, update: dict):
+        headers = {'X-Telegram-Bot-Api-Secret-Token': self.webhook_secret or ''}
+        try:
+            self._session.post(self.webhook_url, json=update, headers=headers, timeout=10)
+        except requests.exceptions.RequestException:
+            pass
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-telegram', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._webhook_pool:
+            self._webhook_pool.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8098)
+    parser.add_argument('--latency', type=float, default=0.0, help='fixed delay per API call (s)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random delay up to this (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of calls answered with 500')
+    parser.add_argument('--flood-rate', type=float, default=0.0, help='share of calls answered with 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='retry_after sent with 429s (s)')
+    parser.add_argument('--script', help='JSON lines of updates to feed once the bot is polling')
+    parser.add_argument('--speed', type=float, default=1.0, help='script speed factor (0 = as fast as possible)')
+    args = parser.parse_args()
+
+    fake = FakeTelegram(args.host, args.port, args.latency, args.jitter, args.error_rate, args.flood_rate,
+                        args.retry_after).start()
+    print(f"Fake Telegram Bot API listening on {fake.base_url}")
+    try:
+        if args.script:
+            with open(args.script) as f:
+                events = [json.loads(line) for line in f if line.strip()]
+            print(f"Feeding {fake.play(events, args.speed)} scripted updates")
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Compare the pooled Gemini client against one-shot requests.post calls.
+
+Starts bench/fake_gemini.py in-process with the given latency and sends the
+same number of renders through both paths from several threads:
+
+    python -m bench.gemini_client --requests 200 --threads 8 --latency 0.05
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench.fake_gemini import FakeGemini
+from bot.gemini_client import GeminiClient, extract_text
+
+
+def _payload(i: int) -> dict:
+    return {'contents': [{'parts': [{'text': f"render {i}"}]}]}
+
+
+def run(fn, count: int, threads: int):
+    """Run fn(i) for i in range(count); return (elapsed seconds, failures)"""
+    def safe(i):
+        try:
+            return bool(fn(i))
+        except requests.exceptions.RequestException:
+            return False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(safe, range(count)))
+    return time.perf_counter() - started, results.count(False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeGemini(latency=args.latency, error_rate=args.error_rate).start()
+    url = fake.base_url + '/models/gemini-2.0-flash:generateContent'
+    try:
+        def one_shot(i):
+            resp = requests.post(url, json=_payload(i), headers={'X-goog-api-key': 'bench'}, timeout=10)
+            resp.raise_for_status()
+            return extract_text(resp.json())
+
+        client = GeminiClient(fake.base_url, 'gemini-2.0-flash', pool_size=args.threads, max_retries=3, backoff_base=0.01)
+
+        def pooled(i):
+            return extract_text(client.generate(_payload(i), 'bench', timeout=10))
+
+        fake.connections.clear()
+        plain, plain_failed = run(one_shot, args.requests, args.threads)
+        plain_conns = len(fake.connections)
+        fake.connections.clear()
+        pool, pool_failed = run(pooled, args.requests, args.threads)
+        pool_conns = len(fake.connections)
+
+        print(f"requests.post : {plain:.3f}s  {args.requests / plain:8.1f} req/s  "
+              f"connections={plain_conns}  failed={plain_failed}")
+        print(f"GeminiClient  : {pool:.3f}s  {args.requests / pool:8.1f} req/s  "
+              f"connections={pool_conns}  failed={pool_failed}  retries={client.retries}")
+    finally:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""Replay a recorded update stream against the bot with every external effect stubbed.
+
+Takes a file written with RECORD_UPDATES=true (see bot/recorder.py), builds
+the bot with the same stand-ins as bench/commands.py (fake Bot API, Gemini,
+qBittorrent and programs on PATH) and puts the recorded updates on the
+updater's queue at their original spacing divided by --speed, the same
+queue long polling and the webhook feed. The recording's pseudonymised owner,
+users and superusers become user.csv and SUPERUSER_IDS, so permission checks
+behave as they did in production.
+
+    python -m bench.replay recordings/updates-20240101-120000.jsonl.gz --speed 10
+    python -m bench.replay rec.jsonl.gz --speed 0 --json io6.json
+    DISPATCH_IO_WORKERS=2 python -m bench.replay rec.jsonl.gz --speed 0 --compare io6.json
+
+--speed 1 is real time, 0 pushes as fast as possible. Dispatch settings
+(DISPATCH_*_WORKERS, DISPATCH_QUEUE_LIMIT, ...) are read from the
+environment, so runs with different values can be compared with --compare.
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from bench.commands import (FakeServices, _KeepLogs, _install_programs, _prepare_environment, _start_bot,
+                            _wait_settled)
+from bench.fake_gemini import FakeGemini
+from bench.fake_telegram import FakeTelegram
+
+
+def read_recording(path: str):
+    """(header, events) from a recording; read without importing bot.* so the
+    environment can still be prepared afterwards"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('recording') != 1:
+            raise ValueError(f"{path} is not an update recording")
+        return header, [json.loads(line) for line in f if line.strip()]
+
+
+def _peak_rate(offsets) -> int:
+    """Most updates recorded within any one second"""
+    peak, start = 0, 0
+    for end, t in enumerate(offsets):
+        while t - offsets[start] >= 1.0:
+            start += 1
+        peak = max(peak, end - start + 1)
+    return peak
+
+
+def replay(events, speed: float, settle: float, timeout: float, telegram: FakeTelegram, workdir: str, users):
+    """Push recorded events into the dispatcher; returns the result dict"""
+    from telegram import Update
+
+    from bot import command_metrics
+
+    updater, dispatcher = _start_bot(workdir, users)
+    try:
+        time.sleep(0.2)
+        command_metrics.reset()
+        calls_before = len(telegram.calls)
+        lag = 0.0
+        started = time.monotonic()
+        first = events[0]['t'] if events else 0.0
+        for event in events:
+            due = started + (event['t'] - first) / speed if speed > 0 else time.monotonic()
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                lag = max(lag, -delay)
+            updater.update_queue.put(Update.de_json(event['update'], updater.bot))
+        pushed = time.monotonic() - started
+        settled = _wait_settled(telegram, dispatcher, settle, timeout)
+        elapsed = time.monotonic() - started - settle
+        dispatch = dispatcher.stats()
+    finally:
+        updater.stop()
+
+    offsets = [event['t'] for event in events]
+    commands = {}
+    for name, st in command_metrics.stats().items():
+        commands[name] = {
+            'updates': st['wall']['count'],
+            'p50': st['wall']['p50'],
+            'p99': st['wall']['p99'],
+            'queue_p95': st['queue']['p95'],
+            'errors': st['errors'],
+        }
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'speed': speed,
+        'updates': len(events),
+        'recorded_seconds': offsets[-1] - offsets[0] if offsets else 0.0,
+        'recorded_peak_per_second': _peak_rate(offsets),
+        'push_seconds': pushed,
+        'max_push_lag': lag,
+        'elapsed': elapsed,
+        'updates_per_second': len(events) / elapsed if elapsed > 0 else 0.0,
+        'api_calls': len(telegram.calls) - calls_before,
+        'injected': dict(telegram.injected),
+        'rejected': {name: pool['rejected'] for name, pool in dispatch.items() if name != 'chats'},
+        'settled': settled,
+        'dispatch_env': {k: v for k, v in sorted(os.environ.items()) if k.startswith('DISPATCH_')},
+        'commands': commands,
+    }
+
+
+def _delta(new: float, old: float) -> str:
+    return f"{(new - old) / old * 100:+.0f}%" if old else ''
+
+
+def report(result: dict, baseline: dict = None):
+    old = (baseline or {}).get('commands', {})
+    print(f"Replayed {result['updates']} updates ({result['recorded_seconds']:.0f}s recorded, "
+          f"peak {result['recorded_peak_per_second']}/s) at "
+          + (f"{result['speed']:g}x" if result['speed'] > 0 else 'max speed')
+          + (f", replay fell up to {result['max_push_lag'] * 1000:.0f}ms behind" if result['max_push_lag'] > 0.05 else ''))
+    if result['dispatch_env']:
+        print("Dispatch: " + ", ".join(f"{k}={v}" for k, v in result['dispatch_env'].items()))
+    print(f"\n{'command':18s} {'n':>5s} {'p50':>8s} {'p99':>8s} {'q95':>8s} {'err':>4s}"
+          + (f" {'Δp99':>6s} {'Δq95':>6s}" if baseline else ''))
+    for name, st in sorted(result['commands'].items(), key=lambda kv: -kv[1]['updates']):
+        line = (f"{name:18s} {st['updates']:>5d} {st['p50'] * 1000:>6.1f}ms {st['p99'] * 1000:>6.1f}ms "
+                f"{st['queue_p95'] * 1000:>6.1f}ms {st['errors']:>4d}")
+        if name in old:
+            line += f" {_delta(st['p99'], old[name]['p99']):>6s} {_delta(st['queue_p95'], old[name]['queue_p95']):>6s}"
+        print(line)
+    print(f"\n{result['updates']} updates handled in {result['elapsed']:.1f}s: "
+          f"{result['updates_per_second']:.1f} updates/s"
+          + (f" ({_delta(result['updates_per_second'], baseline['updates_per_second'])})" if baseline else ''))
+    rejected = {name: n for name, n in result['rejected'].items() if n}
+    print(f"Bot API calls: {result['api_calls']}, rejected by dispatch: {rejected or 0}, "
+          f"injected: {result['injected']['flood']} flood / {result['injected']['errors']} errors")
+    if not result['settled']:
+        print("⚠️ The bot did not settle within the timeout")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('recording', help='updates-*.jsonl.gz written with RECORD_UPDATES=true')
+    parser.add_argument('--speed', type=float, default=1.0, help='time factor (1 = real time, 0 = max speed)')
+    parser.add_argument('--limit', type=int, default=0, help='replay only the first N updates')
+    parser.add_argument('--latency', type=float, default=0.0, help='Bot API delay per call (s)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random Bot API delay up to this (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of Bot API calls answered with 500')
+    parser.add_argument('--flood-rate', type=float, default=0.0, help='share of Bot API calls answered with 429')
+    parser.add_argument('--gemini-latency', type=float, default=0.05, help='fake Gemini delay per request (s)')
+    parser.add_argument('--settle', type=float, default=1.0, help='quiet time that ends the replay (s)')
+    parser.add_argument('--timeout', type=float, default=300.0, help='longest wait after the last update (s)')
+    parser.add_argument('--json', help='write the result to this file')
+    parser.add_argument('--compare', help='result file of an earlier replay to compare with')
+    args = parser.parse_args()
+
+    header, events = read_recording(args.recording)
+    if args.limit:
+        events = events[:args.limit]
+    if not events:
+        parser.error('the recording has no updates')
+    # Owner first: user.csv treats its first row as the owner
+    users = [header['owner']] if header.get('owner') is not None else []
+    users += [u for u in header.get('users', []) if u != header.get('owner')]
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    workdir = tempfile.mkdtemp(prefix='bot-replay-')
+    _install_programs(os.path.join(workdir, 'bin'))
+    telegram = FakeTelegram(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                            flood_rate=args.flood_rate).start()
+    gemini = FakeGemini(latency=args.gemini_latency).start()
+    services = FakeServices().start()
+    _prepare_environment(workdir, telegram, gemini, services, superusers=header.get('superusers') or ())
+
+    logs = _KeepLogs(root)
+    try:
+        result = replay(events, args.speed, args.settle, args.timeout, telegram, workdir, users)
+    finally:
+        logs.restore()
+        for server in (telegram, gemini, services):
+            server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(result, baseline)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=1, sort_keys=True)
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Measure bot cold-start time with lazy and eager command loading.
+
+Each run starts a fresh process of `main.py --startup-check`, which builds the
+Updater and installs every handler from bot/registry.py without connecting to
+Telegram. `--eager` imports all command modules up front, as run_bot did
+before the registry. If build.sh produced dist/main, the PyInstaller onefile
+binary is timed the same way:
+
+    python -m bench.startup --runs 10
+    python -m bench.startup --binary dist/main
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_command(cmd, runs: int):
+    """Run cmd `runs` times; return wall-clock seconds per run"""
+    timings = []
+    env = dict(os.environ, LOG_LEVEL='WARNING')
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(cmd, cwd=PROJECT_ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(label: str, timings):
+    print(f"{label:24s}: median={statistics.median(timings) * 1000:8.1f}ms  "
+          f"min={min(timings) * 1000:8.1f}ms  runs={len(timings)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--binary', default=os.path.join(PROJECT_ROOT, 'dist', 'main'),
+                        help='PyInstaller onefile build to time as well (skipped if missing)')
+    args = parser.parse_args()
+
+    script = [sys.executable, 'main.py', '--startup-check']
+    targets = [('python lazy', script), ('python eager', script + ['--eager'])]
+    if os.path.exists(args.binary):
+        targets += [('onefile lazy', [args.binary, '--startup-check']),
+                    ('onefile eager', [args.binary, '--startup-check', '--eager'])]
+    else:
+        print(f"(no binary at {args.binary}; run ./build.sh to include the onefile build)")
+
+    for label, cmd in targets:
+        report(label, time_command(cmd, args.runs))
+
+
+if __name__ == '__main__':
+    main()
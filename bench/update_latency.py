@@ -0,0 +1,87 @@
+"""Compare update delivery latency of long polling and the webhook server.
+
+Runs bench/fake_telegram.py in-process, points a real Updater at it and pushes
+messages at a fixed rate. Latency is measured from push_update() until the
+dispatcher calls the handler:
+
+    python -m bench.update_latency --updates 300 --rate 100
+"""
+import argparse
+import socket
+import threading
+import time
+
+import telegram
+from telegram.ext import MessageHandler, Filters, Updater
+
+from bench.fake_telegram import FakeTelegram
+from bot.config import Config
+from bot.webhook import start_webhook
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run(mode: str, count: int, rate: float):
+    """Deliver `count` updates in the given mode; return sorted latencies (s)"""
+    fake = FakeTelegram().start()
+    bot = telegram.Bot(token='123:bench', base_url=fake.base_url)
+    updater = Updater(bot=bot, use_context=True)
+    sent = {}
+    latencies = []
+    done = threading.Event()
+
+    def on_message(update, context):
+        latencies.append(time.perf_counter() - sent[update.update_id])
+        if len(latencies) >= count:
+            done.set()
+
+    updater.dispatcher.add_handler(MessageHandler(Filters.text, on_message))
+    webhook = None
+    try:
+        if mode == 'webhook':
+            port = _free_port()
+            Config.WEBHOOK_URL = f"http://127.0.0.1:{port}"
+            Config.WEBHOOK_LISTEN = '127.0.0.1'
+            Config.PORT = port
+            webhook = start_webhook(updater)
+            if webhook is None:
+                raise RuntimeError('webhook did not start')
+        else:
+            updater.start_polling(poll_interval=0.0, timeout=10)
+            time.sleep(0.2)  # let the first getUpdates arrive
+
+        for i in range(count):
+            sent[i + 1] = time.perf_counter()
+            fake.push_update(f"ping {i}", user_id=1 + i % 10)
+            time.sleep(1.0 / rate)
+        done.wait(30)
+    finally:
+        updater.stop()
+        if webhook is not None:
+            webhook.stop()
+        fake.stop()
+    return sorted(latencies)
+
+
+def _pct(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000 if values else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=300)
+    parser.add_argument('--rate', type=float, default=100.0, help='updates pushed per second')
+    args = parser.parse_args()
+
+    for mode in ('polling', 'webhook'):
+        lat = run(mode, args.updates, args.rate)
+        print(f"{mode:8s}: delivered={len(lat)}/{args.updates}  p50={_pct(lat, 0.5):7.2f}ms  "
+              f"p95={_pct(lat, 0.95):7.2f}ms  p99={_pct(lat, 0.99):7.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,64 @@
-import requests
 import re
+import threading
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from bot.config import Config
+from bot.render_cache import RenderCache
+from bot.circuit_breaker import CircuitBreaker, OPEN
+from bot.singleflight import SingleFlight
+from bot.gemini_client import get_client, extract_text
+from bot.gemini_scheduler import BACKGROUND, SchedulerTimeout, get_scheduler
+from bot.formatter import format_html, split_html
+from bot import command_metrics, outbox
 
-API_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+logger = logging.getLogger(__name__)
+
+# Rendered output keyed on (template, text); static strings and repeated
+# progress lines are served from here instead of a Gemini round trip.
+render_cache = RenderCache(max_size=Config.AI_CACHE_SIZE, ttl=Config.AI_CACHE_TTL)
+
+# Trips when Gemini keeps failing or exceeds the latency budget; while open,
+# ai_render passes text through unchanged instead of waiting on the network.
+render_breaker = CircuitBreaker(
+    failure_threshold=Config.AI_BREAKER_FAILURES,
+    window=Config.AI_BREAKER_WINDOW,
+    slow_threshold=Config.AI_BREAKER_SLOW,
+    cooldown=Config.AI_BREAKER_COOLDOWN,
+)
+
+# Coalesces concurrent identical (template, text) renders into one request
+render_inflight = SingleFlight()
+
+# Deferred ("send first, beautify later") rendering state
+_render_pool = None
+_render_lock = threading.Lock()
+_render_generations = {}  # (chat_id, message_id) -> generation of the pending render
+deferred_stats = {'applied': 0, 'stale': 0, 'superseded': 0, 'unchanged': 0, 'failed': 0}
+
+# Fixed strings sent through ai_send_message/ai_send_to_chat that are worth pre-rendering
+# at startup; keep in step with their call sites
+WARMUP_TEXTS = [
+    "Akses Ditolak. Anda tidak memiliki izin untuk menggunakan bot ini.",
+    "Perintah bash memerlukan argumen. Contoh: /bash ls -la",
+    "Perintah interaktif tidak diperbolehkan. Gunakan /sudo dengan doas (hanya superuser)",
+    "❌ Format: /download <URL>\nContoh: /download https://example.com/file.zip",
+    "❌ URL tidak valid. Harus diawali http:// atau https://",
+    "❌ aria2c tidak ditemukan. Pasang aria2c di server.",
+    "❌ Perintah download memerlukan URL sebagai argumen.\nContoh: /download https://example.com/file.zip",
+    "✅ Download selesai tetapi tidak ditemukan file baru.",
+    "**💤 Tidak ada download aktif**",
+    "❌ Format: /uploads <path_file>\nContoh: /uploads /home/user/file.zip",
+    "❌ Silakan lampirkan file bersama dengan perintah /uploads.",
+    "**❌ Cara pakai:** balas pesan yang berisi file lalu ketik /kirim",
+    "**❌ Format:** /ai <pertanyaan atau prompt>\n__Contoh:__ /ai Jelaskan ZeroTier secara singkat.",
+    "**❌ Format:** /ai_api <api_key>\n__Contoh:__ /ai_api AIza...",
+    "🚫 Akses ditolak. Hanya owner atau superuser yang dapat mematikan bot.",
+    "⚠️ Bot akan dimatikan dalam 3 detik...",
+    "🔴 Bot sedang shutdown...",
+    "**💤 Pengingat sudah dalam keadaan mati**",
+    "**🔁 Restarting bot** to apply updates...",
+]
 
 
 def escape_markdown_v2(text: str) -> str:
@@ -17,18 +73,62 @@ def _build_prompt(template: str, text: str) -> str:
     return (template + "\n\nInstruksi: Ubah teks berikut sehingga terdengar seperti pesan hangat dari karakter di atas, tetap ringkas dan jelas. GUNAKAN format HTML untuk Telegram: <b>bold text</b> untuk kata penting, <i>italic</i> untuk penekanan lembut, <code>kode</code> untuk output teknis kecil, dan emoji yang cute 🌸✨💖. Untuk code block panjang gunakan <pre>code block</pre>. Untuk link gunakan <a href='url'>teks</a>. PENTING: Untuk output teknis (command, status ZeroTier, status system), gunakan <pre> agar mudah dibaca. Gunakan bullet points dengan • atau - untuk daftar. Buat struktur yang rapi dan mudah dibaca.\nTeks asli:\n" + text)
 
 
-def ai_render(text: str) -> str:
+def _get_template() -> str:
+    template = Config.AI_TEMPLATE.replace('\\n', '\n') if Config.AI_TEMPLATE else None
+    if not template:
+        # default minimal template
+        template = ("Kamu adalah seorang asisten yang ramah dan ringkas. Berikan jawaban yang hangat, singkat, dan jelas.\n\n")
+    return template
+
+
+def uses_local_formatter(kind=None) -> bool:
+    """True if messages of this kind are formatted locally instead of by Gemini"""
+    return Config.AI_RENDER_ENGINE == 'local' or (kind is not None and kind in Config.AI_LOCAL_KINDS)
+
+
+def ai_render(text: str, kind: str = None) -> str:
     """Render a short piece of text through the configured Gemini API and return result.
-    If no API key or on error, return the original text."""
+    Results are cached on (template, text). If no API key, on error, or while the
+    circuit breaker is open, return the original text.
+
+    `kind` names the message class (e.g. 'progress', 'output', 'status'); kinds
+    listed in AI_LOCAL_KINDS, or every kind when AI_RENDER_ENGINE=local, are
+    converted to HTML by the local formatter without a network call."""
+    with command_metrics.phase('ai_render'):
+        return _ai_render(text, kind)
+
+
+def _ai_render(text: str, kind: str = None) -> str:
+    if uses_local_formatter(kind):
+        return format_html(text, decorate=Config.AI_LOCAL_DECORATE)
+
     api_key = Config.GEMINI_API_KEY
     if not api_key:
         return text
 
-    template = Config.AI_TEMPLATE.replace('\\n', '\n') if Config.AI_TEMPLATE else None
-    if not template:
-        # default minimal template
-        template = ("Kamu adalah seorang asisten yang ramah dan ringkas. Berikan jawaban yang hangat, singkat, dan jelas.\n\n")
+    template = _get_template()
+    key = (template, text)
+    cached = render_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Identical renders already in flight share one Gemini call
+    rendered, _ = render_inflight.do(key, lambda: _render_and_cache(api_key, template, text, key))
+    return rendered if rendered is not None else text
+
 
+def _render_and_cache(api_key: str, template: str, text: str, key):
+    if not render_breaker.allow():
+        return None
+    rendered = _render_remote(api_key, template, text)
+    if rendered is not None:
+        render_cache.put(key, rendered)
+    return rendered
+
+
+def _render_remote(api_key: str, template: str, text: str):
+    """Call Gemini within the latency budget and return the rendered text, or None
+    on any failure. Every outcome is reported to render_breaker."""
     prompt = _build_prompt(template, text)
 
     payload = {
@@ -41,54 +141,182 @@ def ai_render(text: str) -> str:
         ]
     }
 
-    headers = {
-        'Content-Type': 'application/json',
-        'X-goog-api-key': api_key
-    }
-
+    started = time.monotonic()
     try:
-        resp = requests.post(API_BASE_URL, json=payload, headers=headers, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        # parse response
-        if isinstance(data, dict):
-            candidates = data.get('candidates', [])
-            if candidates:
-                content = candidates[0].get('content', {})
-                parts = content.get('parts', [])
-                if parts:
-                    return parts[0].get('text', text)
-        return text
-    except Exception:
-        return text
+        data = get_client().generate(payload, api_key, timeout=Config.AI_RENDER_BUDGET,
+                                     deadline=Config.AI_RENDER_BUDGET, priority=BACKGROUND,
+                                     max_wait=Config.AI_RENDER_MAX_QUEUE_WAIT)
+    except SchedulerTimeout:
+        # Quota is busy with higher-priority work; fall back to plain text without
+        # counting it against Gemini's health
+        render_breaker.record_skipped()
+        return None
+    except Exception as e:
+        render_breaker.record_failure(time.monotonic() - started, str(e))
+        return None
+    render_breaker.record_success(time.monotonic() - started)
+    return extract_text(data) or None
 
 
-def ai_send_message(update, text, **kwargs):
-    """Helper function to send AI-rendered message with HTML formatting.
-    Use bold, italic, code, pre-formatted blocks for readability.
-    """
-    rendered = ai_render(text)
+def render_status() -> dict:
+    """Return breaker state and cache counters for status commands"""
+    return {'breaker': render_breaker.snapshot(), 'cache': render_cache.stats(),
+            'inflight': render_inflight.stats(), 'scheduler': get_scheduler().stats(),
+            'deferred': dict(deferred_stats, mode=Config.AI_RENDER_MODE)}
+
+
+def warm_render_cache(texts=None):
+    """Pre-render static strings so first use is served from the cache"""
+    if not Config.GEMINI_API_KEY:
+        return 0
+    warmed = 0
+    for text in (texts if texts is not None else WARMUP_TEXTS):
+        if (_get_template(), text) in render_cache:
+            continue
+        if render_breaker.state == OPEN:
+            logger.info("Render cache warm-up stopped: circuit breaker is open")
+            break
+        ai_render(text)
+        warmed += 1
+    logger.info(f"Render cache warm-up done: {warmed} texts, stats={render_cache.stats()}")
+    return warmed
 
+
+def start_cache_warmup():
+    """Run warm_render_cache in a daemon thread so startup is not delayed"""
+    if not Config.AI_CACHE_WARMUP or not Config.GEMINI_API_KEY:
+        return None
+    t = threading.Thread(target=warm_render_cache, name="ai-cache-warmup", daemon=True)
+    t.start()
+    return t
+
+
+def _reply(update, text, parse_mode="HTML", **kwargs):
+    """Reply to a message or callback query, degrading parse_mode and kwargs on failure"""
     # Handle both regular messages and callback queries
     if hasattr(update, 'callback_query') and update.callback_query:
-        # This is a callback query
+        message = update.callback_query.message
+    else:
+        message = update.message
+    try:
+        return message.reply_text(text, parse_mode=parse_mode, **kwargs)
+    except Exception:
+        # If HTML fails, try without parse_mode
         try:
-            return update.callback_query.message.reply_text(rendered, parse_mode="HTML", **kwargs)
+            return message.reply_text(text, **kwargs)
+        except Exception:
+            # Final fallback without kwargs
+            return message.reply_text(text)
+
+
+def _get_render_pool():
+    global _render_pool
+    with _render_lock:
+        if _render_pool is None:
+            _render_pool = ThreadPoolExecutor(max_workers=Config.AI_RENDER_WORKERS,
+                                              thread_name_prefix="ai-render")
+        return _render_pool
+
+
+def submit_background(fn, *args) -> bool:
+    """Run fn(*args) on the deferred render pool, off the dispatch workers;
+    False if the pool is shut down (bot exiting)"""
+    def run():
+        try:
+            fn(*args)
         except Exception as e:
-            # If HTML fails, try without parse_mode
-            try:
-                return update.callback_query.message.reply_text(rendered, **kwargs)
-            except Exception:
-                # Final fallback: try without kwargs
-                return update.callback_query.message.reply_text(rendered)
-    else:
-        # This is a regular message
+            logger.error(f"Background task {getattr(fn, '__name__', fn)} failed: {e}")
+    try:
+        _get_render_pool().submit(run)
+        return True
+    except RuntimeError:
+        return False
+
+
+def _next_generation(chat_id, message_id) -> int:
+    with _render_lock:
+        gen = _render_generations.get((chat_id, message_id), 0) + 1
+        _render_generations[(chat_id, message_id)] = gen
+        return gen
+
+
+def supersede_render(chat_id, message_id):
+    """Drop any pending deferred render for a message that has been edited elsewhere"""
+    _next_generation(chat_id, message_id)
+
+
+def _apply_deferred_render(message, text, generation, sent_at, reply_markup=None):
+    """Worker: render text and edit the already-sent message in place"""
+    key = (message.chat_id, message.message_id)
+    try:
+        rendered = ai_render(text)
+        with _render_lock:
+            current = _render_generations.get(key)
+        if current != generation:
+            deferred_stats['superseded'] += 1
+            return
+        if time.monotonic() - sent_at > Config.AI_RENDER_MAX_AGE:
+            deferred_stats['stale'] += 1
+            return
+        if rendered == text:
+            # Passthrough (breaker open, no key or error): the raw text already shown stays
+            deferred_stats['unchanged'] += 1
+            return
         try:
-            return update.message.reply_text(rendered, parse_mode="HTML", **kwargs)
+            message.edit_text(rendered, parse_mode="HTML", reply_markup=reply_markup)
+            deferred_stats['applied'] += 1
         except Exception as e:
-            # If HTML fails, try without parse_mode
-            try:
-                return update.message.reply_text(rendered, **kwargs)
-            except Exception:
-                # Final fallback without kwargs
-                return update.message.reply_text(rendered)
+            deferred_stats['failed'] += 1
+            logger.debug(f"Deferred render edit failed for {key}: {e}")
+    finally:
+        with _render_lock:
+            if _render_generations.get(key) == generation:
+                del _render_generations[key]
+
+
+def ai_send_to_chat(bot, chat_id, text, kind=None, **kwargs):
+    """Render text and queue it for a chat with HTML formatting, falling back to
+    plain text when Telegram rejects the markup. For code paths without an
+    Update (background workers, reminders). Goes through the rate-limited
+    outbox; returns a Future of the sent Message.
+
+    Text longer than one message is rendered whole and the HTML split
+    afterwards (see split_html), so escaping cannot push a piece past the
+    limit; kwargs such as reply_markup go with the last piece."""
+    pieces = split_html(ai_render(text, kind=kind), outbox.MAX_MESSAGE_LENGTH)
+    for piece in pieces[:-1]:
+        outbox.send_message(bot, chat_id, piece, parse_mode="HTML")
+    return outbox.send_message(bot, chat_id, pieces[-1], parse_mode="HTML", **kwargs)
+
+
+def ai_send_message(update, text, defer=None, kind=None, **kwargs):
+    """Helper function to send AI-rendered message with HTML formatting.
+    Use bold, italic, code, pre-formatted blocks for readability.
+
+    In deferred mode (AI_RENDER_MODE=deferred or defer=True) the raw text is sent
+    immediately and replaced in place with the rendered version once a background
+    worker finishes; renders that arrive after AI_RENDER_MAX_AGE or for a message
+    that was edited in the meantime are dropped.
+    """
+    if defer is None:
+        defer = Config.AI_RENDER_MODE == 'deferred'
+
+    if not defer or not Config.GEMINI_API_KEY or uses_local_formatter(kind):
+        return _reply(update, ai_render(text, kind=kind), **kwargs)
+
+    # Cache hits need no round trip, send the styled version right away
+    if render_cache.peek((_get_template(), text)) is not None:
+        return _reply(update, ai_render(text), **kwargs)
+
+    message = _reply(update, text, parse_mode=None, **kwargs)
+    if message is None or not hasattr(message, 'edit_text'):
+        return message
+
+    generation = _next_generation(message.chat_id, message.message_id)
+    try:
+        _get_render_pool().submit(_apply_deferred_render, message, text, generation,
+                                  time.monotonic(), kwargs.get('reply_markup'))
+    except RuntimeError:
+        # Pool shut down (bot is exiting); the raw text is already delivered
+        pass
+    return message
@@ -0,0 +1,130 @@
+"""Latency, error and payload metrics for every Telegram Bot API call.
+
+run_bot builds an InstrumentedBot instead of telegram.Bot. Every API method
+(sendMessage, editMessageText, sendDocument, getFile, getUpdates, ...) goes
+through Bot._post, which is timed here, so call sites that swallow errors
+with `except Exception: pass` still show up in the error counts. Flood
+control (429) is counted separately; how often the outbox had to resend is
+reported as retries.
+"""
+import threading
+import time
+from typing import Dict, List
+
+from telegram import Bot, InputFile
+from telegram.error import RetryAfter
+from telegram.utils.helpers import DEFAULT_NONE
+
+from bot import command_metrics
+from bot.metrics import Histogram, register_exporter
+
+# Request size buckets in bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 10485760, 52428800)
+
+
+class _MethodStats:
+    __slots__ = ('latency', 'sizes', 'errors', 'retry_after', 'bytes_out', 'error_types')
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.sizes = Histogram(SIZE_BUCKETS)
+        self.errors = 0
+        self.retry_after = 0
+        self.bytes_out = 0
+        self.error_types: Dict[str, int] = {}
+
+
+_stats: Dict[str, _MethodStats] = {}
+_lock = threading.Lock()
+
+
+def _payload_size(data) -> int:
+    """Approximate request size: file contents plus the text of other fields"""
+    size = 0
+    for key, value in (data or {}).items():
+        if isinstance(value, InputFile):
+            size += len(value.input_file_content or b'')
+        elif isinstance(value, bytes):
+            size += len(value)
+        elif value is not None:
+            size += len(key) + len(str(value))
+    return size
+
+
+def record(method: str, seconds: float, size: int, error: BaseException = None):
+    with _lock:
+        stats = _stats.get(method)
+        if stats is None:
+            stats = _stats[method] = _MethodStats()
+        stats.latency.observe(seconds)
+        stats.sizes.observe(size)
+        stats.bytes_out += size
+        if error is not None:
+            stats.errors += 1
+            name = type(error).__name__
+            stats.error_types[name] = stats.error_types.get(name, 0) + 1
+            if isinstance(error, RetryAfter):
+                stats.retry_after += 1
+
+
+class InstrumentedBot(Bot):
+    """telegram.Bot that records every API call in bot.api_metrics"""
+
+    def _post(self, endpoint, data=None, timeout=DEFAULT_NONE, api_kwargs=None):
+        size = _payload_size(data) + _payload_size(api_kwargs)
+        started = time.perf_counter()
+        try:
+            with command_metrics.phase('telegram'):
+                result = super()._post(endpoint, data, timeout, api_kwargs)
+        except Exception as e:
+            record(endpoint, time.perf_counter() - started, size, e)
+            raise
+        record(endpoint, time.perf_counter() - started, size)
+        return result
+
+
+def stats() -> Dict[str, Dict[str, object]]:
+    """Per-method latency summary (seconds), call/error/429 counts and bytes sent"""
+    with _lock:
+        return {
+            method: dict(st.latency.summary(), errors=st.errors, retry_after=st.retry_after,
+                         bytes_out=st.bytes_out, max_bytes=st.sizes.max, error_types=dict(st.error_types))
+            for method, st in _stats.items()
+        }
+
+
+def retries() -> int:
+    """Messages the outbox re-sent after flood control"""
+    from bot.outbox import get_outbox
+    return get_outbox().retry_after
+
+
+def prometheus_lines() -> List[str]:
+    lines = [
+        '# HELP telegram_api_request_seconds Bot API call latency',
+        '# TYPE telegram_api_request_seconds histogram',
+    ]
+    with _lock:
+        items = sorted(_stats.items())
+        for method, st in items:
+            lines += st.latency.prometheus('telegram_api_request_seconds', f'method="{method}"')
+        lines += ['# HELP telegram_api_request_bytes Approximate Bot API request size',
+                  '# TYPE telegram_api_request_bytes histogram']
+        for method, st in items:
+            lines += st.sizes.prometheus('telegram_api_request_bytes', f'method="{method}"')
+        lines += ['# HELP telegram_api_errors_total Failed Bot API calls',
+                  '# TYPE telegram_api_errors_total counter']
+        for method, st in items:
+            for error, n in sorted(st.error_types.items()):
+                lines.append(f'telegram_api_errors_total{{method="{method}",error="{error}"}} {n}')
+        lines += ['# HELP telegram_api_retry_after_total Calls answered with 429 flood control',
+                  '# TYPE telegram_api_retry_after_total counter']
+        for method, st in items:
+            lines.append(f'telegram_api_retry_after_total{{method="{method}"}} {st.retry_after}')
+    lines += ['# HELP telegram_outbox_retries_total Messages re-sent by the outbox after flood control',
+              '# TYPE telegram_outbox_retries_total counter',
+              f'telegram_outbox_retries_total {retries()}']
+    return lines
+
+
+register_exporter(prometheus_lines)
@@ -1,7 +1,5 @@
 import logging
-import csv
 import os
-from typing import List
 from telegram import Update, Bot
 from telegram.utils.request import Request as TGRequest
 import telegram
@@ -9,6 +7,7 @@ from telegram.ext import Updater, CommandHandler, MessageHandler, Filters, Callb
 from bot.config import Config
 import time
 from bot.ai_wrapper import ai_send_message
+from bot.identity import identity
 
 # Configure logging
 logging.basicConfig(
@@ -17,24 +16,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Load authorized user IDs from CSV
-AUTHORIZED_USER_IDS: List[int] = []
-try:
-    with open(Config.AUTHORIZED_IDS_FILE_PATH, 'r') as file:
-        reader = csv.reader(file)
-        for row in reader:
-            if row and row[0].strip():  # Skip empty rows
-                AUTHORIZED_USER_IDS.append(int(row[0].strip()))
-    logger.info(f"Loaded {len(AUTHORIZED_USER_IDS)} authorized users")
-except Exception as e:
-    logger.error(f"Error loading authorized users: {e}")
-
 # The imported modules are moved to inside the functions to avoid circular imports
 
 def authorize(update: Update, context: CallbackContext) -> bool:
     """Check if the user is authorized to use the bot"""
     user_id = update.effective_user.id
-    if user_id not in AUTHORIZED_USER_IDS:
+    if not identity().is_user(user_id):
         msg = "Akses Ditolak. Anda tidak memiliki izin untuk menggunakan bot ini."
         ai_send_message(update, msg)
         logger.warning(f"Unauthorized access attempt from user {user_id}")
@@ -43,7 +30,7 @@ def authorize(update: Update, context: CallbackContext) -> bool:
 
 def is_superuser(user_id: int) -> bool:
     """Check if user ID is a superuser"""
-    return user_id in Config.SUPERUSER_IDS
+    return identity().is_superuser(user_id)
 
 def error_handler(update: Update, context: CallbackContext):
     """Handle errors"""
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Failure/latency circuit breaker for an unreliable remote call.
+
+    The last `window` outcomes are tracked; a call counts as failed when it
+    raised or took longer than `slow_threshold` seconds. Once `failure_threshold`
+    failures are in the window the breaker opens and `allow()` returns False
+    for `cooldown` seconds. After that a single trial call is let through
+    (half-open): success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 3, window: int = 10,
+                 slow_threshold: float = 6.0, cooldown: float = 60.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.slow_threshold = float(slow_threshold)
+        self.cooldown = float(cooldown)
+        self._outcomes = deque(maxlen=max(self.failure_threshold, int(window)))
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.total_calls = 0
+        self.total_failures = 0
+        self.short_circuited = 0
+        self.times_opened = 0
+        self.last_error: Optional[str] = None
+        self.last_latency: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+            self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        """Return True if a call may be attempted now"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record_success(self, latency: float):
+        """Record a completed call; slow calls count as failures"""
+        if latency > self.slow_threshold:
+            self.record_failure(latency, f"slow response ({latency:.1f}s)")
+            return
+        with self._lock:
+            self.total_calls += 1
+            self.last_latency = latency
+            self._outcomes.append((True, latency))
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._outcomes.clear()
+            self._trial_in_flight = False
+
+    def record_failure(self, latency: Optional[float] = None, error: Optional[str] = None):
+        with self._lock:
+            self.total_calls += 1
+            self.total_failures += 1
+            self.last_error = error
+            if latency is not None:
+                self.last_latency = latency
+            self._outcomes.append((False, latency))
+            failures = sum(1 for ok, _ in self._outcomes if not ok)
+            if self._state == HALF_OPEN or (self._state == CLOSED and failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self.times_opened += 1
+            self._trial_in_flight = False
+
+    def record_skipped(self):
+        """Release a granted call that never reached the remote side"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._outcomes.clear()
+            self._trial_in_flight = False
+
+    def snapshot(self) -> Dict[str, object]:
+        """Return the current state and counters for status reporting"""
+        with self._lock:
+            self._maybe_half_open()
+            latencies = [lat for _, lat in self._outcomes if lat is not None]
+            remaining = 0.0
+            if self._state == OPEN:
+                remaining = max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+            return {
+                'state': self._state,
+                'recent_failures': sum(1 for ok, _ in self._outcomes if not ok),
+                'window': len(self._outcomes),
+                'avg_latency': (sum(latencies) / len(latencies)) if latencies else None,
+                'last_latency': self.last_latency,
+                'last_error': self.last_error,
+                'cooldown_remaining': remaining,
+                'total_calls': self.total_calls,
+                'total_failures': self.total_failures,
+                'short_circuited': self.short_circuited,
+                'times_opened': self.times_opened,
+            }
@@ -1,6 +1,7 @@
+import sys
 from typing import Dict, Callable
 from telegram import Update
-from telegram.ext import CallbackContext, Updater, CommandHandler, MessageHandler, Filters
+from telegram.ext import CallbackContext, Updater, MessageHandler, Filters
 
 # Import config first (no circular dependency here)
 from . import config
@@ -21,19 +22,48 @@ def handle(update: Update, context: CallbackContext):
     if update.message.text.startswith('/'):
         command = update.message.text.split()[0][1:]
         if command in commands:
-            commands[command](update, context)
+            handler = commands[command]
+            # Already on a dispatch worker: call the command directly
+            handler = handler.resolve() if hasattr(handler, 'resolve') else handler
+            handler(update, context)
         else:
             update.message.reply_text('❌ Perintah tidak dikenal. Ketik /help untuk melihat daftar perintah.')
     else:
         # Non-command messages
         update.message.reply_text('❌ Gunakan perintah yang dimulai dengan /\nKetik /help untuk melihat daftar perintah.')
 
+def setup_handlers(dp, eager: bool = False):
+    """Install every command from bot.registry on the telegram dispatcher.
+
+    Each handler runs on the worker pool of its concurrency class, so slow
+    commands never block the dispatcher thread. Command modules are imported
+    on first use unless `eager` is set.
+    """
+    from bot.dispatch import get_dispatcher, INSTANT
+    from bot import registry
+
+    dispatcher = get_dispatcher()
+    registry.install(dp, dispatcher, register=register, eager=eager)
+
+    # Add message handler for non-command text processing
+    dp.add_handler(MessageHandler(Filters.text & ~Filters.command, dispatcher.wrap("text", handle, INSTANT)))
+    return dispatcher
+
+def startup_check(eager: bool = False):
+    """Build the bot and its handlers without connecting, then return.
+    Used by bench/startup.py to time cold starts (main.py --startup-check)."""
+    import telegram as _telegram
+    token = config.Config.BOT_TOKEN or '123456:startup-check'
+    updater = Updater(bot=_telegram.Bot(token=token), use_context=True)
+    setup_handlers(updater.dispatcher, eager=eager)
+    loaded = sorted(m for m in sys.modules if m.startswith('bot.commands.'))
+    print(f"handlers={sum(len(h) for h in updater.dispatcher.handlers.values())} command_modules={len(loaded)}")
+
 def run_bot():
     # Resilient bot runner: create a Request with sensible timeouts and run the Updater
     import time
     import logging
     from telegram.utils.request import Request
-    import telegram as _telegram
 
     logger = logging.getLogger(__name__)
 
@@ -41,85 +71,77 @@ def run_bot():
     backoff = 1
     max_backoff = 300
 
+    # Optional Prometheus endpoint; outlives updater restarts below
+    from bot.metrics import start_metrics_server
+    start_metrics_server()
+
     while True:
         try:
-            # Build a Request with timeouts and a small connection pool
+            # Build a Request with timeouts and a small connection pool; every API call is timed for /metrics
+            from bot.api_metrics import InstrumentedBot
             req = Request(con_pool_size=8, connect_timeout=5.0, read_timeout=20.0)
-            bot_instance = _telegram.Bot(token=config.Config.BOT_TOKEN, request=req)
+            bot_instance = InstrumentedBot(token=config.Config.BOT_TOKEN, base_url=config.Config.TELEGRAM_API_BASE, request=req)
 
             # Create Updater using the prepared Bot instance
             updater = Updater(bot=bot_instance, use_context=True)
             dp = updater.dispatcher
 
-                        # Register all command handlers
-            from .commands import start, help, bash, sudo, download, uploads, update, zerotier, ai, shutdown, git_info, kirim, torrent, jadwal
-            dp.add_handler(CommandHandler("start", start.start))
-            dp.add_handler(CommandHandler("help", help.help_command))
-            dp.add_handler(CommandHandler("bash", bash.bash))
-            dp.add_handler(CommandHandler("sudo", sudo.sudo))
-            dp.add_handler(CommandHandler("download", download.download))
-            dp.add_handler(CommandHandler("downloads", download.download_command))
-            dp.add_handler(CommandHandler("download_status", download.download_status))
-            dp.add_handler(CommandHandler("uploads", uploads.uploads))
-            dp.add_handler(CommandHandler("update", update.update))
-            dp.add_handler(CommandHandler("shutdown", shutdown.shutdown))
-            dp.add_handler(CommandHandler("zero_tier_status", zerotier.zero_tier_status))
-            dp.add_handler(CommandHandler("ai", ai.ai_command))
-            dp.add_handler(CommandHandler("ai_api", ai.ai_api_command))
-            dp.add_handler(CommandHandler("git_info", git_info.git_info))
-            dp.add_handler(CommandHandler("kirim", kirim.kirim))
-            dp.add_handler(CommandHandler("torrent", torrent.torrent))
-            dp.add_handler(CommandHandler("torrent_status", torrent.torrent_status_cmd))
-            dp.add_handler(CommandHandler("jadwal", jadwal.jadwal))
-            dp.add_handler(CommandHandler("upload_jadwal", jadwal.upload_jadwal))
-            dp.add_handler(CommandHandler("reminder_on", jadwal.reminder_on))
-            dp.add_handler(CommandHandler("reminder_off", jadwal.reminder_off))
-            dp.add_handler(CommandHandler("download_status", download.download_status))
-
-            # Handle callbacks for start command
-            from telegram.ext import CallbackQueryHandler
-            dp.add_handler(CallbackQueryHandler(start.handle_start_callback))
-
-            # Also accept legacy hyphen forms
-            dp.add_handler(MessageHandler(Filters.regex(r'^/zero-tier-status(\s|$)'), zerotier.zero_tier_status))
-            dp.add_handler(MessageHandler(Filters.regex(r'^/ai-api(\s|$)'), ai.ai_api_command))
-
-            # Register the command handlers in the commands dictionary too (for handle function)
-            register("start", start.start)
-            register("help", help.help_command)
-            register("bash", bash.bash)
-            register("sudo", sudo.sudo)
-            register("download", download.download)
-            register("uploads", uploads.uploads)
-            register("update", update.update)
-            register("shutdown", shutdown.shutdown)
-            register("zero_tier_status", zerotier.zero_tier_status)
-            register("ai", ai.ai_command)
-            register("ai_api", ai.ai_api_command)
-            register("git_info", git_info.git_info)
-            register("kirim", kirim.kirim)
-            register("torrent", torrent.torrent)
-            register("torrent_status", torrent.torrent_status_cmd)
-            register("download_status", download.download_status)
-            register("jadwal", jadwal.jadwal)
-            register("upload_jadwal", jadwal.upload_jadwal)
-            register("reminder_on", jadwal.reminder_on)
-            register("reminder_off", jadwal.reminder_off)
-            # Legacy hyphen support
-            register("zero-tier-status", zerotier.zero_tier_status)
-            register("ai-api", ai.ai_api_command)
-
-            # Add message handler for non-command text processing
-            dp.add_handler(MessageHandler(Filters.text & ~Filters.command, handle))
+            # Register all command handlers from the declarative registry
+            dispatcher = setup_handlers(dp)
+
+            # Load users/superusers now and watch user.csv and .env for edits
+            from bot.identity import get_identity_service
+            get_identity_service()
 
             # Add error handler
             from bot.bot import error_handler
             dp.add_error_handler(error_handler)
 
-            logger.info("Starting polling loop")
-            # Start polling; this will run until stopped or an exception bubbles up
-            updater.start_polling()  # will spawn threads and run
+            # Resume after the last fully handled update and skip ones already done
+            from bot.offsets import get_tracker
+            tracker = get_tracker()
+            tracker.install(dp)
+
+            # Optional anonymised capture of the update stream for bench/replay.py
+            from bot.recorder import start_recording
+            start_recording(dp)
+            dispatcher.tracker = tracker
+            if tracker.offset:
+                updater.last_update_id = tracker.offset + 1
+                logger.info(f"Resuming from update {tracker.offset + 1}")
+
+            # Snapshot the sources so /update can tell command-only changes from core ones
+            from bot.hot_reload import record_baseline
+            record_baseline()
+
+            # Command menu in the Telegram client, from the same registry as /help
+            try:
+                from bot.registry import bot_commands
+                bot_instance.set_my_commands(bot_commands())
+            except Exception as e:
+                logger.warning(f"setMyCommands failed: {e}")
+
+            # Pre-render static strings in the background
+            from bot.ai_wrapper import start_cache_warmup
+            start_cache_warmup()
+
+            # Prefer the webhook when configured; long polling stays the fallback
+            webhook = None
+            if config.Config.WEBHOOK_URL:
+                from bot.webhook import start_webhook
+                webhook = start_webhook(updater)
+            if webhook is None:
+                logger.info("Starting polling loop")
+                # Start polling; this will run until stopped or an exception bubbles up
+                updater.start_polling()  # will spawn threads and run
+            from bot import lifecycle
+            lifecycle.attach(updater, webhook)
             updater.idle()
+            if webhook is not None:
+                webhook.stop()
+            tracker.flush()
+            from bot import recorder
+            recorder.flush()
 
             # If we reach here normally, reset backoff and exit loop
             backoff = 1
@@ -0,0 +1,204 @@
+"""Per-command latency and throughput.
+
+The command dispatcher wraps every handler call in track(). For each
+command it records, in fixed-memory histograms:
+
+- queue: time between the update arriving and a worker starting it
+- wall: handler run time
+- ai_render, subprocess, telegram: the part of `wall` spent in that phase
+
+Phases are measured with phase() on the handler's own thread: ai_render()
+and InstrumentedBot time themselves, and bot.proc times the programs it
+runs (every command runs programs through it). Nested phases count for the
+outermost one only, so nothing is counted twice. Work a handler hands to
+other threads (outbox, live messages, background jobs) is not part of its
+wall time.
+
+snapshot() returns everything as a JSON-ready dict; /metrics json sends it
+and /update saves one to METRICS_SNAPSHOT_DIR before applying new code, so
+runs before and after an update can be compared.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from bot.config import Config
+from bot.metrics import Histogram, register_exporter
+
+PHASES = ('ai_render', 'subprocess', 'telegram')
+
+# Per-minute completion counts kept for the throughput column
+RATE_WINDOW_MINUTES = 15
+
+_started = time.time()
+_local = threading.local()
+_lock = threading.Lock()
+
+
+class _CommandStats:
+    __slots__ = ('queue', 'wall', 'phases', 'errors', 'minutes', 'minute')
+
+    def __init__(self):
+        self.queue = Histogram()
+        self.wall = Histogram()
+        self.phases = {name: Histogram() for name in PHASES}
+        self.errors = 0
+        self.minutes = [0] * RATE_WINDOW_MINUTES
+        self.minute = int(time.time() // 60)
+
+    def _roll(self, now: float):
+        # Clear the slots of minutes that passed without completions
+        minute = int(now // 60)
+        for m in range(self.minute + 1, min(minute, self.minute + RATE_WINDOW_MINUTES) + 1):
+            self.minutes[m % RATE_WINDOW_MINUTES] = 0
+        self.minute = max(self.minute, minute)
+
+    def count_completion(self, now: float):
+        self._roll(now)
+        self.minutes[self.minute % RATE_WINDOW_MINUTES] += 1
+
+    def recent_rate(self, now: float) -> float:
+        """Completions per minute over the last RATE_WINDOW_MINUTES"""
+        self._roll(now)
+        return sum(self.minutes) / RATE_WINDOW_MINUTES
+
+
+_commands: Dict[str, _CommandStats] = {}
+
+
+@contextmanager
+def phase(name: str):
+    """Attribute the time spent inside to `name` for the command running on this thread"""
+    spans = getattr(_local, 'spans', None)
+    if spans is None or getattr(_local, 'phase', None) is not None:
+        yield
+        return
+    _local.phase = name
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.phase = None
+        spans[name] = spans.get(name, 0.0) + time.perf_counter() - started
+
+
+@contextmanager
+def track(command: str, queued_at: Optional[float] = None):
+    """Measure one handler call; queued_at is the time.monotonic() of arrival"""
+    started = time.monotonic()
+    outer = getattr(_local, 'spans', None)
+    _local.spans = spans = {}
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        wall = time.monotonic() - started
+        _local.spans = outer
+        with _lock:
+            stats = _commands.get(command)
+            if stats is None:
+                stats = _commands[command] = _CommandStats()
+            if queued_at is not None:
+                stats.queue.observe(max(0.0, started - queued_at))
+            stats.wall.observe(wall)
+            for name in PHASES:
+                stats.phases[name].observe(spans.get(name, 0.0))
+            if failed:
+                stats.errors += 1
+            stats.count_completion(time.time())
+
+
+def stats() -> Dict[str, Dict[str, object]]:
+    """Per-command summaries (seconds): queue, wall, phases, errors and throughput"""
+    now = time.time()
+    with _lock:
+        return {
+            command: {
+                'queue': st.queue.summary(),
+                'wall': st.wall.summary(),
+                'phases': {name: h.summary() for name, h in st.phases.items()},
+                'errors': st.errors,
+                'per_minute': st.recent_rate(now),
+            }
+            for command, st in _commands.items()
+        }
+
+
+def reset():
+    """Forget every command's numbers (bench/commands.py drops its warm-up round this way)"""
+    with _lock:
+        _commands.clear()
+
+
+def snapshot() -> Dict[str, object]:
+    """Everything /metrics knows, as a JSON-ready dict"""
+    from bot import api_metrics, live_message
+    from bot.dispatch import get_dispatcher
+    from bot.jobs import get_jobs
+    from bot.outbox import get_outbox
+
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'uptime': time.time() - _started,
+        'commit': _commit(),
+        'commands': stats(),
+        'telegram_api': api_metrics.stats(),
+        'dispatch': get_dispatcher().stats(),
+        'outbox': get_outbox().stats(),
+        'live_messages': live_message.stats(),
+        'jobs': get_jobs().stats(),
+    }
+
+
+def _commit() -> str:
+    from bot import proc
+
+    try:
+        return proc.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=Config.BASE_DIR, timeout=5).strip()
+    except Exception:
+        return ''
+
+
+def save_snapshot(reason: str) -> Optional[str]:
+    """Write snapshot() to METRICS_SNAPSHOT_DIR; returns the path, None on failure"""
+    data = snapshot()
+    name = f"metrics-{time.strftime('%Y%m%d-%H%M%S')}-{data['commit'] or 'nogit'}-{reason}.json"
+    path = os.path.join(Config.METRICS_SNAPSHOT_DIR, name)
+    try:
+        os.makedirs(Config.METRICS_SNAPSHOT_DIR, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+    except OSError:
+        return None
+    return path
+
+
+def prometheus_lines() -> List[str]:
+    lines = []
+    with _lock:
+        items = sorted(_commands.items())
+        for metric, help_text, pick in (
+                ('bot_command_queue_seconds', 'Time from update arrival to handler start', lambda st: st.queue),
+                ('bot_command_seconds', 'Handler wall time', lambda st: st.wall)):
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} histogram']
+            for command, st in items:
+                lines += pick(st).prometheus(metric, f'command="{command}"')
+        lines += ['# HELP bot_command_phase_seconds_total Handler time spent per phase',
+                  '# TYPE bot_command_phase_seconds_total counter']
+        for command, st in items:
+            for name, h in st.phases.items():
+                lines.append(f'bot_command_phase_seconds_total{{command="{command}",phase="{name}"}} {h.sum:.6f}')
+        lines += ['# HELP bot_command_errors_total Handlers that raised',
+                  '# TYPE bot_command_errors_total counter']
+        for command, st in items:
+            lines.append(f'bot_command_errors_total{{command="{command}"}} {st.errors}')
+    return lines
+
+
+register_exporter(prometheus_lines)
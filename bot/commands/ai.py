@@ -1,13 +1,29 @@
 import os
+import html
+import time
 import requests
 from telegram import Update
 from telegram.ext import CallbackContext
 from bot.config import Config
-from bot.ai_wrapper import ai_render, ai_send_message
+from bot.ai_wrapper import ai_render, ai_send_message, render_status, submit_background
+from bot.gemini_client import get_client, extract_text
+from bot.gemini_scheduler import BACKGROUND
+from bot.conversation import ConversationStore
 
 # Store API keys per user (in memory - resets on bot restart)
 user_api_keys = {}
 
+# Per-user /ai history, bounded in users, turns and tokens
+conversations = ConversationStore(
+    max_users=Config.AI_HISTORY_MAX_USERS,
+    max_tokens=Config.AI_HISTORY_MAX_TOKENS,
+    max_turns=Config.AI_HISTORY_MAX_TURNS,
+    idle_ttl=Config.AI_HISTORY_IDLE_TTL,
+)
+
+# Telegram allows 4096 characters per message; keep some headroom
+STREAM_MESSAGE_LIMIT = 4000
+
 # Default Character template for AI responses
 _DEFAULT_AI_TEMPLATE = """Kamu adalah seorang cewe anime dengan kepribadian seperti kakak perempuan (onee-san) namamu violet. 
 Sifatmu sangat perhatian, lembut, menenangkan, dan selalu ingin mendukung lawan bicara. 
@@ -17,8 +33,65 @@ Balasanmu sebaiknya hangat, sedikit playful, dan menenangkan hati.
 
 Pertanyaan: """
 
-# Gemini API v1beta endpoint
-API_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+class _StreamingReply:
+    """Show a streamed answer by editing one Telegram message as chunks arrive.
+
+    Edits are throttled to AI_STREAM_EDIT_INTERVAL seconds to stay inside
+    Telegram's edit rate limits. Text beyond one message is split at a line
+    break and continued in a new message instead of being truncated.
+    """
+
+    def __init__(self, message, max_len: int = STREAM_MESSAGE_LIMIT):
+        self.message = message
+        self.max_len = max_len
+        self.current = None  # telegram.Message being edited
+        self.text = ''       # text belonging to the current message
+        self.shown = ''      # text last pushed to Telegram for the current message
+        self.last_edit = 0.0
+        self.started = False
+        self.full_text = ''
+
+    def feed(self, chunk: str):
+        self.full_text += chunk
+        self.text += chunk
+        while len(self.text) > self.max_len:
+            # Prefer splitting at a line break, then at a space
+            cut = self.text.rfind('\n', 0, self.max_len)
+            if cut < self.max_len // 2:
+                cut = self.text.rfind(' ', 0, self.max_len)
+            if cut < self.max_len // 2:
+                cut = self.max_len
+            head, self.text = self.text[:cut], self.text[cut:].lstrip()
+            self._push(head, force=True)
+            # Next chunk starts a continuation message
+            self.current = None
+            self.shown = ''
+        self._push(self.text)
+
+    def _push(self, text: str, force: bool = False):
+        if not text.strip() or text == self.shown:
+            return
+        now = time.monotonic()
+        if self.current is not None and not force and now - self.last_edit < Config.AI_STREAM_EDIT_INTERVAL:
+            return
+        if self.current is None:
+            self.current = self.message.reply_text(text)
+            self.started = True
+        else:
+            try:
+                self.current.edit_text(text)
+            except Exception:
+                # e.g. "message is not modified" or flood control; the next edit catches up
+                return
+        self.shown = text
+        self.last_edit = now
+
+    def finish(self, suffix: str = '') -> bool:
+        """Flush the remaining text; returns False if nothing was ever sent"""
+        if suffix:
+            self.text += suffix
+        self._push(self.text, force=True)
+        return self.started
 
 
 def _get_template():
@@ -28,6 +101,46 @@ def _get_template():
     return _DEFAULT_AI_TEMPLATE
 
 
+def _build_payload(user_id: int, prompt: str) -> dict:
+    """Build a multi-turn request: persona and summary as system instruction,
+    then the stored turns and the new prompt"""
+    system = _get_template().strip()
+    if system.endswith('Pertanyaan:'):
+        system = system[:-len('Pertanyaan:')].rstrip()
+    summary, turns = conversations.history(user_id)
+    if summary:
+        system += "\n\nRingkasan percakapan sebelumnya:\n" + summary
+
+    contents = [{"role": role, "parts": [{"text": turn}]} for role, turn in turns]
+    contents.append({"role": "user", "parts": [{"text": prompt}]})
+    return {
+        "systemInstruction": {"parts": [{"text": system}]},
+        "contents": contents,
+    }
+
+
+def _summarize(api_key: str, summary: str, turns) -> str:
+    """Ask Gemini (background lane) to fold old turns into the running summary"""
+    transcript = '\n'.join(f"{'Pengguna' if role == 'user' else 'Violet'}: {text}" for role, text in turns)
+    prompt = ("Ringkas percakapan berikut dalam maksimal 5 kalimat bahasa Indonesia. "
+              "Pertahankan fakta, nama, dan permintaan penting dari pengguna.\n\n")
+    if summary:
+        prompt += f"Ringkasan sebelumnya:\n{summary}\n\n"
+    prompt += f"Percakapan:\n{transcript}"
+    payload = {"contents": [{"parts": [{"text": prompt}]}]}
+    data = get_client().generate(payload, api_key, timeout=Config.AI_RENDER_BUDGET,
+                                 priority=BACKGROUND, max_wait=Config.AI_RENDER_MAX_QUEUE_WAIT * 5)
+    return extract_text(data)
+
+
+def ai_reset_command(update: Update, context: CallbackContext):
+    """Handle /ai_reset — forget this user's /ai conversation history"""
+    if conversations.reset(update.effective_user.id):
+        ai_send_message(update, "**🧹 Riwayat percakapan dihapus.** Kita mulai dari awal ya~")
+    else:
+        ai_send_message(update, "**💤 Belum ada riwayat percakapan.**")
+
+
 def ai_api_command(update: Update, context: CallbackContext):
     """Handle /ai_api <key> — set user's API key"""
     # Check if global API key is available
@@ -84,56 +197,78 @@ def ai_command(update: Update, context: CallbackContext):
         ai_send_message(update, "**❌ Format:** /ai <pertanyaan atau prompt>\n__Contoh:__ /ai Jelaskan ZeroTier secara singkat.")
         return
 
-    # Combine template with user prompt
-    template = _get_template()
-    full_prompt = template + text
-
-    # Build request body for Gemini API
-    payload = {
-        "contents": [
-            {
-                "parts": [
-                    {
-                        "text": full_prompt
-                    }
-                ]
-            }
-        ]
-    }
-
-    headers = {
-        'Content-Type': 'application/json',
-        'X-goog-api-key': api_key
-    }
+    # Persona goes in the system instruction; earlier turns (and a summary of
+    # older ones) are sent as conversation contents
+    payload = _build_payload(user_id, text)
 
+    # Stream the answer straight into Telegram; no extra ai_render pass
+    reply = _StreamingReply(update.message)
     try:
         # Show typing indicator
         context.bot.send_chat_action(chat_id=update.effective_chat.id, action='typing')
-        
-        resp = requests.post(API_BASE_URL, json=payload, headers=headers, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
-
-        # Parse Gemini API response
-        answer = None
-        if isinstance(data, dict):
-            candidates = data.get('candidates', [])
-            if candidates and isinstance(candidates, list):
-                first_candidate = candidates[0]
-                content = first_candidate.get('content', {})
-                parts = content.get('parts', [])
-                if parts and isinstance(parts, list):
-                    answer = parts[0].get('text', '')
-
-        if not answer:
-            answer = f"**❌ Tidak ada respons yang valid dari AI.**\n\nRaw response:\n```\n{str(data)}```"
-
-        # Trim and send (Telegram limit ~4096)
-        max_len = 3900
-        if len(answer) > max_len:
-            answer = answer[:max_len] + '\n\n__(truncated)__'
-        ai_send_message(update, answer)
+
+        for chunk in get_client().stream_generate(payload, api_key, timeout=30):
+            reply.feed(chunk)
+        if not reply.finish():
+            ai_send_message(update, "**❌ Tidak ada respons yang valid dari AI.**")
+            return
+        conversations.add_exchange(user_id, text, reply.full_text)
+        if conversations.needs_compaction(user_id):
+            # On the render pool: the chat's next updates wait for this handler to return
+            submit_background(conversations.compact, user_id,
+                              lambda summary, turns: _summarize(api_key, summary, turns))
     except requests.exceptions.RequestException as e:
-        ai_send_message(update, f"**❌ Gagal memanggil API AI:** {e}")
+        if reply.started:
+            reply.finish(suffix=f"\n\n❌ Stream terputus: {e}")
+        else:
+            ai_send_message(update, f"**❌ Gagal memanggil API AI:** {e}")
     except Exception as e:
         ai_send_message(update, f"**❌ Error:** {e}")
+
+
+def ai_status_command(update: Update, context: CallbackContext):
+    """Handle /ai_status — show render circuit breaker state and cache counters.
+    Sent without ai_render so it stays readable while Gemini is down."""
+    status = render_status()
+    breaker = status['breaker']
+    cache = status['cache']
+    conv = conversations.stats()
+
+    state_icon = {'closed': '🟢', 'half_open': '🟡', 'open': '🔴'}.get(breaker['state'], '⚪')
+    avg = f"{breaker['avg_latency']:.2f}s" if breaker['avg_latency'] is not None else '-'
+    last = f"{breaker['last_latency']:.2f}s" if breaker['last_latency'] is not None else '-'
+
+    lines = [
+        "<b>🤖 AI Render Status</b>",
+        "",
+        f"<b>Breaker:</b> {state_icon} <code>{breaker['state']}</code>",
+        f"<b>Gagal terakhir:</b> {breaker['recent_failures']}/{breaker['window']}",
+        f"<b>Latency rata-rata:</b> <code>{avg}</code> (terakhir <code>{last}</code>)",
+        f"<b>Budget:</b> <code>{Config.AI_RENDER_BUDGET:.1f}s</code>",
+    ]
+    if breaker['state'] == 'open':
+        lines.append(f"<b>Cooldown:</b> {breaker['cooldown_remaining']:.0f} detik lagi (pesan dikirim tanpa AI)")
+    if breaker['last_error']:
+        lines.append(f"<b>Error terakhir:</b> <code>{html.escape(str(breaker['last_error'])[:200])}</code>")
+    lines += [
+        f"<b>Total panggilan:</b> {breaker['total_calls']} (gagal {breaker['total_failures']}, dilewati {breaker['short_circuited']})",
+        "",
+        f"<b>Cache:</b> {cache['size']}/{cache['max_size']} entri, hit {cache['hits']} / miss {cache['misses']} ({cache['hit_ratio'] * 100:.0f}%)",
+        f"<b>Riwayat /ai:</b> {conv['users']}/{conv['max_users']} pengguna, ~{conv['tokens']} token, "
+        f"{conv['summaries']} ringkasan, {conv['evicted']} dibuang",
+        f"<b>Coalescing:</b> {status['inflight']['coalesced']} render digabung ke {status['inflight']['executions']} panggilan",
+    ]
+    sched = status['scheduler']
+    lines += [
+        "",
+        f"<b>Kuota Gemini:</b> {sched['tokens']:.1f}/{sched['capacity']:.0f} token ({sched['rate_per_min']:.0f}/menit)",
+    ]
+    for name, lane in sched['lanes'].items():
+        lines.append(f"• <code>{name}</code>: antri {lane['depth']}, dilayani {lane['granted']}, "
+                     f"dibatalkan {lane['dropped']}, tunggu rata-rata {lane['avg_wait']:.2f}s "
+                     f"(p95 {lane['p95_wait']:.2f}s, maks {lane['max_wait']:.2f}s)")
+    deferred = status['deferred']
+    if deferred['mode'] == 'deferred':
+        lines.append(f"<b>Deferred render:</b> diterapkan {deferred['applied']}, basi {deferred['stale']}, "
+                     f"tergantikan {deferred['superseded']}, gagal {deferred['failed']}")
+    update.message.reply_text("\n".join(lines), parse_mode="HTML")
@@ -5,10 +5,10 @@ import threading
 from pathlib import Path
 from telegram import Update
 from telegram.ext import CallbackContext
-from bot.command_handler import register
 from bot.config import DOWNLOAD_DIR
 import requests
-from bot.ai_wrapper import ai_render
+from bot.ai_wrapper import ai_render, ai_send_message, ai_send_to_chat
+from bot.live_message import LiveMessage
 
 # Ensure download directory exists
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
@@ -26,8 +26,10 @@ def _human_readable(size_bytes):
 
 
 def _monitor_by_files(process, start_time, url, chat_id, bot):
-    """Monitor download by polling file sizes in DOWNLOAD_DIR"""
-    last_sent = 0
+    """Monitor download by polling file sizes in DOWNLOAD_DIR; progress is
+    shown in one live message, the results below are posted as new messages"""
+    live = LiveMessage(bot, chat_id, ai_render(f"⏬ Mendownload {url}", kind='progress'), parse_mode="HTML")
+    total_size = 0
     try:
         while process.poll() is None:
             total_size = 0
@@ -37,23 +39,14 @@ def _monitor_by_files(process, start_time, url, chat_id, bot):
                     total_size += file_path.stat().st_size
                     if not newest_file or file_path.stat().st_mtime > newest_file.stat().st_mtime:
                         newest_file = file_path
-            now = time.time()
-            if now - last_sent > 5:
-                size_hr = _human_readable(total_size)
-                msg = f"masih mendownload total {size_hr}"
-                if newest_file:
-                    msg += f"  file terbaru: {newest_file.name}"
-                try:
-                    bot.send_message(chat_id=chat_id, text=ai_render(msg))
-                except Exception:
-                    pass
-                last_sent = now
+            msg = f"masih mendownload total {_human_readable(total_size)}"
+            if newest_file:
+                msg += f"  file terbaru: {newest_file.name}"
+            live.update(ai_render(msg, kind='progress'))
             time.sleep(2)
     except Exception as e:
-        try:
-            bot.send_message(chat_id=chat_id, text=ai_render(f"❌ Error monitoring download: {e}"))
-        except Exception:
-            pass
+        ai_send_to_chat(bot, chat_id, f"❌ Error monitoring download: {e}", kind='error')
+    live.close(ai_render(f"⏹️ Proses download berakhir (exit code {process.poll()})", kind='progress'))
 
     # Finalize when process ends
     try:
@@ -63,7 +56,7 @@ def _monitor_by_files(process, start_time, url, chat_id, bot):
                 downloaded_files.append(file_path)
 
         if not downloaded_files:
-            bot.send_message(chat_id=chat_id, text=ai_render("✅ Download selesai tetapi tidak ditemukan file baru."))
+            ai_send_to_chat(bot, chat_id, "✅ Download selesai tetapi tidak ditemukan file baru.")
             last_download.update({'url': url, 'status': 'completed', 'files': []})
             return
 
@@ -75,7 +68,7 @@ def _monitor_by_files(process, start_time, url, chat_id, bot):
             if file_size_mb < 500:
                 try:
                     try:
-                        bot.send_message(chat_id=chat_id, text=ai_render(f"✅ Download selesai: {file_path.name} ({file_size_mb:.2f} MB)\nMengirim file via Telegram..."))
+                        ai_send_to_chat(bot, chat_id, f"✅ Download selesai: {file_path.name} ({file_size_mb:.2f} MB)\nMengirim file via Telegram...")
                     except Exception:
                         pass
                     with open(file_path, 'rb') as f:
@@ -87,19 +80,19 @@ def _monitor_by_files(process, start_time, url, chat_id, bot):
                     last_download.update({'url': url, 'status': 'completed', 'files': [str(p) for p in downloaded_files]})
                 except Exception as e:
                     try:
-                        bot.send_message(chat_id=chat_id, text=ai_render(f"❌ Gagal mengirim file {file_path.name}: {e}"))
+                        ai_send_to_chat(bot, chat_id, f"❌ Gagal mengirim file {file_path.name}: {e}", kind='error')
                     except Exception:
                         pass
                     last_download.update({'url': url, 'status': 'completed', 'files': [str(p) for p in downloaded_files]})
             else:
                 try:
-                    bot.send_message(chat_id=chat_id, text=ai_render(f"✅ Download selesai: {file_path.name} ({file_size_mb:.2f} MB)\nℹ️ File terlalu besar untuk dikirim via Telegram (>500MB). Disimpan di server: {file_path}"))
+                    ai_send_to_chat(bot, chat_id, f"✅ Download selesai: {file_path.name} ({file_size_mb:.2f} MB)\nℹ️ File terlalu besar untuk dikirim via Telegram (>500MB). Disimpan di server: {file_path}")
                 except Exception:
                     pass
                 last_download.update({'url': url, 'status': 'completed', 'files': [str(p) for p in downloaded_files]})
     except Exception as e:
         try:
-            bot.send_message(chat_id=chat_id, text=ai_render(f"❌ Error saat memproses hasil download: {e}"))
+            ai_send_to_chat(bot, chat_id, f"❌ Error saat memproses hasil download: {e}", kind='error')
         except Exception:
             pass
 
@@ -109,12 +102,12 @@ def download_command(update: Update, context: CallbackContext):
     message_text = update.message.text
     parts = message_text.split(maxsplit=1)
     if len(parts) < 2:
-        update.message.reply_text(ai_render("❌ Format: /download <URL>\nContoh: /download https://example.com/file.zip"))
+        ai_send_message(update, "❌ Format: /download <URL>\nContoh: /download https://example.com/file.zip")
         return
 
     url = parts[1].strip()
     if not url or not (url.startswith('http://') or url.startswith('https://')):
-        update.message.reply_text(ai_render("❌ URL tidak valid. Harus diawali http:// atau https://"))
+        ai_send_message(update, "❌ URL tidak valid. Harus diawali http:// atau https://")
         return
 
     try:
@@ -132,10 +125,10 @@ def download_command(update: Update, context: CallbackContext):
         # Do not capture stdout; we'll monitor by file sizes instead
         proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     except FileNotFoundError:
-        update.message.reply_text(ai_render("❌ aria2c tidak ditemukan. Pasang aria2c di server."))
+        ai_send_message(update, "❌ aria2c tidak ditemukan. Pasang aria2c di server.")
         return
     except Exception as e:
-        update.message.reply_text(ai_render(f"❌ Gagal memulai download: {e}"))
+        ai_send_message(update, f"❌ Gagal memulai download: {e}")
         return
 
     chat_id = update.effective_chat.id
@@ -144,11 +137,11 @@ def download_command(update: Update, context: CallbackContext):
     last_download.update({'url': url, 'start_time': start_time, 'status': 'downloading'})
 
     try:
-        update.message.reply_text(ai_render(f"⏬ Download dimulai untuk URL: {url}\n📂 Lokasi: {DOWNLOAD_DIR}\nSaya akan mengirim progress berkala dan mengirim file jika ukurannya <500MB setelah selesai."))
+        ai_send_message(update, f"⏬ Download dimulai untuk URL: {url}\n📂 Lokasi: {DOWNLOAD_DIR}\nProgress ditampilkan di satu pesan yang diperbarui, file dikirim jika ukurannya <500MB setelah selesai.")
     except Exception:
         # Fallback plain text without any markup
         try:
-            update.message.reply_text(ai_render("⏬ Download dimulai. Cek progress nanti."))
+            ai_send_message(update, "⏬ Download dimulai. Cek progress nanti.")
         except Exception:
             pass
 
@@ -160,7 +153,7 @@ def download_command(update: Update, context: CallbackContext):
 def download(update: Update, context: CallbackContext):
     """Handler for /download command"""
     if not context.args:
-        update.message.reply_text(ai_render('❌ Perintah download memerlukan URL sebagai argumen.\nContoh: /download https://example.com/file.zip'))
+        ai_send_message(update, '❌ Perintah download memerlukan URL sebagai argumen.\nContoh: /download https://example.com/file.zip')
         return
     
     url = context.args[0]
@@ -174,7 +167,7 @@ def download(update: Update, context: CallbackContext):
         os.makedirs(DOWNLOAD_DIR, exist_ok=True)
         
         # Download file
-        update.message.reply_text(ai_render(f"🔄 Mengunduh {url}..."))
+        ai_send_message(update, f"🔄 Mengunduh {url}...")
         
         response = requests.get(url, stream=True, timeout=60)
         response.raise_for_status()
@@ -192,16 +185,16 @@ def download(update: Update, context: CallbackContext):
         # Report success
         if total_size > 0:
             size_mb = total_size / (1024 * 1024)
-            update.message.reply_text(ai_render(f"✅ File berhasil diunduh: {filename} ({size_mb:.2f} MB)"))
+            ai_send_message(update, f"✅ File berhasil diunduh: {filename} ({size_mb:.2f} MB)")
         else:
             # Get file size from saved file
             size_mb = os.path.getsize(file_path) / (1024 * 1024)
-            update.message.reply_text(ai_render(f"✅ File berhasil diunduh: {filename} ({size_mb:.2f} MB)"))
+            ai_send_message(update, f"✅ File berhasil diunduh: {filename} ({size_mb:.2f} MB)")
             
     except requests.exceptions.RequestException as e:
-        update.message.reply_text(ai_render(f"❌ Gagal mengunduh file: {str(e)}"))
+        ai_send_message(update, f"❌ Gagal mengunduh file: {str(e)}")
     except Exception as e:
-        update.message.reply_text(ai_render(f"❌ Error: {str(e)}"))
+        ai_send_message(update, f"❌ Error: {str(e)}")
 
 
 def download_status(update: Update, context: CallbackContext):
@@ -232,9 +225,4 @@ def download_status(update: Update, context: CallbackContext):
                 pass
     else:
         msg = "**💤 Tidak ada download aktif**"
-    ai_rendered = ai_render(msg)
-    update.message.reply_text(ai_rendered, parse_mode="HTML")
-
-
-# Register command
-register("download", download_command)
\ No newline at end of file
+    ai_send_message(update, msg, kind='status')
@@ -3,8 +3,12 @@ import subprocess
 import os
 from telegram import Update
 from telegram.ext import CallbackContext
+from bot import proc
 from bot.ai_wrapper import ai_render, ai_send_message
 
+# Seconds before a hanging git call (e.g. a stuck index lock) is killed
+GIT_TIMEOUT = 30
+
 def git_info(update: Update, context: CallbackContext):
     """Handle /git_info command - Show current git status and info"""
     
@@ -14,31 +18,31 @@ def git_info(update: Update, context: CallbackContext):
     try:
         # Check if git repository
         try:
-            subprocess.check_output(['git', 'rev-parse', '--is-inside-work-tree'], cwd=repo_dir, stderr=subprocess.DEVNULL)
+            proc.check_output(['git', 'rev-parse', '--is-inside-work-tree'], cwd=repo_dir, timeout=GIT_TIMEOUT)
         except subprocess.CalledProcessError:
             update.message.reply_text("<b>❌ Error:</b> Bukan repository git yang valid.", parse_mode="HTML")
             return
         
         # Get branch info
-        branch = subprocess.check_output(
-            ['git', 'rev-parse', '--abbrev-ref', 'HEAD'], 
-            cwd=repo_dir, 
-            text=True
+        branch = proc.check_output(
+            ['git', 'rev-parse', '--abbrev-ref', 'HEAD'],
+            cwd=repo_dir,
+            timeout=GIT_TIMEOUT
         ).strip()
         
         # Get stash info
-        stash_list = subprocess.check_output(
+        stash_list = proc.check_output(
             ['git', 'stash', 'list'],
             cwd=repo_dir,
-            text=True
+            timeout=GIT_TIMEOUT
         ).strip().split('\n')
         stash_count = len([s for s in stash_list if s])
         
         # Get status (modified files, etc)
-        status = subprocess.check_output(
+        status = proc.check_output(
             ['git', 'status', '--porcelain'],
             cwd=repo_dir,
-            text=True
+            timeout=GIT_TIMEOUT
         ).strip().split('\n')
         
         modified_files = [f for f in status if f.startswith(' M') or f.startswith('M ')]
@@ -78,10 +82,10 @@ def git_info(update: Update, context: CallbackContext):
             result.append("")
         
         # Get latest commit info
-        commit_info = subprocess.check_output(
+        commit_info = proc.check_output(
             ['git', 'log', '-1', '--pretty=format:%h - %s (%an, %ar)'],
             cwd=repo_dir,
-            text=True
+            timeout=GIT_TIMEOUT
         ).strip()
         
         result.append("**🔄 Latest commit:**")
@@ -92,12 +96,3 @@ def git_info(update: Update, context: CallbackContext):
         
     except Exception as e:
         ai_send_message(update, f"**❌ Error:** {str(e)}")
-
-def register_git_info(dp):
-    """Register the git_info command with the dispatcher"""
-    from telegram.ext import CommandHandler
-    dp.add_handler(CommandHandler("git_info", git_info))
-    
-    # Add to command registry
-    from bot.command_handler import register
-    register("git_info", git_info)
\ No newline at end of file
@@ -1,18 +1,20 @@
 from telegram import Update
 from telegram.ext import CallbackContext
-from bot.config import Config
 import os
 from bot.ai_wrapper import ai_send_message, ai_render
+from bot import registry
+from bot.identity import identity
 
 RAW_HELP_URL = 'https://github.com/widy4aa/bot_server/blob/main/help.md'
 
 
 def help_command(update: Update, context: CallbackContext):
-    """Handler for /help command - redirect to GitHub and use AI for friendly intro"""
-    user_id = update.effective_user.id
-    is_super = user_id in Config.SUPERUSER_IDS
+    """Handler for /help command - command list from the registry plus a link to the full docs"""
+    roles = identity().roles(update.effective_user.id)
 
-    intro = f"Silakan lihat dokumentasi lengkap di: <a href='{RAW_HELP_URL}'>GitHub Documentation</a>\n\nKetik /start untuk melihat menu utama."
+    intro = (f"{registry.help_text(roles)}\n\n"
+             f"Dokumentasi lengkap: <a href='{RAW_HELP_URL}'>GitHub Documentation</a>\n"
+             f"Ketik /start untuk melihat menu utama.")
     
     # Handle both callback queries and regular messages
     if hasattr(update, 'callback_query') and update.callback_query:
@@ -5,7 +5,7 @@ import re
 from telegram import Update
 from telegram.ext import CallbackContext
 from bot.config import Config
-from bot.ai_wrapper import ai_send_message, ai_render
+from bot.ai_wrapper import ai_send_message, ai_send_to_chat
 import logging
 
 try:
@@ -100,8 +100,7 @@ def _send_daily_reminder():
         msg_parts.append("💡 _Semangat untuk hari ini!_ 📚✨")
         
         message = "\n".join(msg_parts)
-        rendered = ai_render(message)
-        _bot_instance.send_message(chat_id=_reminder_chat_id, text=rendered, parse_mode="HTML")
+        ai_send_to_chat(_bot_instance, _reminder_chat_id, message, kind='reminder')
         
     except Exception as e:
         logger.exception(f"Error sending daily reminder: {e}")
@@ -114,8 +113,7 @@ def _send_class_reminder(class_info):
     try:
         message = f"⏰ **Pengingat Kelas!**\n\n**{class_info['Matakuliah']}** akan dimulai dalam 20 menit\n\n🕐 `{class_info['Jam']}`\n📚 `{class_info['Kode']}` - Kelas `{class_info['Kelas']}`\n📍 `{class_info['Ruang']}`\n\n💼 _Jangan lupa siapkan keperluan kuliah!_"
         
-        rendered = ai_render(message)
-        _bot_instance.send_message(chat_id=_reminder_chat_id, text=rendered, parse_mode="HTML")
+        ai_send_to_chat(_bot_instance, _reminder_chat_id, message, kind='reminder')
         
     except Exception as e:
         logger.exception(f"Error sending class reminder: {e}")
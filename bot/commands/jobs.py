@@ -0,0 +1,84 @@
+import html
+import time
+
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from bot.identity import identity
+from bot.jobs import FINISHED, get_jobs
+
+# Characters of output per /output page
+OUTPUT_PAGE = 3500
+
+_STATE_ICONS = {'queued': '⏳', 'running': '▶️', 'done': '✅', 'failed': '❌', 'killed': '🛑', 'timeout': '⏱️'}
+
+
+def _can_manage(user_id: int, job) -> bool:
+    # Anyone may see and stop their own jobs; owner and superusers may touch every job
+    ident = identity()
+    return job.user_id == user_id or ident.is_owner(user_id) or ident.is_superuser(user_id)
+
+
+def _job_arg(update: Update, context: CallbackContext, usage: str):
+    """The job named in the first argument, or None after replying why not"""
+    if not context.args or not context.args[0].lstrip('#').isdigit():
+        update.message.reply_text(f"<b>Format:</b> <code>{usage}</code>", parse_mode="HTML")
+        return None
+    job_id = int(context.args[0].lstrip('#'))
+    job = get_jobs().get(job_id)
+    if job is None or not _can_manage(update.effective_user.id, job):
+        update.message.reply_text(f"❌ Job #{job_id} tidak ditemukan.")
+        return None
+    return job
+
+
+def jobs_command(update: Update, context: CallbackContext):
+    """Handle /jobs — list running, queued and recent jobs"""
+    manager = get_jobs()
+    user_id = update.effective_user.id
+    jobs = [job for job in manager.jobs() if _can_manage(user_id, job)]
+    st = manager.stats()
+    lines = [f"<b>🧰 Job</b> — berjalan {st['running']}/{st['max_running']}, antre {st['queued']}"]
+    if not jobs:
+        lines.append("Belum ada job.")
+    else:
+        rows = []
+        for job in reversed(jobs):
+            ended = time.strftime('%H:%M', time.localtime(job.finished_at)) if job.state in FINISHED else ''
+            rows.append(f"#{job.id:<4d} {_STATE_ICONS.get(job.state, '')}{job.state:8s} {job.duration:6.0f}s "
+                        f"{ended:5s} {job.command[:40]}")
+        lines.append("<pre>" + html.escape("\n".join(rows)) + "</pre>")
+        lines.append("<i>/output &lt;id&gt; [halaman] untuk output, /kill &lt;id&gt; untuk menghentikan</i>")
+    update.message.reply_text("\n".join(lines), parse_mode="HTML")
+
+
+def kill_command(update: Update, context: CallbackContext):
+    """Handle /kill <id> — cancel a queued job or stop a running one"""
+    job = _job_arg(update, context, '/kill <id>')
+    if job is None:
+        return
+    if get_jobs().kill(job.id):
+        update.message.reply_text(f"🛑 Menghentikan job #{job.id}...")
+    else:
+        update.message.reply_text(f"Job #{job.id} sudah selesai ({job.state}).")
+
+
+def output_command(update: Update, context: CallbackContext):
+    """Handle /output <id> [page] — page through a job's buffered output (newest page by default)"""
+    job = _job_arg(update, context, '/output <id> [halaman]')
+    if job is None:
+        return
+    text = job.output.text()
+    pages = max(1, (len(text) + OUTPUT_PAGE - 1) // OUTPUT_PAGE)
+    page = pages
+    if len(context.args) > 1:
+        try:
+            page = min(max(1, int(context.args[1])), pages)
+        except ValueError:
+            pass
+    chunk = text[(page - 1) * OUTPUT_PAGE:page * OUTPUT_PAGE]
+    header = f"<b>#{job.id}</b> <code>{html.escape(job.command[:100])}</code> — {job.state}, halaman {page}/{pages}"
+    if job.output.dropped:
+        header += f"\n<i>{job.output.dropped} karakter awal sudah dibuang (batas buffer)</i>"
+    body = f"<pre>{html.escape(chunk)}</pre>" if chunk else "<i>(belum ada output)</i>"
+    update.message.reply_text(f"{header}\n{body}", parse_mode="HTML")
@@ -0,0 +1,79 @@
+import html
+import io
+import json
+import time
+
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from bot import api_metrics, command_metrics
+from bot.identity import identity
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.0f}ms" if seconds < 10 else f"{seconds:.0f}s"
+
+
+def _size(n: float) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if n < 1024:
+            return f"{n:.0f}{unit}"
+        n /= 1024
+    return f"{n:.1f}GB"
+
+
+def api_report() -> list:
+    """Lines for the Bot API section, busiest methods first"""
+    stats = api_metrics.stats()
+    lines = ["<b>📡 Telegram Bot API</b>"]
+    if not stats:
+        return lines + ["Belum ada panggilan."]
+    rows = []
+    for method, st in sorted(stats.items(), key=lambda kv: -kv[1]['count']):
+        rows.append(f"{method[:22]:22s} {st['count']:>6d} {st['errors']:>4d} {st['retry_after']:>4d} "
+                    f"{_ms(st['p50']):>6s} {_ms(st['p95']):>6s} {_ms(st['p99']):>6s} {_size(st['bytes_out']):>6s}")
+    header = f"{'method':22s} {'calls':>6s} {'err':>4s} {'429':>4s} {'p50':>6s} {'p95':>6s} {'p99':>6s} {'out':>6s}"
+    lines.append("<pre>" + html.escape("\n".join([header] + rows)) + "</pre>")
+    errors = {}
+    for st in stats.values():
+        for name, n in st['error_types'].items():
+            errors[name] = errors.get(name, 0) + n
+    if errors:
+        lines.append("<b>Error:</b> " + ", ".join(f"<code>{name}</code> {n}" for name, n in sorted(errors.items())))
+    lines.append(f"<b>Dikirim ulang oleh outbox:</b> {api_metrics.retries()}")
+    return lines
+
+
+def command_report() -> list:
+    """Lines for the per-command section: throughput, wall time percentiles, queue wait and where the time went"""
+    stats = command_metrics.stats()
+    lines = ["<b>⏱️ Perintah</b>"]
+    if not stats:
+        return lines + ["Belum ada perintah dijalankan."]
+    rows = []
+    for command, st in sorted(stats.items(), key=lambda kv: -kv[1]['wall']['count']):
+        wall, queue = st['wall'], st['queue']
+        total = wall['avg'] * wall['count'] or 1.0
+        share = "/".join(f"{st['phases'][p]['avg'] * st['phases'][p]['count'] / total * 100:.0f}"
+                         for p in command_metrics.PHASES)
+        rows.append(f"{command[:16]:16s} {wall['count']:>5d} {st['per_minute']:>5.1f} {_ms(wall['p50']):>6s} "
+                    f"{_ms(wall['p95']):>6s} {_ms(wall['p99']):>6s} {_ms(queue['p95']):>6s} {share:>9s}")
+    header = f"{'perintah':16s} {'n':>5s} {'/mnt':>5s} {'p50':>6s} {'p95':>6s} {'p99':>6s} {'q95':>6s} {'ai/sp/tg%':>9s}"
+    lines.append("<pre>" + html.escape("\n".join([header] + rows)) + "</pre>")
+    lines.append(f"<i>/mnt: selesai per menit ({command_metrics.RATE_WINDOW_MINUTES} menit terakhir); "
+                 "q95: tunggu antrean p95; ai/sp/tg: porsi waktu di ai_render / subprocess / API Telegram</i>")
+    return lines
+
+
+def metrics_command(update: Update, context: CallbackContext):
+    """Handle /metrics [json] — command and Bot API latency report (owner only)"""
+    if not identity().is_owner(update.effective_user.id):
+        update.message.reply_text("<b>🚫 /metrics hanya untuk owner.</b>", parse_mode="HTML")
+        return
+    if context.args and context.args[0].lower() == 'json':
+        data = json.dumps(command_metrics.snapshot(), indent=1, sort_keys=True).encode()
+        name = f"metrics-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        update.message.reply_document(document=io.BytesIO(data), filename=name,
+                                      caption="Snapshot metrics (bandingkan dengan snapshot sebelum /update)")
+        return
+    update.message.reply_text("\n".join(command_report() + [""] + api_report()), parse_mode="HTML")
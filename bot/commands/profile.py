@@ -0,0 +1,73 @@
+import html
+import io
+import threading
+import time
+
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from bot import outbox, profiler
+from bot.config import Config
+from bot.identity import identity
+
+
+def _parse_seconds(context: CallbackContext, default: int) -> int:
+    try:
+        seconds = int(context.args[0]) if context.args else default
+    except ValueError:
+        seconds = default
+    return max(1, min(seconds, Config.PROFILE_MAX_SECONDS))
+
+
+def _authorized(update: Update, command: str) -> bool:
+    if identity().is_owner(update.effective_user.id):
+        return True
+    update.message.reply_text(f"<b>🚫 /{command} hanya untuk owner.</b>", parse_mode="HTML")
+    return False
+
+
+def _run_cpu_profile(bot, chat_id: int, seconds: int):
+    try:
+        stacks, samples = profiler.sample_stacks(seconds)
+    except profiler.ProfilerBusy:
+        outbox.send_message(bot, chat_id, "⚠️ Profiler lain masih berjalan, coba lagi nanti.")
+        return
+    data = profiler.format_collapsed(stacks).encode()
+    top = "\n".join(f"{count:>5d} {html.escape(frame[:80])}" for frame, count in profiler.top_functions(stacks, 8))
+    name = f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{seconds}s.collapsed.txt"
+    outbox.get_outbox().call(chat_id, bot.send_document, chat_id=chat_id, document=io.BytesIO(data), filename=name,
+                             caption=f"Collapsed stacks, {samples} sampel dari {seconds} detik "
+                                     f"(flamegraph.pl / speedscope.app)")
+    outbox.send_message(bot, chat_id, f"<b>🔥 Frame teratas</b> (sampel)\n<pre>{top or '-'}</pre>", parse_mode="HTML")
+
+
+def _run_memory_profile(bot, chat_id: int, seconds: int):
+    try:
+        report = profiler.trace_allocations(seconds)
+    except profiler.ProfilerBusy:
+        outbox.send_message(bot, chat_id, "⚠️ Profiler lain masih berjalan, coba lagi nanti.")
+        return
+    name = f"memprofile-{time.strftime('%Y%m%d-%H%M%S')}-{seconds}s.txt"
+    outbox.get_outbox().call(chat_id, bot.send_document, chat_id=chat_id, document=io.BytesIO(report.encode()),
+                             filename=name, caption=f"Alokasi tracemalloc selama {seconds} detik")
+
+
+def profile_command(update: Update, context: CallbackContext):
+    """Handle /profile [seconds] — sample all bot threads and send collapsed stacks (owner only)"""
+    if not _authorized(update, 'profile'):
+        return
+    seconds = _parse_seconds(context, 30)
+    update.message.reply_text(f"⏱️ Profiling semua thread selama {seconds} detik...")
+    # Sampling runs in its own thread so no dispatch worker is held for the window
+    threading.Thread(target=_run_cpu_profile, args=(context.bot, update.effective_chat.id, seconds),
+                     name='profile', daemon=True).start()
+
+
+def memprofile_command(update: Update, context: CallbackContext):
+    """Handle /memprofile [seconds] — tracemalloc top allocations over a window (owner only)"""
+    if not _authorized(update, 'memprofile'):
+        return
+    seconds = _parse_seconds(context, 30)
+    update.message.reply_text(f"🧠 Melacak alokasi memori selama {seconds} detik (bot sedikit lebih lambat)...")
+    threading.Thread(target=_run_memory_profile, args=(context.bot, update.effective_chat.id, seconds),
+                     name='memprofile', daemon=True).start()
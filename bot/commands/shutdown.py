@@ -1,22 +1,23 @@
-import os
 import sys
 import time
 import threading
 from telegram import Update
 from telegram.ext import CallbackContext
-from bot.ai_wrapper import ai_render
+from bot.ai_wrapper import ai_send_message, ai_send_to_chat
+from bot.identity import identity
 
 
 def shutdown_bot_delayed(bot, chat_id, delay=3):
     """Shutdown bot after a delay"""
     time.sleep(delay)
     try:
-        bot.send_message(chat_id=chat_id, text=ai_render("🔴 Bot sedang shutdown..."))
+        ai_send_to_chat(bot, chat_id, "🔴 Bot sedang shutdown...")
     except Exception:
         pass
     
-    # Graceful shutdown
-    os._exit(0)
+    # Graceful shutdown: drain running commands and persist the update offset
+    from bot.lifecycle import exit_process
+    exit_process(restart=False)
 
 def shutdown(update: Update, context: CallbackContext):
     """Handler for /shutdown command - shutdown the bot gracefully"""
@@ -24,17 +25,11 @@ def shutdown(update: Update, context: CallbackContext):
     
     # Check if user is authorized (owner or superuser)
     from bot.config import Config
-    
-    # Get owner ID from user.csv
-    try:
-        with open(Config.AUTHORIZED_IDS_FILE_PATH, 'r') as f:
-            owner_id = int(f.readline().strip())
-    except Exception:
-        owner_id = None
+    ident = identity()
     
     # Only owner or superuser can shutdown
-    if user_id != owner_id and user_id not in Config.SUPERUSER_IDS:
-        update.message.reply_text(ai_render("🚫 Akses ditolak. Hanya owner atau superuser yang dapat mematikan bot."))
+    if not ident.is_owner(user_id) and not ident.is_superuser(user_id):
+        ai_send_message(update, "🚫 Akses ditolak. Hanya owner atau superuser yang dapat mematikan bot.")
         return
     
     # Log shutdown attempt
@@ -46,7 +41,7 @@ def shutdown(update: Update, context: CallbackContext):
         pass
     
     # Send confirmation message
-    update.message.reply_text(ai_render("⚠️ Bot akan dimatikan dalam 3 detik..."))
+    ai_send_message(update, "⚠️ Bot akan dimatikan dalam 3 detik...")
     
     # Start shutdown thread
     thread = threading.Thread(
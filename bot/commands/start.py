@@ -2,6 +2,7 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CallbackContext
 import os
 from bot.ai_wrapper import ai_render, ai_send_message
+from bot.identity import identity
 
 def start(update: Update, context: CallbackContext):
     """Handler for /start command with setup wizard"""
@@ -9,15 +10,15 @@ def start(update: Update, context: CallbackContext):
     user_name = update.effective_user.first_name or "User"
     
     # Get latest commit info for versioning
-    import subprocess
+    from bot import proc
     import os
     
     try:
         repo_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        commit_hash = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo_dir, text=True).strip()
-        commit_date = subprocess.check_output(['git', 'log', '-1', '--format=%cd', '--date=short'], cwd=repo_dir, text=True).strip()
-        commit_msg = subprocess.check_output(['git', 'log', '-1', '--format=%s'], cwd=repo_dir, text=True).strip()
-        branch = subprocess.check_output(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], cwd=repo_dir, text=True).strip()
+        commit_hash = proc.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo_dir, timeout=10).strip()
+        commit_date = proc.check_output(['git', 'log', '-1', '--format=%cd', '--date=short'], cwd=repo_dir, timeout=10).strip()
+        commit_msg = proc.check_output(['git', 'log', '-1', '--format=%s'], cwd=repo_dir, timeout=10).strip()
+        branch = proc.check_output(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], cwd=repo_dir, timeout=10).strip()
 
         version_info = f"**🤖 Bot Server** `v{commit_date}`\nBranch: `{branch}`\nCommit: `{commit_hash}` - {commit_msg}"
     except Exception:
@@ -39,7 +40,7 @@ def start(update: Update, context: CallbackContext):
         [InlineKeyboardButton("🔧 Status", callback_data='status')],
     ]
     
-    if user_id in Config.SUPERUSER_IDS:
+    if identity().is_superuser(user_id):
         keyboard.append([InlineKeyboardButton("⚙️ Admin Panel", callback_data='admin')])
     
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -69,8 +70,7 @@ def handle_start_callback(update: Update, context: CallbackContext):
     elif query.data == 'restart':
         # Handle restart (only for superuser)
         user_id = update.effective_user.id
-        from bot.config import Config
-        if user_id in Config.SUPERUSER_IDS:
+        if identity().is_superuser(user_id):
             query.edit_message_text("<b>🔄 Restarting bot...</b>", parse_mode="HTML")
             from bot.commands.update import update
             update(update, context)
@@ -79,8 +79,7 @@ def handle_start_callback(update: Update, context: CallbackContext):
     elif query.data == 'shutdown_confirm':
         # Handle shutdown confirmation (only for superuser)
         user_id = update.effective_user.id
-        from bot.config import Config
-        if user_id in Config.SUPERUSER_IDS:
+        if identity().is_superuser(user_id):
             query.edit_message_text("<b>⚠️ Shutting down bot...</b>", parse_mode="HTML")
             from bot.commands.shutdown import shutdown
             shutdown(update, context)
@@ -91,6 +90,7 @@ def handle_start_callback(update: Update, context: CallbackContext):
 def show_system_status(update: Update, context: CallbackContext):
     """Show system status information"""
     from bot.config import Config
+    from bot.outbox import get_outbox
     import psutil
     import platform
     
@@ -99,11 +99,15 @@ def show_system_status(update: Update, context: CallbackContext):
         cpu_percent = psutil.cpu_percent(interval=1)
         memory = psutil.virtual_memory()
         disk = psutil.disk_usage('/')
+        outbox = get_outbox().stats()
         status_message = (f"<b>🖥️ System Status</b>\n\n"
                          f"<pre>Server: {platform.system()} {platform.release()}\n"
                          f"CPU:    {cpu_percent}%\n"
                          f"RAM:    {memory.percent}%\n"
-                         f"Disk:   {disk.percent}%</pre>\n\n"
+                         f"Disk:   {disk.percent}%\n"
+                         f"Outbox: antri {outbox['depth']}, tunggu p50 {outbox['p50_wait']:.1f}s / "
+                         f"p95 {outbox['p95_wait']:.1f}s, digabung {outbox['coalesced']}, "
+                         f"429 {outbox['retry_after']}</pre>\n\n"
                          f"Semua layanan berjalan dengan normal 💖")
     except Exception as e:
         status_message = f"Gagal mengambil status sistem: {e}"
@@ -129,8 +133,7 @@ def show_system_status(update: Update, context: CallbackContext):
 def show_admin_panel(update: Update, context: CallbackContext):
     """Show admin panel for superusers"""
     user_id = update.effective_user.id
-    from bot.config import Config
-    if user_id not in Config.SUPERUSER_IDS:
+    if not identity().is_superuser(user_id):
         try:
             update.callback_query.message.reply_text("🚫 Access denied. Superuser only.")
         except Exception:
@@ -1,12 +1,10 @@
-import subprocess
-import threading
 import time
 import logging
 import os
 from telegram import Update
 from telegram.ext import CallbackContext
-from bot.ai_wrapper import ai_render
-from bot.config import Config
+from bot.identity import identity
+from bot.jobs import JobQueueFull, LiveJobView, get_jobs
 
 # Commands that require interactive mode
 INTERACTIVE_COMMANDS = ['apt', 'apt-get', 'passwd', 'visudo', 'nano', 'vim', 'vi', 
@@ -16,12 +14,16 @@ INTERACTIVE_COMMANDS = ['apt', 'apt-get', 'passwd', 'visudo', 'nano', 'vim', 'vi
 PERMITTED_DOAS_COMMANDS = ['apt', 'apt-get', 'systemctl', 'service', 'ip', 'iptables',
                         'journalctl', 'docker', 'ls', 'ps', 'df', 'du', 'cat', 'nmap']
 
-# Logger for security audit
+# Seconds before a /sudo job is killed
+SUDO_TIMEOUT = 300
+
+# Logger for security audit (guarded so a hot reload does not add a second file handler)
 logger = logging.getLogger("doas_cmd")
-handler = logging.FileHandler("doas_commands.log")
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
+if not logger.handlers:
+    handler = logging.FileHandler("doas_commands.log")
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
 def is_command_interactive(command):
@@ -39,62 +41,10 @@ def is_command_permitted(command):
     return False
 
 def run_doas_command(command, chat_id, user_id, bot):
-    """Run a doas command in background and send output to chat"""
+    """Queue a doas command as a background job; its output is shown in the chat"""
     # Log command execution
     logger.info(f"DOAS executed by user {user_id}: {command}")
-    
-    try:
-        # Execute the command non-interactively with doas using NOPASSWD permissions
-        process = subprocess.Popen(
-            f"doas {command}", 
-            shell=True, 
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        
-        # Capture output in chunks and send to user
-        output_buffer = ""
-        last_sent = time.time()
-        
-        while True:
-            # Read from stdout and stderr
-            stdout_chunk = process.stdout.read(1024)
-            if not stdout_chunk and process.poll() is not None:
-                break
-                
-            if stdout_chunk:
-                output_buffer += stdout_chunk
-                
-            # Send buffer if it's big enough or enough time passed
-            now = time.time()
-            if len(output_buffer) > 1000 or (output_buffer and now - last_sent > 3):
-                try:
-                    # send as Markdown code block for readability
-                    bot.send_message(chat_id=chat_id, text=f"```\n{output_buffer}\n```", parse_mode="Markdown")
-                    output_buffer = ""
-                    last_sent = now
-                except Exception as e:
-                    logger.error(f"Failed to send message: {e}")
-                    # Continue execution even if message send fails
-        
-        # Send any remaining output
-        if output_buffer:
-            try:
-                bot.send_message(chat_id=chat_id, text=f"```\n{output_buffer}\n```", parse_mode="Markdown")
-            except Exception:
-                pass
-                
-        # Get final exit code
-        exit_code = process.poll()
-        if exit_code == 0:
-            bot.send_message(chat_id=chat_id, text="**Perintah berhasil dieksekusi.**", parse_mode="Markdown")
-        else:
-            bot.send_message(chat_id=chat_id, text=f"**Perintah selesai dengan exit code:** `{exit_code}`", parse_mode="Markdown")
-            
-    except Exception as e:
-        bot.send_message(chat_id=chat_id, text=f"**Error saat menjalankan perintah doas:** `{str(e)}`", parse_mode="Markdown")
-        logger.error(f"Error running doas command: {e}")
+    return get_jobs().submit(f"doas {command}", 'doas', user_id, chat_id, listener=LiveJobView(bot, chat_id))
 
 
 def sudo_command(update: Update, context: CallbackContext):
@@ -102,7 +52,7 @@ def sudo_command(update: Update, context: CallbackContext):
     user_id = update.effective_user.id
     
     # Check if user is a superuser
-    if user_id not in Config.SUPERUSER_IDS:
+    if not identity().is_superuser(user_id):
         update.message.reply_text("**Akses ditolak.** Perintah /sudo hanya untuk superuser.", parse_mode="Markdown")
         logger.warning(f"Unauthorized doas attempt by user {user_id}")
         return
@@ -133,16 +83,13 @@ def sudo_command(update: Update, context: CallbackContext):
         logger.warning(f"User {user_id} attempted to doas interactive command: {command}")
         return
     
-    # Respond that we're executing the command
-    update.message.reply_text(f"**Menjalankan:** `doas {command}`", parse_mode="Markdown")
-    
-    # Start a thread to run the command
-    thread = threading.Thread(
-        target=run_doas_command, 
-        args=(command, update.effective_chat.id, user_id, context.bot)
-    )
-    thread.daemon = True
-    thread.start()
+    # Runs on the job pool; /jobs lists it and /kill stops it
+    try:
+        job = run_doas_command(command, update.effective_chat.id, user_id, context.bot)
+    except JobQueueFull:
+        update.message.reply_text("**Antrean job penuh.** Coba lagi nanti atau lihat /jobs.", parse_mode="Markdown")
+        return
+    update.message.reply_text(f"**Menjalankan:** `doas {command}` (job #{job.id})", parse_mode="Markdown")
 
 
 def sudo(update: Update, context: CallbackContext):
@@ -159,39 +106,18 @@ def sudo(update: Update, context: CallbackContext):
     
     command = ' '.join(context.args)
     try:
-        update.message.reply_text(f"**Menjalankan:** `sudo {command}`", parse_mode="Markdown")
-        
         # Log the sudo command
         log_file = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'sudo_commands.log')
         timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
         with open(log_file, 'a') as f:
             f.write(f"[{timestamp}] {update.effective_user.id}: sudo {command}\n")
-            
-        process = subprocess.Popen(
-            f"sudo {command}",
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            shell=True,
-            universal_newlines=True
-        )
-        stdout, stderr = process.communicate(timeout=300)
-        
-        output = stdout if stdout else stderr
-        if not output:
-            output = "Perintah sudo dijalankan tanpa output."
-            update.message.reply_text(output)
-            return
-            
-        # Split long messages
-        max_length = 4096
-        if len(output) <= max_length:
-            # send as code block
-            update.message.reply_text(f"```\n{output}\n```", parse_mode="Markdown")
-        else:
-            chunks = [output[i:i+max_length] for i in range(0, len(output), max_length)]
-            for i, chunk in enumerate(chunks):
-                update.message.reply_text(f"```\n{chunk}\n```", parse_mode="Markdown")
-    except subprocess.TimeoutExpired:
-        update.message.reply_text('**Perintah sudo kehabisan waktu (300 detik)**', parse_mode="Markdown")
+
+        # Runs on the job pool; output streams into one live message, long output is attached
+        chat_id = update.effective_chat.id
+        job = get_jobs().submit(f"sudo {command}", 'sudo', update.effective_user.id, chat_id, timeout=SUDO_TIMEOUT,
+                                listener=LiveJobView(context.bot, chat_id))
+        update.message.reply_text(f"**Menjalankan:** `sudo {command}` (job #{job.id})", parse_mode="Markdown")
+    except JobQueueFull:
+        update.message.reply_text("**Antrean job penuh.** Coba lagi nanti atau lihat /jobs.", parse_mode="Markdown")
     except Exception as e:
         update.message.reply_text(f'**Error:** `{str(e)}`', parse_mode="Markdown")
\ No newline at end of file
@@ -7,6 +7,7 @@ from telegram import Update
 from telegram.ext import CallbackContext
 from bot.config import Config
 from bot.ai_wrapper import ai_send_message, ai_render
+from bot.live_message import LiveMessage
 
 # Simple single-slot torrent queue manager
 _torrent_lock = threading.Lock()
@@ -112,16 +113,11 @@ def _worker_loop():
         timestamp = time.strftime('%H:%M:%S')
         print(f"⚡ [{timestamp}] Processing torrent task from queue: {task_name} (type={task.get('type')})")
         
-        # Send immediate notification to user
-        if _current_info.get('chat_id') and _current_info.get('bot'):
-            try:
-                _current_info['bot'].send_message(
-                    chat_id=_current_info['chat_id'], 
-                    text=f"🔄 **Memulai processing torrent:**\n`{task_name}`", 
-                    parse_mode="Markdown"
-                )
-            except Exception as e:
-                print(f"Failed to send start notification: {e}")
+        # One live message per task, edited through every stage below
+        if task.get('chat_id') and task.get('bot'):
+            _current_info['live'] = LiveMessage(task['bot'], task['chat_id'],
+                                                f"🔄 **Memulai processing torrent:**\n`{task_name}`",
+                                                parse_mode="Markdown")
 
         # Process task in background
         try:
@@ -131,6 +127,7 @@ def _worker_loop():
                 with _torrent_lock:
                     _current_info['status'] = 'error: cannot connect to qBittorrent WebUI'
                 print("Failed to login to qBittorrent; will retry later")
+                _live_finish("❌ **Tidak dapat terhubung ke qBittorrent WebUI**")
                 time.sleep(2)  # Reduced retry delay
                 with _torrent_lock:
                     _current_info = None
@@ -142,16 +139,7 @@ def _worker_loop():
             with _torrent_lock:
                 _current_info['status'] = 'adding'
             
-            # Send adding notification
-            if _current_info.get('chat_id') and _current_info.get('bot'):
-                try:
-                    _current_info['bot'].send_message(
-                        chat_id=_current_info['chat_id'], 
-                        text=f"📤 **Mengirim ke qBittorrent...**", 
-                        parse_mode="Markdown"
-                    )
-                except Exception as e:
-                    print(f"Failed to send adding notification: {e}")
+            _live_update(f"📤 **Mengirim ke qBittorrent...**\n`{task_name}`")
             
             added_ok = False
             if task['type'] == 'magnet':
@@ -171,16 +159,7 @@ def _worker_loop():
                 with _torrent_lock:
                     _current_info['status'] = 'error: failed to add to qBittorrent'
                 print("Adding torrent failed; clearing slot and continuing")
-                # Send error notification
-                if _current_info.get('chat_id') and _current_info.get('bot'):
-                    try:
-                        _current_info['bot'].send_message(
-                            chat_id=_current_info['chat_id'], 
-                            text=f"❌ **Gagal menambahkan torrent ke qBittorrent**", 
-                            parse_mode="Markdown"
-                        )
-                    except Exception:
-                        pass
+                _live_finish(f"❌ **Gagal menambahkan torrent ke qBittorrent**\n`{task_name}`")
                 time.sleep(1)
                 with _torrent_lock:
                     _current_info = None
@@ -189,23 +168,13 @@ def _worker_loop():
             with _torrent_lock:
                 _current_info['status'] = 'downloading'
             
-            # Send success notification
-            if _current_info.get('chat_id') and _current_info.get('bot'):
-                try:
-                    _current_info['bot'].send_message(
-                        chat_id=_current_info['chat_id'], 
-                        text=f"✅ **Berhasil ditambahkan! Memantau progress...**", 
-                        parse_mode="Markdown"
-                    )
-                except Exception as e:
-                    print(f"Failed to send success notification: {e}")
+            _live_update(f"✅ **Berhasil ditambahkan! Memantau progress...**\n`{task_name}`")
 
             # Wait very short time for torrent to appear in list
             time.sleep(0.5)  # Reduced from 1 second
 
             # Poll progress until torrent completes or removed
             last_update = 0
-            last_notification = 0
             poll_interval = 0.5  # Start with very fast polling
             
             while True:
@@ -249,22 +218,11 @@ def _worker_loop():
                         print(f"📊 Torrent progress: {torrent_name} - {prog}% ({state})")
                         last_update = now
                     
-                    # Send progress notification to user every 30 seconds for active downloads
-                    if (now - last_notification > 30 and prog > 0 and prog < 100 and 
-                        state.lower() in ('downloading', 'stalledDL') and 
-                        _current_info.get('chat_id') and _current_info.get('bot')):
-                        try:
-                            bar_length = 10
-                            filled_length = int(bar_length * prog // 100)
-                            bar = '█' * filled_length + '░' * (bar_length - filled_length)
-                            _current_info['bot'].send_message(
-                                chat_id=_current_info['chat_id'], 
-                                text=f"📊 **Progress Update:**\n`{torrent_name[:30]}...`\n{prog}% `{bar}` ({state})", 
-                                parse_mode="Markdown"
-                            )
-                            last_notification = now
-                        except Exception as e:
-                            print(f"Failed to send progress notification: {e}")
+                    # Live message edits are throttled and skipped while nothing changes
+                    bar_length = 10
+                    filled_length = int(bar_length * prog // 100)
+                    bar = '█' * filled_length + '░' * (bar_length - filled_length)
+                    _live_update(f"📊 **Progress:**\n`{torrent_name[:30]}...`\n{prog}% `{bar}` ({state})")
 
                     # check if finished
                     if state.lower() in ('stalledup', 'forcedup', 'uploading', 'completed', 'pausedup') or prog >= 100:
@@ -273,16 +231,8 @@ def _worker_loop():
                             _current_info['progress'] = 100
                         print(f"✅ Torrent completed: {torrent_name}")
                         
-                        # Send completion notification
-                        if _current_info.get('chat_id') and _current_info.get('bot'):
-                            try:
-                                _current_info['bot'].send_message(
-                                    chat_id=_current_info['chat_id'], 
-                                    text=f"🎉 **Download Selesai!**\n`{torrent_name}`\n📂 Lokasi: {save_path}", 
-                                    parse_mode="Markdown"
-                                )
-                            except Exception as e:
-                                print(f"Failed to send completion notification: {e}")
+                        _live_finish(f"🎉 **Download Selesai!**\n`{torrent_name}`\n📂 Lokasi: {save_path}",
+                                     text=f"✅ **Selesai:** `{torrent_name[:30]}`\n100% `{'█' * 10}`")
                         break
                     
                     # Adaptive polling: faster when starting, slower when downloading
@@ -300,14 +250,30 @@ def _worker_loop():
             print(f"Error in torrent worker: {e}")
             with _torrent_lock:
                 _current_info['status'] = f'error: {e}'
+            _live_finish(f"❌ **Error torrent:** `{e}`")
         finally:
             # clear slot and allow next - minimal delay
             time.sleep(0.5)  # Reduced from 1-2 seconds
+            _live_finish()
             with _torrent_lock:
                 _current_info = None
             print("🧹 Torrent slot cleared")
 
 
+def _live_update(text):
+    """Show text in the current task's live message (if it was queued from a chat)"""
+    live = _current_info.get('live') if _current_info else None
+    if live is not None:
+        live.update(text)
+
+
+def _live_finish(summary=None, text=None):
+    """Stop editing the current task's live message and post `summary`; later calls are no-ops"""
+    live = _current_info.pop('live', None) if _current_info else None
+    if live is not None:
+        live.finish(summary, text=text)
+
+
 def _ensure_worker():
     """Ensure worker thread is running"""
     global _worker_initialized
@@ -441,7 +407,7 @@ def torrent_status(update: Update, context: CallbackContext):
                 if qlen > 3:
                     status_msg += f"\n... dan {qlen-3} lainnya"
 
-    ai_send_message(update, status_msg)
+    ai_send_message(update, status_msg, kind='status')
 
 
 # For command_handler registration
@@ -2,20 +2,24 @@ import os
 import subprocess
 from telegram import Update
 from telegram.ext import CallbackContext
+from bot import proc
 from bot.ai_wrapper import ai_render, ai_send_message
+from bot.identity import identity
+
+# Seconds before a hanging git call is killed; pull waits on the network
+GIT_TIMEOUT = 60
+PULL_TIMEOUT = 300
 
 
 def update(update: Update, context: CallbackContext):
     chat_id = update.effective_chat.id
     # Only allow the owner (first user in user.csv) to update
-    try:
-        with open(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'user.csv')) as f:
-            owner_id = f.readline().strip()
-    except Exception:
+    ident = identity()
+    if ident.owner is None:
         update.message.reply_text("<b>❌ Tidak dapat membaca user.csv</b> untuk menentukan owner.", parse_mode="HTML")
         return
 
-    if str(chat_id) != owner_id:
+    if not ident.is_owner(chat_id):
         context.bot.send_message(chat_id=chat_id, text="<b>🚫 You are not authorized</b> to perform updates.", parse_mode="HTML")
         return
 
@@ -25,15 +29,15 @@ def update(update: Update, context: CallbackContext):
 
     try:
         # Make sure .env is not committed by accident
-        subprocess.check_call(['git', 'update-index', '--assume-unchanged', os.path.join(repo_dir, '.env')])
+        proc.check_call(['git', 'update-index', '--assume-unchanged', os.path.join(repo_dir, '.env')], timeout=GIT_TIMEOUT)
     except Exception:
         # ignore if not a git repo or file doesn't exist
         pass
 
     try:
         # Stash local changes (including untracked) to avoid merge conflicts
-        subprocess.check_call(['git', 'add', '-A'], cwd=repo_dir)
-        stash_output = subprocess.check_output(['git', 'stash', '--include-untracked'], cwd=repo_dir, text=True, stderr=subprocess.STDOUT)
+        proc.check_call(['git', 'add', '-A'], cwd=repo_dir, timeout=GIT_TIMEOUT)
+        stash_output = proc.check_output(['git', 'stash', '--include-untracked'], cwd=repo_dir, timeout=GIT_TIMEOUT, merge=True)
 
         # Format stash message
         stash_msg = "**📦 Local changes stashed.**\n"
@@ -43,7 +47,7 @@ def update(update: Update, context: CallbackContext):
         ai_send_message(update, stash_msg)
 
         # Pull latest changes
-        out = subprocess.check_output(['git', 'pull'], cwd=repo_dir, stderr=subprocess.STDOUT, text=True)
+        out = proc.check_output(['git', 'pull'], cwd=repo_dir, timeout=PULL_TIMEOUT, merge=True)
 
         # Format pull message with Markdown code block
         pull_msg = "**✅ Update successful:**\n```\n" + out + "```"
@@ -51,16 +55,16 @@ def update(update: Update, context: CallbackContext):
 
         # Try to apply stash
         try:
-            stash_out = subprocess.check_output(['git', 'stash', 'pop'], cwd=repo_dir, stderr=subprocess.STDOUT, text=True)
+            stash_out = proc.check_output(['git', 'stash', 'pop'], cwd=repo_dir, timeout=GIT_TIMEOUT, merge=True)
 
             # Format stash applied message in Markdown
             stash_applied_msg = (
                 "**🌸 Stash Applied!** 💖\n\n"
-                f"- **Branch:** `{subprocess.check_output(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], cwd=repo_dir, text=True).strip()}` (up to date!)\n\n"
+                f"- **Branch:** `{proc.check_output(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], cwd=repo_dir, timeout=GIT_TIMEOUT).strip()}` (up to date!)\n\n"
             )
 
             # Get list of modified files
-            status = subprocess.check_output(['git', 'status', '--porcelain'], cwd=repo_dir, text=True).strip()
+            status = proc.check_output(['git', 'status', '--porcelain'], cwd=repo_dir, timeout=GIT_TIMEOUT).strip()
 
             if status:
                 stash_applied_msg += "**Perubahan yang belum di-commit:**\n"
@@ -88,7 +92,7 @@ def update(update: Update, context: CallbackContext):
         ai_send_message(update, f"**❌ Git operation failed:**\n```\n{e.output}\n```")
         # Try to pop stash to restore state
         try:
-            subprocess.check_call(['git', 'stash', 'pop'], cwd=repo_dir)
+            proc.check_call(['git', 'stash', 'pop'], cwd=repo_dir, timeout=GIT_TIMEOUT)
         except Exception:
             pass
         return
@@ -96,7 +100,28 @@ def update(update: Update, context: CallbackContext):
         ai_send_message(update, f"**❌ Error saat update:** {e}")
         return
 
-    # Restart the bot process
+    # Apply the pulled code: hot-reload command modules, restart only when core files changed
+    from bot import hot_reload
+    changed = hot_reload.changed_files()
+    modules, core = hot_reload.plan(changed)
+    if not changed:
+        ai_send_message(update, "**✨ Tidak ada perubahan kode**, bot tidak perlu di-restart.")
+        return
+    # Keep the numbers of the old code to compare with after the update
+    from bot.command_metrics import save_snapshot
+    save_snapshot('before-update')
+    if not core:
+        try:
+            reloaded = hot_reload.reload_commands(modules)
+            names = ", ".join(f"`{name.rsplit('.', 1)[-1]}`" for name in reloaded)
+            if not names:
+                names = "_(modul belum dimuat, kode baru dipakai saat pertama dipanggil)_"
+            ai_send_message(update, f"**♻️ Hot reload selesai:** {names}\nBot tidak di-restart.")
+            return
+        except Exception as e:
+            ai_send_message(update, f"**⚠️ Hot reload gagal:** `{e}`\nLanjut restart penuh...")
+
+    # Restart the bot process once running commands have finished
     ai_send_message(update, "**🔁 Restarting bot** to apply updates...")
-    python = os.sys.executable
-    os.execl(python, python, *os.sys.argv)
+    from bot.lifecycle import request_exit
+    request_exit(restart=True)
@@ -2,12 +2,13 @@ from telegram import Update
 from telegram.ext import CallbackContext
 import subprocess
 import shutil
-from bot.ai_wrapper import ai_render, ai_send_message
+from bot import proc
+from bot.ai_wrapper import ai_send_to_chat
 
 
 def _run_cmd(cmd_list, timeout=10):
     try:
-        out = subprocess.check_output(cmd_list, stderr=subprocess.STDOUT, text=True, timeout=timeout)
+        out = proc.check_output(cmd_list, timeout=timeout, merge=True)
         return True, out.strip()
     except subprocess.CalledProcessError as e:
         # return False and output message
@@ -93,48 +94,6 @@ def zero_tier_status(update: Update, context: CallbackContext):
 
     reply = "\n\n".join(parts)
 
-    # Send rendered reply via AI renderer with HTML formatting
-    rendered = ai_render(reply)
-
-    # Split long output into chunks
-    max_len = 4000
-    try:
-        if len(rendered) <= max_len:
-            ai_send_message(update, rendered)
-        else:
-            for i in range(0, len(rendered), max_len):
-                chunk = rendered[i:i+max_len]
-                ai_send_message(update, chunk)
-    except Exception:
-        # Fallback with HTML directly
-        if len(rendered) <= max_len:
-            try:
-                update.message.reply_text(rendered, parse_mode="HTML")
-            except Exception:
-                try:
-                    update.message.reply_text(rendered)
-                except Exception:
-                    # callback or other
-                    try:
-                        update.callback_query.message.reply_text(rendered, parse_mode="HTML")
-                    except Exception:
-                        try:
-                            update.callback_query.message.reply_text(rendered)
-                        except Exception:
-                            pass
-        else:
-            for i in range(0, len(rendered), max_len):
-                chunk = rendered[i:i+max_len]
-                try:
-                    update.message.reply_text(chunk, parse_mode="HTML")
-                except Exception:
-                    try:
-                        update.message.reply_text(chunk)
-                    except Exception:
-                        try:
-                            update.callback_query.message.reply_text(chunk, parse_mode="HTML")
-                        except Exception:
-                            try:
-                                update.callback_query.message.reply_text(chunk)
-                            except Exception:
-                                pass
+    # Rendered once, then split into messages on tag boundaries; the outbox paces
+    # the pieces to the chat's flood limit
+    ai_send_to_chat(context.bot, update.effective_chat.id, reply, kind='output')
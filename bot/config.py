@@ -13,14 +13,112 @@ class Config:
     
     # AI Configuration
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+    # Gemini endpoint (override the base to point at a local stand-in server), model
+    # and shared HTTP client tuning: keep-alive pool size and retries on 429/5xx
+    GEMINI_API_BASE = os.getenv('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com/v1beta')
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
+    GEMINI_POOL_SIZE = int(os.getenv('GEMINI_POOL_SIZE', '8'))
+    GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', '2'))
+    # /ai conversation memory: tokens and turns kept per user before older turns are
+    # summarised, max users kept (LRU) and idle expiry in seconds
+    AI_HISTORY_MAX_TOKENS = int(os.getenv('AI_HISTORY_MAX_TOKENS', '2000'))
+    AI_HISTORY_MAX_TURNS = int(os.getenv('AI_HISTORY_MAX_TURNS', '20'))
+    AI_HISTORY_MAX_USERS = int(os.getenv('AI_HISTORY_MAX_USERS', '100'))
+    AI_HISTORY_IDLE_TTL = float(os.getenv('AI_HISTORY_IDLE_TTL', '21600'))
+    # Token bucket shared by all Gemini calls (size to the API key's quota); cosmetic
+    # renders give up and send plain text after AI_RENDER_MAX_QUEUE_WAIT seconds queued
+    GEMINI_RATE_PER_MIN = float(os.getenv('GEMINI_RATE_PER_MIN', '30'))
+    GEMINI_BURST = float(os.getenv('GEMINI_BURST', '10'))
+    AI_RENDER_MAX_QUEUE_WAIT = float(os.getenv('AI_RENDER_MAX_QUEUE_WAIT', '2'))
+    # Minimum seconds between edits while streaming an /ai answer
+    AI_STREAM_EDIT_INTERVAL = float(os.getenv('AI_STREAM_EDIT_INTERVAL', '1.5'))
     AI_TEMPLATE = os.getenv('AI_TEMPLATE') or None
+    # ai_render output cache (entries, seconds) and startup warm-up of static strings
+    AI_CACHE_SIZE = int(os.getenv('AI_CACHE_SIZE', '512'))
+    AI_CACHE_TTL = float(os.getenv('AI_CACHE_TTL', '21600'))
+    AI_CACHE_WARMUP = os.getenv('AI_CACHE_WARMUP', 'true').lower() in ('1', 'true', 'yes')
+    # Per-message latency budget for ai_render (seconds) and circuit breaker tuning
+    AI_RENDER_BUDGET = float(os.getenv('AI_RENDER_BUDGET', '6'))
+    AI_BREAKER_FAILURES = int(os.getenv('AI_BREAKER_FAILURES', '3'))
+    AI_BREAKER_WINDOW = int(os.getenv('AI_BREAKER_WINDOW', '10'))
+    AI_BREAKER_SLOW = float(os.getenv('AI_BREAKER_SLOW', '4'))
+    AI_BREAKER_COOLDOWN = float(os.getenv('AI_BREAKER_COOLDOWN', '60'))
+    # 'sync' waits for the render before replying; 'deferred' sends raw text first and
+    # edits it in place when the render is done (dropped if older than AI_RENDER_MAX_AGE)
+    AI_RENDER_MODE = os.getenv('AI_RENDER_MODE', 'sync').lower()
+    AI_RENDER_WORKERS = int(os.getenv('AI_RENDER_WORKERS', '4'))
+    AI_RENDER_MAX_AGE = float(os.getenv('AI_RENDER_MAX_AGE', '30'))
+    # 'gemini' renders through the API; 'local' uses bot/formatter.py for every message.
+    # AI_LOCAL_KINDS lists message classes that always use the local formatter
+    # (progress, output, status, error, reminder).
+    AI_RENDER_ENGINE = os.getenv('AI_RENDER_ENGINE', 'gemini').lower()
+    AI_LOCAL_KINDS = frozenset(k.strip() for k in os.getenv('AI_LOCAL_KINDS', 'progress,output').split(',') if k.strip())
+    AI_LOCAL_DECORATE = os.getenv('AI_LOCAL_DECORATE', 'true').lower() in ('1', 'true', 'yes')
     
     # Server Configuration
     DOWNLOAD_DIR = os.getenv('DOWNLOAD_DIR', './Downloads')
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+
+    # Telegram Bot API endpoint (point at bench/fake_telegram.py for local benchmarks)
+    TELEGRAM_API_BASE = os.getenv('TELEGRAM_API_BASE', 'https://api.telegram.org/bot')
+
+    # Webhook mode: used instead of long polling when WEBHOOK_URL is set
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+    WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+    PORT = int(os.getenv('PORT', '8443'))
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')  # random per start when empty
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+    # Command dispatch: worker threads per concurrency class and queue limits
+    DISPATCH_INSTANT_WORKERS = int(os.getenv('DISPATCH_INSTANT_WORKERS', '4'))
+    DISPATCH_IO_WORKERS = int(os.getenv('DISPATCH_IO_WORKERS', '6'))
+    DISPATCH_LONG_WORKERS = int(os.getenv('DISPATCH_LONG_WORKERS', '2'))
+    DISPATCH_PRIVILEGED_WORKERS = int(os.getenv('DISPATCH_PRIVILEGED_WORKERS', '1'))
+    DISPATCH_QUEUE_LIMIT = int(os.getenv('DISPATCH_QUEUE_LIMIT', '20'))
+    DISPATCH_CHAT_BACKLOG = int(os.getenv('DISPATCH_CHAT_BACKLOG', '10'))
+
+    # Outbound message queue (see bot/outbox.py): global messages/second and minimum seconds between
+    # messages to one private chat / group, following Telegram's flood limits
+    OUTBOX_GLOBAL_RATE = float(os.getenv('OUTBOX_GLOBAL_RATE', '30'))
+    OUTBOX_CHAT_INTERVAL = float(os.getenv('OUTBOX_CHAT_INTERVAL', '1'))
+    OUTBOX_GROUP_INTERVAL = float(os.getenv('OUTBOX_GROUP_INTERVAL', '3'))
+    OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', '4'))
+    # Live status messages (see bot/live_message.py): seconds between in-place edits, growing by
+    # LIVE_BACKOFF after every edit up to LIVE_MAX_INTERVAL
+    LIVE_MIN_INTERVAL = float(os.getenv('LIVE_MIN_INTERVAL', '2'))
+    LIVE_MAX_INTERVAL = float(os.getenv('LIVE_MAX_INTERVAL', '60'))
+    LIVE_BACKOFF = float(os.getenv('LIVE_BACKOFF', '1.5'))
+
+    # Prometheus text endpoint (GET /metrics); disabled when METRICS_PORT is 0
+    METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
+    # /profile and /memprofile: longest window, seconds between stack samples, tracemalloc frames
+    PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', '300'))
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.01'))
+    PROFILE_TRACEMALLOC_FRAMES = int(os.getenv('PROFILE_TRACEMALLOC_FRAMES', '10'))
+
+    # Background jobs for /bash and /sudo (see bot/jobs.py): concurrency, waiting jobs, finished jobs kept
+    JOBS_MAX_RUNNING = int(os.getenv('JOBS_MAX_RUNNING', '2'))
+    JOBS_QUEUE_LIMIT = int(os.getenv('JOBS_QUEUE_LIMIT', '10'))
+    JOBS_HISTORY = int(os.getenv('JOBS_HISTORY', '20'))
+    # Per-job limits: CPU seconds and address space (0 disables), wall time, output ring buffer
+    JOB_CPU_SECONDS = float(os.getenv('JOB_CPU_SECONDS', '600'))
+    JOB_MEMORY_MB = float(os.getenv('JOB_MEMORY_MB', '2048'))
+    JOB_WALL_TIMEOUT = float(os.getenv('JOB_WALL_TIMEOUT', '3600'))
+    JOB_OUTPUT_MB = float(os.getenv('JOB_OUTPUT_MB', '4'))
+    # /bash jobs are killed after this many seconds
+    BASH_TIMEOUT = float(os.getenv('BASH_TIMEOUT', '60'))
+
+    # Anonymised recording of incoming updates for bench/replay.py (see bot/recorder.py)
+    RECORD_UPDATES = os.getenv('RECORD_UPDATES', 'false').lower() in ('1', 'true', 'yes')
+    RECORD_MAX_MB = float(os.getenv('RECORD_MAX_MB', '50'))
     
     # Security Configuration
     SUPERUSER_IDS = [int(id.strip()) for id in os.getenv('SUPERUSER_IDS', '796058175').split(',') if id.strip()]
+    # Seconds between checks of user.csv/.env for changed users or SUPERUSER_IDS (see bot/identity.py)
+    IDENTITY_CHECK_INTERVAL = float(os.getenv('IDENTITY_CHECK_INTERVAL', '2'))
 
     # qBittorrent WebUI configuration (optional)
     QB_URL = os.getenv('QB_URL', 'http://127.0.0.1:8080')
@@ -31,6 +129,14 @@ class Config:
     BASE_DIR = os.path.dirname(os.path.dirname(__file__))
     AUTHORIZED_IDS_FILE_PATH = os.path.join(BASE_DIR, 'user.csv')
     LOG_FILE_PATH = os.path.join(BASE_DIR, 'bot_commands.log')
+    # Last fully handled update_id, so restarts resume without losing or repeating updates
+    UPDATE_OFFSET_FILE = os.getenv('UPDATE_OFFSET_FILE', os.path.join(BASE_DIR, '.update_offset.json'))
+    # Seconds /update and /shutdown wait for running commands before exec/exit
+    SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', '20'))
+    # /update saves a JSON metrics snapshot here before applying new code
+    METRICS_SNAPSHOT_DIR = os.getenv('METRICS_SNAPSHOT_DIR', os.path.join(BASE_DIR, 'metrics'))
+    # RECORD_UPDATES writes updates-<time>.jsonl.gz files here
+    RECORD_DIR = os.getenv('RECORD_DIR', os.path.join(BASE_DIR, 'recordings'))
     
     # Ensure download directory exists
     @classmethod
@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Rough token estimate for Gemini text (about 4 characters per token)
+CHARS_PER_TOKEN = 4
+
+# Upper bound for a stored summary, in characters
+MAX_SUMMARY_CHARS = 1500
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class _Conversation:
+    __slots__ = ('turns', 'tokens', 'summary', 'last_used', 'compacting')
+
+    def __init__(self):
+        self.turns = deque()  # (role, text) with role 'user' or 'model'
+        self.tokens = 0
+        self.summary = ''
+        self.last_used = time.monotonic()
+        self.compacting = False  # a compact() is summarising this history
+
+    def recount(self):
+        self.tokens = estimate_tokens(self.summary) + sum(estimate_tokens(t) for _, t in self.turns)
+
+
+class ConversationStore:
+    """Bounded per-user chat history for /ai.
+
+    Each user keeps recent turns plus a running summary of older ones. When a
+    history grows past `max_tokens` or `max_turns` (rounded up to whole
+    exchanges) the oldest exchanges are folded into the summary (see
+    compact()); turns are never dropped unsummarised. At most `max_users` histories are
+    kept; the least recently used one is evicted first, and histories idle for
+    longer than `idle_ttl` seconds are dropped.
+    """
+
+    def __init__(self, max_users: int = 100, max_tokens: int = 2000, max_turns: int = 20,
+                 idle_ttl: float = 6 * 3600):
+        self.max_users = max(1, int(max_users))
+        self.max_tokens = max(100, int(max_tokens))
+        # Whole user/model exchanges, so a history never starts with a model turn
+        self.max_turns = max(2, int(max_turns) + int(max_turns) % 2)
+        self.idle_ttl = float(idle_ttl)
+        self._users: "OrderedDict[int, _Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self.summaries = 0
+
+    def _get(self, user_id: int, create: bool = False) -> Optional[_Conversation]:
+        self._expire()
+        conv = self._users.get(user_id)
+        if conv is None and create:
+            conv = _Conversation()
+            self._users[user_id] = conv
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+                self.evicted += 1
+        if conv is not None:
+            conv.last_used = time.monotonic()
+            self._users.move_to_end(user_id)
+        return conv
+
+    def _expire(self):
+        if self.idle_ttl <= 0:
+            return
+        now = time.monotonic()
+        # OrderedDict is in LRU order, so idle entries are at the front
+        while self._users:
+            user_id, conv = next(iter(self._users.items()))
+            if now - conv.last_used <= self.idle_ttl:
+                break
+            del self._users[user_id]
+            self.evicted += 1
+
+    def history(self, user_id: int) -> Tuple[str, List[Tuple[str, str]]]:
+        """Return (summary, turns) for a user"""
+        with self._lock:
+            conv = self._get(user_id)
+            if conv is None:
+                return '', []
+            return conv.summary, list(conv.turns)
+
+    def add_exchange(self, user_id: int, prompt: str, answer: str):
+        with self._lock:
+            conv = self._get(user_id, create=True)
+            conv.turns.append(('user', prompt))
+            conv.turns.append(('model', answer))
+            conv.recount()
+
+    def _over(self, conv: _Conversation) -> bool:
+        return conv.tokens > self.max_tokens or len(conv.turns) > self.max_turns
+
+    def needs_compaction(self, user_id: int) -> bool:
+        with self._lock:
+            conv = self._users.get(user_id)
+            return conv is not None and self._over(conv)
+
+    def compact(self, user_id: int, summarizer: Callable[[str, List[Tuple[str, str]]], Optional[str]]):
+        """Fold the oldest exchanges into the summary until the history fits in
+        half the token and turn caps. `summarizer(old_summary, turns)` returns
+        the new summary text, or None to fall back to a truncated transcript.
+
+        One compaction per user runs at a time. The folded turns stay in the
+        history until the summary replaces them, and the result is dropped if
+        the history was reset or evicted meanwhile."""
+        with self._lock:
+            conv = self._users.get(user_id)
+            if conv is None or conv.compacting or not self._over(conv):
+                return
+            old_summary = conv.summary
+            folded = []
+            tokens = conv.tokens
+            # Fold whole exchanges and always keep the latest one verbatim
+            while len(conv.turns) - len(folded) > 2 and (tokens > self.max_tokens // 2 or
+                                                         len(conv.turns) - len(folded) > self.max_turns // 2):
+                for _ in range(2):
+                    role, text = conv.turns[len(folded)]
+                    folded.append((role, text))
+                    tokens -= estimate_tokens(text)
+            if not folded:
+                return
+            conv.compacting = True
+
+        # Summarise outside the lock: this may be a network call
+        summary = None
+        try:
+            summary = summarizer(old_summary, folded)
+        except Exception:
+            summary = None
+        if not summary:
+            transcript = '\n'.join(f"{role}: {text}" for role, text in folded)
+            summary = (old_summary + '\n' + transcript).strip()
+        summary = summary[-MAX_SUMMARY_CHARS:]
+
+        with self._lock:
+            conv.compacting = False
+            if self._users.get(user_id) is not conv:
+                return  # reset or evicted while summarising
+            # Only compact() removes turns and it runs alone, so the folded
+            # turns are still the oldest ones and the summary is still old_summary
+            for _ in folded:
+                conv.turns.popleft()
+            conv.summary = summary
+            conv.recount()
+            self.summaries += 1
+
+    def reset(self, user_id: int) -> bool:
+        with self._lock:
+            return self._users.pop(user_id, None) is not None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'users': len(self._users),
+                'max_users': self.max_users,
+                'tokens': sum(c.tokens for c in self._users.values()),
+                'evicted': self.evicted,
+                'summaries': self.summaries,
+            }
@@ -0,0 +1,261 @@
+import importlib
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from bot import command_metrics
+from bot.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Concurrency classes: each runs on its own bounded worker pool
+INSTANT = 'instant'        # pure in-memory replies (/help, status views)
+IO = 'io'                  # network/file I/O: Telegram downloads, Gemini, qBittorrent
+LONG = 'long'              # long-running subprocesses (/bash)
+PRIVILEGED = 'privileged'  # /sudo, /update, /shutdown
+
+
+class _Task:
+    __slots__ = ('name', 'func', 'update', 'context', 'chat_id', 'pool', 'queued_at')
+
+    def __init__(self, name, func, update, context, chat_id, pool):
+        self.name = name
+        self.func = func
+        self.update = update
+        self.context = context
+        self.chat_id = chat_id
+        self.pool = pool
+        self.queued_at = time.monotonic()
+
+
+class _Pool:
+    """Fixed set of worker threads fed from a bounded FIFO queue"""
+
+    def __init__(self, owner: 'CommandDispatcher', name: str, workers: int, queue_limit: int):
+        self.owner = owner
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_limit = max(0, queue_limit)
+        self.queue = deque()
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"dispatch-{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _work(self):
+        cond = self.owner._cond
+        while True:
+            with cond:
+                while not self.queue:
+                    cond.wait()
+                task = self.queue.popleft()
+                self.running += 1
+            try:
+                self.owner._run(task)
+            finally:
+                with cond:
+                    self.running -= 1
+                    self.completed += 1
+                    self.owner._task_done(task)
+                    cond.notify_all()
+                if self.owner.tracker is not None and task.update is not None:
+                    self.owner.tracker.release(task.update.update_id)
+
+
+class CommandDispatcher:
+    """Runs handlers off the telegram dispatcher thread.
+
+    Every command is assigned a concurrency class with its own bounded pool, so
+    a slow /sudo cannot stall /help for other users. Updates from the same chat
+    are still handled one at a time in arrival order: while a chat has a task
+    running, its next updates wait in a per-chat backlog. Users get a
+    "queued at position N" notice when their command cannot start right away.
+    """
+
+    def __init__(self, classes: Dict[str, tuple], chat_backlog_limit: int = 20):
+        self._cond = threading.Condition()
+        self.pools = {name: _Pool(self, name, workers, limit) for name, (workers, limit) in classes.items()}
+        self.chat_backlog_limit = chat_backlog_limit
+        self._busy_chats: Dict[int, deque] = {}
+        self._started = False
+        self.tracker = None  # bot.offsets.UpdateTracker, told when a queued update finishes
+        self.callbacks: List['DispatchedCallback'] = []
+
+    def start(self):
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+        for pool in self.pools.values():
+            pool.start()
+
+    def wrap(self, name: str, func: Callable[[Update, CallbackContext], None], cls: str = IO) -> 'DispatchedCallback':
+        callback = DispatchedCallback(self, name, func, cls)
+        self.callbacks.append(callback)
+        return callback
+
+    def swap(self, funcs: Dict['DispatchedCallback', Callable]):
+        """Replace the functions behind several callbacks at once (hot reload).
+        Updates already queued keep the function they were submitted with."""
+        with self._cond:
+            for callback, func in funcs.items():
+                callback.func = func
+
+    def submit(self, name: str, func, update: Update, context: CallbackContext, cls: str = IO):
+        """Queue a handler call; returns the queue position (0 = started immediately) or -1 if rejected"""
+        pool = self.pools.get(cls) or self.pools[IO]
+        chat_id = update.effective_chat.id if update and update.effective_chat else None
+        task = _Task(name, func, update, context, chat_id, pool)
+        with self._cond:
+            backlog = self._busy_chats.get(chat_id) if chat_id is not None else None
+            if backlog is not None:
+                # Same chat already has a command in progress: keep arrival order
+                if len(backlog) >= self.chat_backlog_limit:
+                    pool.rejected += 1
+                    position = -1
+                else:
+                    backlog.append(task)
+                    position = len(backlog)
+            elif len(pool.queue) >= pool.queue_limit and pool.running >= pool.workers:
+                pool.rejected += 1
+                position = -1
+            else:
+                if chat_id is not None:
+                    self._busy_chats[chat_id] = deque()
+                position = self._enqueue(task)
+            if position >= 0 and self.tracker is not None and update is not None:
+                self.tracker.retain(update.update_id)
+        self._notify_user(update, name, position)
+        return position
+
+    def _enqueue(self, task: _Task) -> int:
+        pool = task.pool
+        pool.queue.append(task)
+        self._cond.notify_all()
+        idle = pool.workers - pool.running
+        return max(0, len(pool.queue) - idle)
+
+    def _task_done(self, task: _Task):
+        # Called with the condition held: start the chat's next update, if any
+        if task.chat_id is None:
+            return
+        backlog = self._busy_chats.get(task.chat_id)
+        if backlog:
+            self._enqueue(backlog.popleft())
+        else:
+            self._busy_chats.pop(task.chat_id, None)
+
+    def _run(self, task: _Task):
+        try:
+            func = task.func.resolve() if isinstance(task.func, DispatchedCallback) else task.func
+            with command_metrics.track(task.name, task.queued_at):
+                func(task.update, task.context)
+        except Exception as e:
+            logger.exception(f"Handler {task.name} failed: {e}")
+            try:
+                task.context.dispatcher.dispatch_error(task.update, e)
+            except Exception:
+                pass
+
+    def drain(self, timeout: float) -> bool:
+        """Wait until no task is queued, backlogged or running; False on timeout.
+
+        Must not be called from a dispatch worker, which would wait for itself.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._busy_chats or any(p.running or p.queue for p in self.pools.values()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    @staticmethod
+    def _notify_user(update: Update, name: str, position: int):
+        if position == 0 or update is None or update.effective_message is None:
+            return
+        if position < 0:
+            text = f"⛔ Server sedang sibuk, /{name} tidak bisa diantrekan. Coba lagi sebentar lagi."
+        else:
+            text = f"⏳ Sedang sibuk, /{name} masuk antrean posisi {position}."
+        try:
+            update.effective_message.reply_text(text)
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._cond:
+            result = {
+                name: {
+                    'workers': pool.workers,
+                    'running': pool.running,
+                    'queued': len(pool.queue),
+                    'completed': pool.completed,
+                    'rejected': pool.rejected,
+                }
+                for name, pool in self.pools.items()
+            }
+            result['chats'] = {
+                'busy': len(self._busy_chats),
+                'backlog': sum(len(b) for b in self._busy_chats.values()),
+            }
+            return result
+
+
+class DispatchedCallback:
+    """Handler callback that hands the update to a CommandDispatcher pool.
+
+    `func` may be a "package.module:function" string; the module is then
+    imported on a worker the first time the command is used.
+    """
+
+    def __init__(self, dispatcher: CommandDispatcher, name: str, func, cls: str):
+        self.dispatcher = dispatcher
+        self.name = name
+        self.func = func
+        self.cls = cls
+
+    def resolve(self) -> Callable[[Update, CallbackContext], None]:
+        func = self.func
+        if isinstance(func, str):
+            module, _, attr = func.partition(':')
+            func = getattr(importlib.import_module(module), attr)
+            self.func = func
+        return func
+
+    def __call__(self, update: Update, context: CallbackContext):
+        # Unresolved callbacks are resolved by the worker, not the dispatcher thread
+        func = self if isinstance(self.func, str) else self.func
+        self.dispatcher.submit(self.name, func, update, context, self.cls)
+
+    def __repr__(self):
+        return f"<DispatchedCallback {self.name} ({self.cls}) -> {getattr(self.func, '__qualname__', self.func)}>"
+
+
+_dispatcher: Optional[CommandDispatcher] = None
+
+
+def get_dispatcher() -> CommandDispatcher:
+    """Return the process-wide command dispatcher, configured from Config.DISPATCH_*"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = CommandDispatcher({
+            INSTANT: (Config.DISPATCH_INSTANT_WORKERS, Config.DISPATCH_QUEUE_LIMIT),
+            IO: (Config.DISPATCH_IO_WORKERS, Config.DISPATCH_QUEUE_LIMIT),
+            LONG: (Config.DISPATCH_LONG_WORKERS, Config.DISPATCH_QUEUE_LIMIT),
+            PRIVILEGED: (Config.DISPATCH_PRIVILEGED_WORKERS, Config.DISPATCH_QUEUE_LIMIT),
+        }, chat_backlog_limit=Config.DISPATCH_CHAT_BACKLOG)
+        _dispatcher.start()
+    return _dispatcher
@@ -0,0 +1,184 @@
+"""Local markdown-ish to Telegram HTML formatter.
+
+Bot messages are written in a small markdown dialect: **bold**, __italic__ or
+_italic_, `inline code`, ```fenced blocks```, [text](url) links, "- " bullets
+and "# " headings, sometimes mixed with Telegram HTML tags such as <pre> or
+<a href='...'>. format_html() turns that into valid Telegram HTML without a
+network round trip, so it can stand in for ai_render where persona text adds
+nothing (progress pings, raw command output).
+"""
+import html
+import re
+import zlib
+
+# Tags Telegram accepts in parse_mode=HTML that may already be present in a message
+_ALLOWED_TAG = re.compile(
+    r"</?(?:b|strong|i|em|u|ins|s|strike|del|code|pre|tg-spoiler)>"
+    r"|<a\s+href=(?:'[^'<>]*'|\"[^\"<>]*\")\s*>|</a>"
+    r"|<span\s+class=(?:'tg-spoiler'|\"tg-spoiler\")>|</span>",
+    re.IGNORECASE,
+)
+_FENCE = re.compile(r"```([\w+-]*)[ \t]*\n?(.*?)```", re.DOTALL)
+_PRE_BLOCK = re.compile(r"<pre>(.*?)</pre>", re.DOTALL | re.IGNORECASE)
+_INLINE_CODE = re.compile(r"`([^`\n]+)`")
+_LINK = re.compile(r"\[([^\]\n]+)\]\((https?://[^)\s]+)\)")
+_BOLD = re.compile(r"\*\*(?=\S)(.+?)(?<=\S)\*\*", re.DOTALL)
+_ITALIC_DOUBLE = re.compile(r"__(?=\S)(.+?)(?<=\S)__", re.DOTALL)
+_ITALIC_SINGLE = re.compile(r"(?<![\w/])_(?=\S)([^_\n]+?)(?<=\S)_(?!\w)")
+_HEADING = re.compile(r"^#{1,6}\s+(.+?)\s*#*$", re.MULTILINE)
+_BULLET = re.compile(r"^(\s*)[-*]\s+", re.MULTILINE)
+_PLACEHOLDER = "\x00{}\x00"
+_PLACEHOLDER_RE = re.compile("\x00(\\d+)\x00")
+_TAG_NAME = re.compile(r"</?\s*([a-zA-Z-]+)")
+# Telegram tags and entities: the points where split_html() may not cut
+_SPLIT_TOKEN = re.compile(f"({_ALLOWED_TAG.pattern}|&#?\\w+;)", re.IGNORECASE)
+
+_PERSONA_EMOJI = ["🌸", "✨", "💖", "🌷", "💫"]
+
+
+def _balanced(markup: str) -> bool:
+    """Check that every opened tag is closed in the right order"""
+    stack = []
+    for match in re.finditer(r"<[^>]+>", markup):
+        tag = match.group(0)
+        name = _TAG_NAME.match(tag).group(1).lower()
+        if tag.startswith('</'):
+            if not stack or stack.pop() != name:
+                return False
+        else:
+            stack.append(name)
+    return not stack
+
+
+def format_html(text: str, decorate: bool = False) -> str:
+    """Convert the bot's markdown dialect into Telegram HTML.
+
+    Everything that is not recognised markup is HTML-escaped. With `decorate`
+    a persona emoji (stable per text) is appended to the first line.
+    """
+    if not text:
+        return text
+    stash = []
+
+    def keep(fragment: str) -> str:
+        stash.append(fragment)
+        return _PLACEHOLDER.format(len(stash) - 1)
+
+    def fence(match):
+        lang, body = match.group(1), match.group(2).rstrip('\n')
+        body = html.escape(body, quote=False)
+        if lang:
+            return keep(f'<pre><code class="language-{lang}">{body}</code></pre>')
+        return keep(f"<pre>{body}</pre>")
+
+    # Code first so its content is never treated as markup
+    out = _FENCE.sub(fence, text)
+    out = _PRE_BLOCK.sub(lambda m: keep(f"<pre>{html.escape(m.group(1), quote=False)}</pre>"), out)
+    out = _INLINE_CODE.sub(lambda m: keep(f"<code>{html.escape(m.group(1), quote=False)}</code>"), out)
+    out = _LINK.sub(lambda m: keep(f'<a href="{html.escape(m.group(2))}">') + m.group(1) + keep("</a>"), out)
+    out = _ALLOWED_TAG.sub(lambda m: keep(m.group(0)), out)
+
+    out = html.escape(out, quote=False)
+
+    out = _HEADING.sub(r"<b>\1</b>", out)
+    out = _BOLD.sub(r"<b>\1</b>", out)
+    out = _ITALIC_DOUBLE.sub(r"<i>\1</i>", out)
+    out = _ITALIC_SINGLE.sub(r"<i>\1</i>", out)
+    out = _BULLET.sub(r"\1• ", out)
+
+    # Restore stashed fragments; nested placeholders (link text) resolve in order
+    while _PLACEHOLDER_RE.search(out):
+        out = _PLACEHOLDER_RE.sub(lambda m: stash[int(m.group(1))], out)
+
+    if not _balanced(out):
+        # Mismatched tags in the input: fall back to fully escaped text
+        out = html.escape(text, quote=False)
+
+    if decorate:
+        out = _decorate(text, out)
+    return out
+
+
+def _decorate(source: str, markup: str) -> str:
+    emoji = _PERSONA_EMOJI[zlib.crc32(source.encode('utf-8')) % len(_PERSONA_EMOJI)]
+    first, sep, rest = markup.partition('\n')
+    if '<pre' in first or emoji in first:
+        return markup
+    return f"{first} {emoji}{sep}{rest}"
+
+
+def strip_markup(text: str) -> str:
+    """Return text with the markdown dialect removed, for plain-text sends"""
+    return html.unescape(re.sub(r"<[^>]+>", "", format_html(text)))
+
+
+def split_html(markup: str, limit: int) -> list:
+    """Split Telegram HTML into messages of at most `limit` characters.
+
+    Cuts fall between tags and entities, at a line break where one is in
+    reach; tags open at a cut are closed at the end of one piece and opened
+    again at the start of the next, so every piece is valid markup on its own.
+    """
+    if len(markup) <= limit:
+        return [markup]
+    pieces = []
+    stack = []  # (name, opening tag) of the tags open at this point
+    current = ''
+    head = 0  # length of the tags reopened at the start of `current`
+
+    def closers() -> str:
+        return ''.join(f"</{name}>" for name, _ in reversed(stack))
+
+    def cut(final: bool = False):
+        nonlocal current, head
+        body, carry, open_tags = current, '', list(stack)
+        line = body.rfind('\n') + 1
+        if not final and line > head and '<' not in body[line:]:
+            # Move the unfinished last line (text and entities only) to the next piece
+            body, carry = body[:line], body[line:]
+        # Tags opened right before the cut move to the next piece whole
+        while open_tags and body.endswith(open_tags[-1][1]):
+            body = body[:-len(open_tags.pop()[1])]
+        if re.sub(r"<[^>]+>", "", body).strip():
+            pieces.append(body + ''.join(f"</{name}>" for name, _ in reversed(open_tags)))
+        current = ''.join(tag for _, tag in stack)
+        head = len(current)
+        current += carry
+
+    for token in _SPLIT_TOKEN.split(markup):
+        if not token:
+            continue
+        if _SPLIT_TOKEN.fullmatch(token) and token.startswith('<'):
+            name = _TAG_NAME.match(token).group(1).lower()
+            extra = len(token) + (0 if token.startswith('</') else len(name) + 3)
+            if len(current) + extra + len(closers()) > limit:
+                cut()
+            if token.startswith('</'):
+                if stack and current.endswith(stack[-1][1]):
+                    current = current[:-len(stack[-1][1])]  # nothing left inside after a cut
+                else:
+                    current += token
+                if stack:
+                    stack.pop()
+            else:
+                current += token
+                stack.append((name, token))
+            continue
+        while token:
+            room = limit - len(current) - len(closers())
+            if len(token) <= room:
+                current += token
+                break
+            if _SPLIT_TOKEN.fullmatch(token):
+                cut()  # an entity is never split
+                continue
+            end = token.rfind('\n', 0, room) + 1
+            if not end and len(current) > head:
+                cut()  # no line break in reach: start the next piece with this text
+                continue
+            end = end or max(1, room)
+            current += token[:end]
+            token = token[end:]
+            cut()
+    cut(final=True)
+    return pieces or [markup[:limit]]
@@ -0,0 +1,174 @@
+import json
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from bot.config import Config
+from bot.gemini_scheduler import GeminiScheduler, SchedulerTimeout, INTERACTIVE, get_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: rate limited or transient server errors
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class GeminiClient:
+    """Shared, thread-safe Gemini API client.
+
+    Uses one requests.Session with a keep-alive connection pool so calls reuse
+    TLS connections to the API host. Requests that hit 429/5xx or a connection
+    error are retried with jittered exponential backoff, without exceeding the
+    caller's overall deadline. When a scheduler is set, every attempt first
+    takes a token from it in the caller's priority lane.
+    """
+
+    def __init__(self, base_url: str, model: str, pool_size: int = 8, max_retries: int = 2,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 scheduler: Optional[GeminiScheduler] = None):
+        self.scheduler = scheduler
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._session: Optional[requests.Session] = None
+        self._lock = threading.Lock()
+        self.requests_sent = 0
+        self.retries = 0
+
+    @property
+    def session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+            return self._session
+
+    def url(self, method: str = 'generateContent') -> str:
+        return f"{self.base_url}/models/{self.model}:{method}"
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # Full jitter: uniform in [0, base * 2^attempt]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def post(self, method: str, payload: Dict[str, Any], api_key: str, timeout: float = 30,
+             deadline: Optional[float] = None, stream: bool = False, params: Optional[Dict[str, str]] = None,
+             priority: int = INTERACTIVE, max_wait: Optional[float] = None) -> requests.Response:
+        """POST to a model method with retries. `deadline` bounds the total time
+        (seconds) spent across attempts, `max_wait` the time queued for a
+        scheduler token; raises requests exceptions (SchedulerTimeout when the
+        queue wait runs out) on failure."""
+        headers = {
+            'Content-Type': 'application/json',
+            'X-goog-api-key': api_key
+        }
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            remaining = None if deadline is None else deadline - (time.monotonic() - started)
+            if remaining is not None and remaining <= 0:
+                raise requests.exceptions.Timeout(f"Gemini deadline of {deadline:.1f}s exceeded")
+            if self.scheduler is not None:
+                wait = max_wait if remaining is None else (remaining if max_wait is None else min(max_wait, remaining))
+                if not self.scheduler.acquire(priority, wait):
+                    raise SchedulerTimeout(f"Gemini request queued longer than {wait:.1f}s")
+                remaining = None if deadline is None else deadline - (time.monotonic() - started)
+                if remaining is not None and remaining <= 0:
+                    raise requests.exceptions.Timeout(f"Gemini deadline of {deadline:.1f}s exceeded")
+            call_timeout = timeout if remaining is None else min(timeout, remaining)
+            retry_after = None
+            try:
+                self.requests_sent += 1
+                resp = self.session.post(self.url(method), json=payload, headers=headers,
+                                         timeout=call_timeout, stream=stream, params=params)
+                if resp.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                    resp.raise_for_status()
+                    return resp
+                retry_after = resp.headers.get('Retry-After')
+                resp.close()
+                logger.debug(f"Gemini {method} returned {resp.status_code}, retrying")
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                logger.debug(f"Gemini {method} failed ({e}), retrying")
+
+            delay = self._backoff(attempt, retry_after)
+            if deadline is not None and time.monotonic() - started + delay >= deadline:
+                raise requests.exceptions.Timeout(f"Gemini deadline of {deadline:.1f}s exceeded while backing off")
+            attempt += 1
+            self.retries += 1
+            time.sleep(delay)
+
+    def generate(self, payload: Dict[str, Any], api_key: str, timeout: float = 30,
+                 deadline: Optional[float] = None, priority: int = INTERACTIVE,
+                 max_wait: Optional[float] = None) -> Dict[str, Any]:
+        """Call generateContent and return the decoded JSON response"""
+        return self.post('generateContent', payload, api_key, timeout=timeout, deadline=deadline,
+                         priority=priority, max_wait=max_wait).json()
+
+    def stream_generate(self, payload: Dict[str, Any], api_key: str, timeout: float = 30,
+                        priority: int = INTERACTIVE) -> Iterator[str]:
+        """Call streamGenerateContent (server-sent events) and yield text chunks as they arrive"""
+        resp = self.post('streamGenerateContent', payload, api_key, timeout=timeout,
+                         stream=True, params={'alt': 'sse'}, priority=priority)
+        try:
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                try:
+                    data = json.loads(line[5:].strip())
+                except ValueError:
+                    continue
+                text = extract_text(data)
+                if text:
+                    yield text
+        finally:
+            resp.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {'requests': self.requests_sent, 'retries': self.retries, 'pool_size': self.pool_size}
+
+
+def extract_text(data: Any) -> Optional[str]:
+    """Return the text of the first candidate in a generateContent response"""
+    if isinstance(data, dict):
+        candidates = data.get('candidates', [])
+        if candidates and isinstance(candidates, list):
+            content = candidates[0].get('content', {})
+            parts = content.get('parts', [])
+            if parts and isinstance(parts, list):
+                return parts[0].get('text')
+    return None
+
+
+_client: Optional[GeminiClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> GeminiClient:
+    """Return the process-wide Gemini client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GeminiClient(
+                base_url=Config.GEMINI_API_BASE,
+                model=Config.GEMINI_MODEL,
+                pool_size=Config.GEMINI_POOL_SIZE,
+                max_retries=Config.GEMINI_MAX_RETRIES,
+                scheduler=get_scheduler(),
+            )
+        return _client
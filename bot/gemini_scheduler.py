@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import requests
+
+from bot.config import Config
+
+# Priority lanes, lower value is served first
+INTERACTIVE = 0   # /ai prompts a user is waiting on
+BACKGROUND = 1    # cosmetic ai_render work: progress pings, reminders, status output
+
+LANE_NAMES = {INTERACTIVE: 'interactive', BACKGROUND: 'background'}
+
+
+class SchedulerTimeout(requests.exceptions.Timeout):
+    """Raised when a request waited longer than its max_wait for a token"""
+
+
+class _LaneStats:
+    __slots__ = ('granted', 'dropped', 'total_wait', 'max_wait', 'recent')
+
+    def __init__(self):
+        self.granted = 0
+        self.dropped = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent = deque(maxlen=200)
+
+
+class GeminiScheduler:
+    """Token bucket in front of every Gemini request, with priority lanes.
+
+    The bucket refills at `rate` tokens per second up to `capacity`. A waiting
+    request only takes a token when no request in a higher-priority lane is
+    waiting, so interactive prompts overtake queued cosmetic renders. Requests
+    that cannot get a token within their `max_wait` give up (SchedulerTimeout).
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = max(float(rate), 1e-6)
+        self.capacity = max(float(capacity), 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._lanes = {lane: deque() for lane in LANE_NAMES}
+        self._stats = {lane: _LaneStats() for lane in LANE_NAMES}
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _is_next(self, lane: int, ticket: object) -> bool:
+        for other in sorted(self._lanes):
+            if other >= lane:
+                break
+            if self._lanes[other]:
+                return False
+        return self._lanes[lane][0] is ticket
+
+    def acquire(self, priority: int = BACKGROUND, max_wait: Optional[float] = None) -> bool:
+        """Block until a token is available for this priority; False on max_wait timeout"""
+        ticket = object()
+        started = time.monotonic()
+        with self._cond:
+            lane = self._lanes[priority]
+            lane.append(ticket)
+            try:
+                while True:
+                    self._refill()
+                    if self._tokens >= 1 and self._is_next(priority, ticket):
+                        self._tokens -= 1
+                        lane.popleft()
+                        self._record(priority, time.monotonic() - started)
+                        self._cond.notify_all()
+                        return True
+                    waited = time.monotonic() - started
+                    if max_wait is not None and waited >= max_wait:
+                        lane.remove(ticket)
+                        self._stats[priority].dropped += 1
+                        self._cond.notify_all()
+                        return False
+                    timeout = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.05
+                    if max_wait is not None:
+                        timeout = min(timeout, max_wait - waited)
+                    self._cond.wait(max(timeout, 0.001))
+            except BaseException:
+                if ticket in lane:
+                    lane.remove(ticket)
+                    self._cond.notify_all()
+                raise
+
+    def _record(self, priority: int, wait: float):
+        stats = self._stats[priority]
+        stats.granted += 1
+        stats.total_wait += wait
+        stats.max_wait = max(stats.max_wait, wait)
+        stats.recent.append(wait)
+
+    def stats(self) -> Dict[str, object]:
+        """Return queue depth and wait-time metrics per lane"""
+        with self._cond:
+            self._refill()
+            lanes = {}
+            for lane, name in LANE_NAMES.items():
+                st = self._stats[lane]
+                recent = sorted(st.recent)
+                lanes[name] = {
+                    'depth': len(self._lanes[lane]),
+                    'granted': st.granted,
+                    'dropped': st.dropped,
+                    'avg_wait': (st.total_wait / st.granted) if st.granted else 0.0,
+                    'p95_wait': recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0,
+                    'max_wait': st.max_wait,
+                }
+            return {
+                'tokens': self._tokens,
+                'capacity': self.capacity,
+                'rate_per_min': self.rate * 60,
+                'lanes': lanes,
+            }
+
+
+_scheduler: Optional[GeminiScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> GeminiScheduler:
+    """Return the process-wide scheduler sized from GEMINI_RATE_PER_MIN/GEMINI_BURST"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = GeminiScheduler(rate=Config.GEMINI_RATE_PER_MIN / 60.0,
+                                         capacity=Config.GEMINI_BURST)
+        return _scheduler
@@ -0,0 +1,157 @@
+"""Reload changed command modules without restarting the process.
+
+Only modules under bot/commands/ are reloaded; a change to any other file
+(core modules, main.py, requirements.txt) still needs a full restart. A
+module is re-executed in its existing namespace, so threads and scheduler
+jobs started by the old code keep seeing the same globals, and module-level
+state is carried over:
+
+- functions, classes and imported modules take the new definitions
+- UPPER_CASE names are constants and take the new value, unless the new
+  value is None and the old one is not (lazily initialised, e.g. QB_API)
+- every other global (queues, locks, caches, flags) keeps its old value
+
+If any module fails to import, every module of the batch is rolled back.
+"""
+import hashlib
+import importlib
+import inspect
+import logging
+import os
+import sys
+import threading
+import types
+from typing import Dict, List, Tuple
+
+from bot.config import Config
+
+logger = logging.getLogger(__name__)
+
+COMMANDS_PACKAGE = 'bot.commands'
+COMMANDS_DIR = os.path.join('bot', 'commands')
+
+# Non-Python files whose change needs a restart
+_WATCHED_EXTRA = ('requirements.txt',)
+
+_baseline: Dict[str, str] = {}
+_reload_lock = threading.Lock()
+
+
+def _hash(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _scan() -> Dict[str, str]:
+    """Map of repo-relative path -> content hash for the bot's source files"""
+    files = {}
+    for root, dirs, names in os.walk(os.path.join(Config.BASE_DIR, 'bot')):
+        dirs[:] = [d for d in dirs if d != '__pycache__']
+        for name in names:
+            if name.endswith('.py'):
+                path = os.path.join(root, name)
+                files[os.path.relpath(path, Config.BASE_DIR)] = _hash(path)
+    for name in ('main.py',) + _WATCHED_EXTRA:
+        path = os.path.join(Config.BASE_DIR, name)
+        if os.path.exists(path):
+            files[name] = _hash(path)
+    return files
+
+
+def record_baseline():
+    """Remember the source files as they are now (call once at startup)"""
+    global _baseline
+    _baseline = _scan()
+
+
+def changed_files() -> List[str]:
+    """Files added, removed or modified since the baseline"""
+    current = _scan()
+    paths = set(current) | set(_baseline)
+    return sorted(p for p in paths if current.get(p) != _baseline.get(p))
+
+
+def plan(changed: List[str]) -> Tuple[List[str], List[str]]:
+    """Split changed files into (reloadable module names, files needing a restart)"""
+    modules, core = [], []
+    for path in changed:
+        directory, name = os.path.split(path)
+        module = COMMANDS_PACKAGE + '.' + name[:-3]
+        if directory == COMMANDS_DIR and name != '__init__.py' \
+                and os.path.exists(os.path.join(Config.BASE_DIR, path)):
+            # Modules not imported yet load the new code on first use anyway
+            if module in sys.modules:
+                modules.append(module)
+        else:
+            # Core modules, the registry, and deleted command modules need a restart
+            core.append(path)
+    return modules, core
+
+
+def _is_constant(name: str) -> bool:
+    return name.lstrip('_').isupper()
+
+
+def _keep_old(name: str, old, new) -> bool:
+    if name.startswith('__') or isinstance(old, (types.FunctionType, types.ModuleType, type)):
+        return False
+    if _is_constant(name):
+        return new is None and old is not None
+    return True
+
+
+def _reexec(module: types.ModuleType) -> Dict[str, object]:
+    """Re-execute a module in place; returns the old namespace (for rollback)"""
+    saved = dict(module.__dict__)
+    try:
+        importlib.reload(module)
+    except BaseException:
+        module.__dict__.clear()
+        module.__dict__.update(saved)
+        raise
+    namespace = module.__dict__
+    for name, old in saved.items():
+        if name in namespace and _keep_old(name, old, namespace[name]):
+            namespace[name] = old
+    return saved
+
+
+def reload_commands(names: List[str]) -> List[str]:
+    """Reload command modules and swap their handlers; the command_handler
+    registry holds the same callbacks, so it follows. Raises (after rolling
+    back) if any module fails."""
+    from bot.dispatch import get_dispatcher
+
+    with _reload_lock:
+        done = []
+        try:
+            for name in names:
+                module = sys.modules[name]
+                done.append((module, _reexec(module)))
+        except BaseException:
+            for module, saved in reversed(done):
+                module.__dict__.clear()
+                module.__dict__.update(saved)
+            raise
+
+        reloaded = {module.__name__: module for module, _ in done}
+        dispatcher = get_dispatcher()
+        swaps = {}
+        for callback in dispatcher.callbacks:
+            if isinstance(callback.func, str):
+                continue  # not used yet: resolves to the new code on first call
+            module = reloaded.get(getattr(callback.func, '__module__', None))
+            if module is None:
+                continue
+            new = getattr(module, callback.func.__name__, None)
+            if inspect.isfunction(new):
+                swaps[callback] = new
+            else:
+                logger.warning(f"{module.__name__}.{callback.func.__name__} disappeared; keeping old handler")
+        dispatcher.swap(swaps)
+
+        for module, _ in done:
+            path = os.path.relpath(module.__file__, Config.BASE_DIR)
+            _baseline[path] = _hash(module.__file__)
+        logger.info(f"Hot-reloaded {', '.join(reloaded)} ({len(swaps)} handler(s) swapped)")
+        return list(reloaded)
@@ -0,0 +1,159 @@
+import csv
+import logging
+import os
+import threading
+import time
+from typing import FrozenSet, Optional, Tuple
+
+from dotenv import dotenv_values
+
+from bot.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Roles a user can hold; USER means listed in user.csv
+USER = 'user'
+SUPERUSER = 'superuser'
+OWNER = 'owner'
+
+
+class Identity:
+    """Immutable snapshot of who may use the bot"""
+
+    __slots__ = ('owner', 'users', 'superusers')
+
+    def __init__(self, owner: Optional[int], users: FrozenSet[int], superusers: FrozenSet[int]):
+        self.owner = owner
+        self.users = users
+        self.superusers = superusers
+
+    def is_owner(self, user_id: int) -> bool:
+        return self.owner is not None and user_id == self.owner
+
+    def is_user(self, user_id: int) -> bool:
+        return user_id in self.users
+
+    def is_superuser(self, user_id: int) -> bool:
+        return user_id in self.superusers
+
+    def roles(self, user_id: int) -> FrozenSet[str]:
+        roles = set()
+        if user_id in self.users:
+            roles.add(USER)
+        if user_id in self.superusers:
+            roles.add(SUPERUSER)
+        if self.is_owner(user_id):
+            roles.add(OWNER)
+        return frozenset(roles)
+
+
+def _read_users(path: str) -> Tuple[Optional[int], FrozenSet[int]]:
+    """Parse user.csv: one id per row, the first row is the owner"""
+    owner = None
+    users = []
+    with open(path, 'r') as file:
+        for row in csv.reader(file):
+            if row and row[0].strip():  # Skip empty rows
+                users.append(int(row[0].strip()))
+    if users:
+        owner = users[0]
+    return owner, frozenset(users)
+
+
+def _parse_ids(value: str) -> FrozenSet[int]:
+    return frozenset(int(i.strip()) for i in value.split(',') if i.strip())
+
+
+class IdentityService:
+    """Owner, users and superusers, reloaded when their sources change.
+
+    A background thread stats user.csv and .env every `check_interval`
+    seconds and swaps in a new Identity snapshot when either changed, so
+    permission checks on the hot path are a set lookup with no file I/O.
+    SUPERUSER_IDS is taken from .env when it defines it, otherwise from the
+    environment the bot was started with.
+    """
+
+    def __init__(self, users_path: str, env_path: str, check_interval: float = 2.0):
+        self.users_path = users_path
+        self.env_path = env_path
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._stamps = None
+        self._identity = Identity(None, frozenset(), frozenset(Config.SUPERUSER_IDS))
+        self._lock = threading.Lock()
+        self._thread = None
+        self.reload()
+
+    @property
+    def current(self) -> Identity:
+        return self._identity
+
+    def _stat(self):
+        stamps = []
+        for path in (self.users_path, self.env_path):
+            try:
+                st = os.stat(path)
+                stamps.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def reload(self, force: bool = True) -> bool:
+        """Re-read the sources if they changed (or always with `force`); True if reloaded"""
+        with self._lock:
+            stamps = self._stat()
+            if not force and stamps == self._stamps:
+                return False
+            self._stamps = stamps
+            old = self._identity
+            try:
+                owner, users = _read_users(self.users_path)
+            except Exception as e:
+                logger.error(f"Error loading authorized users: {e}")
+                owner, users = old.owner, old.users
+            superusers = old.superusers
+            try:
+                value = dotenv_values(self.env_path).get('SUPERUSER_IDS') if os.path.exists(self.env_path) else None
+                superusers = _parse_ids(value) if value is not None else frozenset(Config.SUPERUSER_IDS)
+            except Exception as e:
+                logger.error(f"Error loading SUPERUSER_IDS: {e}")
+            self._identity = Identity(owner, users, superusers)
+            self.reloads += 1
+        logger.info(f"Loaded {len(users)} authorized users, {len(superusers)} superusers")
+        return True
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._watch, name='identity-watch', daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.check_interval)
+            try:
+                self.reload(force=False)
+            except Exception as e:
+                logger.error(f"Identity reload failed: {e}")
+
+
+_service: Optional[IdentityService] = None
+_service_lock = threading.Lock()
+
+
+def get_identity_service() -> IdentityService:
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                service = IdentityService(Config.AUTHORIZED_IDS_FILE_PATH, os.path.join(Config.BASE_DIR, '.env'),
+                                          Config.IDENTITY_CHECK_INTERVAL)
+                service.start()
+                _service = service
+    return _service
+
+
+def identity() -> Identity:
+    """Current identity snapshot (no file I/O)"""
+    return get_identity_service().current
@@ -0,0 +1,361 @@
+"""Shell commands run as tracked background jobs (/bash, /sudo; /jobs, /kill, /output).
+
+A handler submits a command and returns right away; JOBS_MAX_RUNNING worker
+threads run the queued jobs, at most JOBS_QUEUE_LIMIT wait. Each job runs in
+its own session under rlimits (JOB_CPU_SECONDS of CPU, JOB_MEMORY_MB of
+address space) through bot.proc, which reads both pipes with a selector and
+kills the whole process group when the wall-time limit passes or /kill asks
+for it (SIGTERM, then SIGKILL after a grace period).
+
+stdout and stderr are kept interleaved in a ring buffer of JOB_OUTPUT_MB per
+job, so /output can page through the newest output of running and finished
+jobs without memory growing with chatty commands. The last JOBS_HISTORY jobs
+are kept for /jobs.
+
+A listener (LiveJobView for chat commands) is told when a job is queued,
+starts, prints and ends; it is called on the job's worker thread.
+"""
+import gzip
+import html
+import io
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+from bot import outbox, proc
+from bot.config import Config
+from bot.live_message import MAX_TEXT_LENGTH, LiveMessage
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED, KILLED, TIMEOUT = 'queued', 'running', 'done', 'failed', 'killed', 'timeout'
+FINISHED = (DONE, FAILED, KILLED, TIMEOUT)
+
+
+class JobQueueFull(RuntimeError):
+    """JOBS_QUEUE_LIMIT jobs are already waiting"""
+
+
+class OutputBuffer:
+    """Newest `capacity` characters of a job's output; read by /output while the job appends"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.total = 0
+        self.version = 0
+        self._chunks = deque()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def add(self, text: str):
+        with self._lock:
+            self.total += len(text)
+            self._chunks.append(text)
+            self._size += len(text)
+            while self._size > self.capacity:
+                excess = self._size - self.capacity
+                head = self._chunks[0]
+                if len(head) <= excess:
+                    self._chunks.popleft()
+                    self._size -= len(head)
+                else:
+                    self._chunks[0] = head[excess:]
+                    self._size -= excess
+            self.version += 1
+
+    @property
+    def dropped(self) -> int:
+        """Characters that no longer fit and were discarded (the oldest ones)"""
+        return self.total - self._size
+
+    def text(self) -> str:
+        with self._lock:
+            return ''.join(self._chunks)
+
+    def tail(self, n: int) -> str:
+        with self._lock:
+            parts, size = [], 0
+            for chunk in reversed(self._chunks):
+                parts.append(chunk)
+                size += len(chunk)
+                if size >= n:
+                    break
+            return ''.join(reversed(parts))[-n:]
+
+
+class Job:
+    __slots__ = ('id', 'command', 'kind', 'user_id', 'chat_id', 'timeout', 'listener', 'state', 'exit_code',
+                 'error', 'output', 'submitted_at', 'started_at', 'finished_at', 'process', 'kill_requested',
+                 'announced')
+
+    def __init__(self, job_id: int, command: str, kind: str, user_id: int, chat_id: int, timeout: float,
+                 listener, capacity: int):
+        self.id = job_id
+        self.command = command
+        self.kind = kind
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.timeout = timeout
+        self.listener = listener
+        self.state = QUEUED
+        self.exit_code: Optional[int] = None
+        self.error: Optional[str] = None
+        self.output = OutputBuffer(capacity)
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.process: Optional[proc.Process] = None
+        self.kill_requested = False
+        self.announced = threading.Event()  # set once the listener has seen on_queued
+
+    @property
+    def duration(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+
+def _with_limits(command: str) -> str:
+    # The shell sets the limits on itself before the command runs, and everything it
+    # starts inherits them. A preexec_fn would run Python between fork and exec, which
+    # can deadlock in this multithreaded process; prlimit() after the spawn would race
+    # with the shell's first fork
+    limits = []
+    if Config.JOB_CPU_SECONDS > 0:
+        limits.append(f"ulimit -t {int(Config.JOB_CPU_SECONDS)}")
+    if Config.JOB_MEMORY_MB > 0:
+        limits.append(f"ulimit -v {int(Config.JOB_MEMORY_MB * 1024)}")  # KiB
+    return ''.join(f"{limit} || exit 126\n" for limit in limits) + command
+
+
+class JobManager:
+    def __init__(self, max_running: int, queue_limit: int, history: int, capacity: int):
+        self.max_running = max_running
+        self.queue_limit = queue_limit
+        self.history = history
+        self.capacity = capacity
+        self._jobs: 'OrderedDict[int, Job]' = OrderedDict()
+        self._queue = deque()
+        self._next_id = 1
+        self._cond = threading.Condition()
+        self._workers: List[threading.Thread] = []
+
+    def submit(self, command: str, kind: str, user_id: int, chat_id: int, timeout: Optional[float] = None,
+               listener=None) -> Job:
+        """Queue a shell command; raises JobQueueFull when too many are waiting"""
+        with self._cond:
+            if len(self._queue) >= self.queue_limit:
+                raise JobQueueFull()
+            job = Job(self._next_id, command, kind, user_id, chat_id,
+                      Config.JOB_WALL_TIMEOUT if timeout is None else timeout, listener, self.capacity)
+            self._next_id += 1
+            self._jobs[job.id] = job
+            self._prune()
+            self._queue.append(job)
+            self._start_workers()
+            self._cond.notify()
+        self._notify(job, 'on_queued')
+        return job
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.state in FINISHED]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job_id]
+
+    def _start_workers(self):
+        while len(self._workers) < self.max_running:
+            worker = threading.Thread(target=self._work, name=f"job-{len(self._workers) + 1}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                job = self._queue.popleft()
+                if job.state != QUEUED:
+                    continue  # killed while waiting
+                job.state = RUNNING
+                job.started_at = time.time()
+            try:
+                self._run(job)
+            except Exception as e:
+                logger.error(f"Job #{job.id} failed: {e}")
+                self._finish(job, FAILED, error=str(e))
+
+    def _run(self, job: Job):
+        def on_output(text: str):
+            job.output.add(text)
+            self._notify(job, 'on_output')
+
+        process = proc.Process(_with_limits(job.command), shell=True, timeout=job.timeout, on_output=on_output,
+                               capture=False)
+        try:
+            process.start()
+        except Exception as e:
+            self._finish(job, FAILED, error=str(e))
+            return
+        with self._cond:
+            job.process = process
+            if job.kill_requested:
+                process.terminate()
+        self._notify(job, 'on_start')
+        result = process.run()
+        job.exit_code = result.returncode
+        if result.timed_out:
+            state = TIMEOUT
+        elif result.terminated:
+            state = KILLED
+        else:
+            state = DONE if result.returncode == 0 else FAILED
+        self._finish(job, state)
+
+    def _finish(self, job: Job, state: str, error: Optional[str] = None):
+        with self._cond:
+            job.state = state
+            job.error = error
+            job.finished_at = time.time()
+            job.process = None
+        self._notify(job, 'on_finish')
+
+    def _notify(self, job: Job, event: str):
+        # The job is visible to workers and /kill before on_queued returns; later
+        # events wait for it so the listener always sees them in order
+        if event != 'on_queued':
+            job.announced.wait()
+        handler = getattr(job.listener, event, None)
+        try:
+            if handler is not None:
+                handler(job)
+        except Exception as e:
+            logger.error(f"Job #{job.id} listener {event} failed: {e}")
+        finally:
+            if event == 'on_queued':
+                job.announced.set()
+
+    def kill(self, job_id: int) -> bool:
+        """Cancel a queued job or terminate a running one; False if it already ended"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED:
+                return False
+            if job.state == QUEUED:
+                job.state = KILLED
+                job.finished_at = time.time()
+                self._queue.remove(job)
+                queued = True
+            else:
+                job.kill_requested = True
+                if job.process is not None:
+                    job.process.terminate()
+                queued = False
+        if queued:
+            self._notify(job, 'on_finish')
+        return True
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        with self._cond:
+            return list(self._jobs.values())
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            running = sum(1 for job in self._jobs.values() if job.state == RUNNING)
+            return {'running': running, 'queued': len(self._queue), 'max_running': self.max_running,
+                    'kept': len(self._jobs)}
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_jobs() -> JobManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager(Config.JOBS_MAX_RUNNING, Config.JOBS_QUEUE_LIMIT, Config.JOBS_HISTORY,
+                                      int(Config.JOB_OUTPUT_MB * 2 ** 20))
+    return _manager
+
+
+# -- chat presentation ------------------------------------------------------
+
+# Output tail shown in the live message; longer output is also attached (gzip)
+LIVE_TAIL = 3500
+LIVE_MAX_INTERVAL = 10
+
+
+class LiveJobView:
+    """Shows a job in one live message, then a summary and, for long output, the output as .txt.gz"""
+
+    def __init__(self, bot, chat_id: int):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.live: Optional[LiveMessage] = None
+
+    def _header(self, job: Job) -> str:
+        return f"<b>#{job.id} $</b> <code>{html.escape(job.command[:200])}</code>"
+
+    def _render(self, job: Job, idle: str) -> str:
+        tail = job.output.tail(LIVE_TAIL)
+        if not tail:
+            return f"{self._header(job)}\n<i>{idle}</i>"
+        # Escaping can make the tail longer; trim the raw text so the whole message
+        # fits and LiveMessage never has to cut the header off
+        room = MAX_TEXT_LENGTH - len(self._header(job)) - len('\n<pre>…</pre>')
+        body = html.escape(tail)
+        if len(body) > room:
+            start, size = len(tail), 0
+            while start > 0 and size + len(html.escape(tail[start - 1])) <= room:
+                start -= 1
+                size += len(html.escape(tail[start]))
+            tail = tail[start:]
+            body = html.escape(tail)
+        clipped = job.output.total > len(tail)
+        return f"{self._header(job)}\n<pre>{'…' if clipped else ''}{body}</pre>"
+
+    def on_queued(self, job: Job):
+        self.live = LiveMessage(self.bot, self.chat_id, self._render(job, '⏳ menunggu giliran...'),
+                                parse_mode="HTML", max_interval=LIVE_MAX_INTERVAL)
+
+    def on_start(self, job: Job):
+        self.live.update(self._render(job, 'menunggu output...'))
+
+    def on_output(self, job: Job):
+        self.live.update(self._render(job, 'menunggu output...'))
+
+    def on_finish(self, job: Job):
+        if job.state == DONE:
+            summary = f"<b>✅ Job #{job.id} selesai</b> dalam {job.duration:.1f} detik"
+        elif job.state == TIMEOUT:
+            summary = f"<b>⏱️ Job #{job.id} dihentikan setelah {job.timeout:.0f} detik</b>"
+        elif job.state == KILLED:
+            summary = f"<b>🛑 Job #{job.id} dihentikan</b> (/kill)"
+        elif job.exit_code is None:
+            summary = f"<b>❌ Job #{job.id} gagal dijalankan:</b> <code>{html.escape(job.error or '-')}</code>"
+        else:
+            summary = (f"<b>❌ Job #{job.id} selesai dengan exit code</b> <code>{job.exit_code}</code> "
+                       f"dalam {job.duration:.1f} detik")
+        attach = job.output.total > LIVE_TAIL
+        if attach:
+            summary += f"\n📎 Output lengkap dilampirkan sebagai file (juga: /output {job.id})."
+        self.live.finish(summary, text=self._render(job, 'Perintah dijalankan tanpa output.'))
+        if attach:
+            self._attach(job)
+
+    def _attach(self, job: Job):
+        text = job.output.text()
+        if job.output.dropped:
+            text = f"...({job.output.dropped} karakter awal tidak disimpan, batas JOB_OUTPUT_MB)\n" + text
+        name = f"job-{job.id}-{time.strftime('%Y%m%d-%H%M%S')}.txt.gz"
+        outbox.get_outbox().call(self.chat_id, self.bot.send_document, chat_id=self.chat_id,
+                                 document=io.BytesIO(gzip.compress(text.encode('utf-8'))), filename=name,
+                                 caption=f"Output lengkap job #{job.id} $ {job.command[:200]} "
+                                         f"({job.output.total} karakter)")
@@ -0,0 +1,85 @@
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Optional
+
+from bot.config import Config
+
+logger = logging.getLogger(__name__)
+
+_updater = None
+_webhook = None
+_exiting = threading.Event()
+
+
+def attach(updater, webhook=None):
+    """Remember the running updater (and webhook server) for graceful exits"""
+    global _updater, _webhook
+    _updater = updater
+    _webhook = webhook
+
+
+def _stop_intake():
+    if _webhook is not None:
+        # Unanswered webhook deliveries are retried by Telegram after the restart
+        _webhook.stop()
+    elif _updater is not None:
+        # Polling loop ends after the current getUpdates; nothing newer gets acknowledged
+        _updater.running = False
+
+
+def _drain(timeout: float) -> bool:
+    from bot.dispatch import get_dispatcher
+    from bot.offsets import get_tracker
+    from bot.outbox import get_outbox
+
+    deadline = time.monotonic() + timeout
+    tracker = get_tracker()
+    dispatcher = get_dispatcher()
+    outbox = get_outbox()
+    while True:
+        queue_empty = _updater is None or _updater.update_queue.empty()
+        # Messages the finished handlers queued on the outbox are still delivered
+        if queue_empty and tracker.in_flight() == 0 and dispatcher.drain(0) and outbox.drain(0):
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.1)
+
+
+def exit_process(restart: bool, timeout: Optional[float] = None):
+    """Stop taking updates, wait for in-flight handlers, persist the offset,
+    then re-exec the interpreter (restart) or exit. Never returns.
+
+    Must run outside the dispatch workers, otherwise the calling handler
+    would wait for itself; use request_exit() from a handler.
+    """
+    from bot.offsets import get_tracker
+
+    if _exiting.is_set():
+        return
+    _exiting.set()
+    timeout = Config.SHUTDOWN_DRAIN_TIMEOUT if timeout is None else timeout
+    _stop_intake()
+    if not _drain(timeout):
+        logger.warning(f"Exiting with {get_tracker().in_flight()} update(s) still in flight after {timeout}s")
+    get_tracker().flush()
+    from bot import recorder
+    recorder.flush()
+    logging.shutdown()
+
+    if restart:
+        os.execl(sys.executable, sys.executable, *sys.argv)
+    os._exit(0)
+
+
+def request_exit(restart: bool, delay: float = 0.0):
+    """Run exit_process in a background thread so the calling handler can finish first"""
+    def run():
+        if delay:
+            time.sleep(delay)
+        exit_process(restart)
+
+    threading.Thread(target=run, name='lifecycle', daemon=True).start()
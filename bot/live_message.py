@@ -0,0 +1,212 @@
+"""One Telegram message per job, edited in place while the job runs.
+
+Background jobs (downloads, torrents, doas output) used to post a new message
+for every progress step. A LiveMessage posts once and then edits that message
+with the latest text: at most every LIVE_MIN_INTERVAL seconds at first, backing
+off by LIVE_BACKOFF per edit up to LIVE_MAX_INTERVAL, so a job running for an
+hour costs a few hundred edits instead of a message every few seconds. Edits
+whose text did not change are skipped, and only the newest text is ever sent.
+finish() applies the last text and posts one summary message, so the chat is
+still notified when the job is done.
+
+All calls go through the outbox and respect its rate limits; update() never
+blocks the job thread.
+"""
+import logging
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from telegram.error import BadRequest
+
+from bot import outbox
+from bot.config import Config
+
+logger = logging.getLogger(__name__)
+
+MAX_TEXT_LENGTH = 4096
+
+# Tags and entities of Telegram HTML, which a clip must not cut through
+_HTML_TOKEN = re.compile(r'(<[^>]*>|&#?\w+;)')
+
+live_stats = {'messages': 0, 'edits': 0, 'unchanged': 0, 'superseded': 0}
+
+_active: List['LiveMessage'] = []
+_active_lock = threading.Lock()
+_ticker: Optional[threading.Thread] = None
+
+
+def _clip(text: str, parse_mode: Optional[str] = None) -> str:
+    # Keep the newest part of long text, e.g. the tail of command output
+    if len(text) <= MAX_TEXT_LENGTH:
+        return text
+    if parse_mode != 'HTML':
+        return '…' + text[-(MAX_TEXT_LENGTH - 1):]
+    return _clip_html(text)
+
+
+def _clip_html(text: str) -> str:
+    """Tail of HTML text cut between tags and entities; tags still open at the
+    cut are opened again in front, so the markup stays valid"""
+    parts = [p for p in _HTML_TOKEN.split(text) if p]
+    reopen = ''
+    while True:
+        budget = MAX_TEXT_LENGTH - 1 - len(reopen)
+        kept, size, cut = [], 0, len(parts)
+        for i in range(len(parts) - 1, -1, -1):
+            part = parts[i]
+            if size + len(part) > budget:
+                if not _HTML_TOKEN.fullmatch(part):
+                    kept.append(part[len(part) - (budget - size):])
+                break
+            kept.append(part)
+            size += len(part)
+            cut = i
+        stack = []
+        for part in parts[:cut]:
+            if part.startswith('</'):
+                if stack:
+                    stack.pop()
+            elif part.startswith('<') and not part.endswith('/>'):
+                stack.append(part)
+        needed = ''.join(stack)
+        if len(needed) <= len(reopen):
+            return needed + '…' + ''.join(reversed(kept))
+        reopen = needed
+
+
+class LiveMessage:
+    """A status message owned by one job and updated in place"""
+
+    def __init__(self, bot, chat_id: int, text: str, parse_mode: Optional[str] = None,
+                 min_interval: Optional[float] = None, max_interval: Optional[float] = None,
+                 backoff: Optional[float] = None):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.parse_mode = parse_mode
+        self.min_interval = Config.LIVE_MIN_INTERVAL if min_interval is None else min_interval
+        self.max_interval = Config.LIVE_MAX_INTERVAL if max_interval is None else max_interval
+        self.backoff = Config.LIVE_BACKOFF if backoff is None else backoff
+        self._interval = self.min_interval
+        self._lock = threading.Lock()
+        self._text = _clip(text, parse_mode)
+        self._shown = self._text
+        self._next_edit = time.monotonic() + self._interval
+        self._pending = None  # Future of the edit still waiting in the outbox
+        self._closed = False
+        self._message = outbox.get_outbox().call(chat_id, self._send, self._text)
+        live_stats['messages'] += 1
+        _track(self)
+
+    # -- Bot API calls (run on outbox threads) ----------------------------
+
+    def _send(self, text: str):
+        try:
+            return self.bot.send_message(chat_id=self.chat_id, text=text, parse_mode=self.parse_mode)
+        except BadRequest:
+            if self.parse_mode is None:
+                raise
+            return self.bot.send_message(chat_id=self.chat_id, text=text)
+
+    def _edit(self, message, text: str):
+        try:
+            return self.bot.edit_message_text(text, chat_id=self.chat_id, message_id=message.message_id,
+                                              parse_mode=self.parse_mode)
+        except BadRequest as e:
+            if 'not modified' in str(e).lower():
+                return None
+            if self.parse_mode is None:
+                raise
+            return self.bot.edit_message_text(text, chat_id=self.chat_id, message_id=message.message_id)
+
+    # -- job side ---------------------------------------------------------
+
+    def update(self, text: str):
+        """Set the latest text; it is shown on the next due edit"""
+        with self._lock:
+            if not self._closed:
+                self._text = _clip(text, self.parse_mode)
+        self._flush(force=False)
+
+    def _flush(self, force: bool):
+        with self._lock:
+            now = time.monotonic()
+            if not force and (self._closed or now < self._next_edit):
+                return
+            if self._text == self._shown:
+                live_stats['unchanged'] += 1
+                self._next_edit = now + self._interval
+                return
+            if not self._message.done():
+                return  # first send still queued; it is retried on the next tick
+            message = None if self._message.exception() else self._message.result()
+            if message is None:
+                return
+            if self._pending is not None and not self._pending.done():
+                # Previous edit still queued: the newer text replaces it on the next tick
+                live_stats['superseded'] += 1
+                return
+            text = self._text
+            self._shown = text
+            self._pending = outbox.get_outbox().call(self.chat_id, self._edit, message, text)
+            live_stats['edits'] += 1
+            self._interval = min(self.max_interval, self._interval * self.backoff)
+            self._next_edit = now + self._interval
+
+    def close(self, text: Optional[str] = None, timeout: float = 30.0):
+        """Apply the final text (or the latest update) and stop editing"""
+        with self._lock:
+            if self._closed:
+                return
+            if text is not None:
+                self._text = _clip(text, self.parse_mode)
+            self._closed = True
+        _untrack(self)
+        try:
+            self._message.result(timeout)
+            if self._pending is not None:
+                self._pending.result(timeout)
+        except Exception as e:
+            logger.debug(f"Live message for chat {self.chat_id} not delivered: {e}")
+            return
+        self._flush(force=True)
+
+    def finish(self, summary: Optional[str] = None, text: Optional[str] = None):
+        """close() and post `summary` as a new message, which notifies the chat"""
+        self.close(text)
+        if summary:
+            outbox.send_message(self.bot, self.chat_id, summary, parse_mode=self.parse_mode)
+
+
+def _track(message: LiveMessage):
+    global _ticker
+    with _active_lock:
+        _active.append(message)
+        if _ticker is None:
+            _ticker = threading.Thread(target=_tick, name='live-message', daemon=True)
+            _ticker.start()
+
+
+def _untrack(message: LiveMessage):
+    with _active_lock:
+        if message in _active:
+            _active.remove(message)
+
+
+def _tick():
+    # Shows the latest text of jobs that stopped calling update() for a while
+    while True:
+        time.sleep(0.5)
+        with _active_lock:
+            messages = list(_active)
+        for message in messages:
+            try:
+                message._flush(force=False)
+            except Exception as e:
+                logger.debug(f"Live message flush failed: {e}")
+
+
+def stats() -> Dict[str, int]:
+    with _active_lock:
+        return dict(live_stats, active=len(_active))
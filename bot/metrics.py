@@ -0,0 +1,142 @@
+"""Fixed-memory latency histograms and the optional Prometheus endpoint.
+
+Histograms keep a count per bucket (upper bounds in seconds), so memory does
+not grow with traffic; quantiles are interpolated inside the bucket they fall
+in, which is accurate enough to spot regressions. Modules that collect metrics
+register an exporter returning Prometheus text lines; METRICS_PORT serves all
+of them on /metrics for scraping.
+"""
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional
+
+from bot.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; the last bucket is +Inf
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Bucketed distribution of observed values (not thread-safe; callers lock)"""
+
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, bounds: Iterable[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'avg': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'max': self.max,
+        }
+
+    def prometheus(self, name: str, labels: str) -> List[str]:
+        """Lines for a Prometheus histogram; `labels` is e.g. 'method="sendMessage"'"""
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.bounds, self.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+_exporters: List[Callable[[], List[str]]] = []
+
+
+def register_exporter(exporter: Callable[[], List[str]]):
+    """Add a function returning Prometheus text lines to the /metrics endpoint"""
+    if exporter not in _exporters:
+        _exporters.append(exporter)
+
+
+def prometheus_text() -> str:
+    lines = []
+    for exporter in list(_exporters):
+        try:
+            lines.extend(exporter())
+        except Exception as e:
+            logger.error(f"Metrics exporter {exporter} failed: {e}")
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Serves prometheus_text() on GET /metrics"""
+
+    def __init__(self, listen: str, port: int):
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug("metrics: " + format % args)
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((listen, port), Handler)
+        self._server.daemon_threads = True
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def start_metrics_server() -> Optional[MetricsServer]:
+    """Start the Prometheus endpoint when METRICS_PORT is set; None otherwise or on failure"""
+    if not Config.METRICS_PORT:
+        return None
+    try:
+        server = MetricsServer(Config.METRICS_LISTEN, Config.METRICS_PORT)
+        server.start()
+    except OSError as e:
+        logger.error(f"Cannot start metrics endpoint on {Config.METRICS_LISTEN}:{Config.METRICS_PORT}: {e}")
+        return None
+    logger.info(f"Prometheus metrics on http://{Config.METRICS_LISTEN}:{server.port}/metrics")
+    return server
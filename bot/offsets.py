@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from telegram import Update
+from telegram.ext import CallbackContext, Dispatcher, DispatcherHandlerStop, TypeHandler
+
+from bot.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Completed update ids above the watermark kept in the state file
+MAX_DONE_IDS = 200
+
+
+class UpdateTracker:
+    """Tracks which updates were fully handled and persists the result.
+
+    An update is begun when the dispatcher picks it up and completed once its
+    handler and any pool task it queued have finished. The persisted offset
+    is the highest update_id below which every update has completed; ids that
+    finished out of order above it are stored too, so after a restart the bot
+    resumes from the offset without handling any update twice.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.offset = 0
+        self._done = set()
+        self._refs: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_flush = 0.0
+        self.skipped = 0
+
+    def load(self) -> int:
+        """Read the state file; returns the persisted offset (0 if none)"""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+            self.offset = int(state.get('offset', 0))
+            self._done = {int(i) for i in state.get('done', []) if int(i) > self.offset}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable update offset file {self.path}: {e}")
+        return self.offset
+
+    def begin(self, update_id: int) -> bool:
+        """Start tracking an update; False if it was already handled"""
+        with self._lock:
+            if update_id <= self.offset or update_id in self._done or update_id in self._refs:
+                self.skipped += 1
+                return False
+            self._refs[update_id] = 1
+            return True
+
+    def retain(self, update_id: int):
+        with self._lock:
+            if update_id in self._refs:
+                self._refs[update_id] += 1
+
+    def release(self, update_id: int):
+        with self._lock:
+            refs = self._refs.get(update_id)
+            if refs is None:
+                return
+            if refs > 1:
+                self._refs[update_id] = refs - 1
+                return
+            del self._refs[update_id]
+            self._done.add(update_id)
+            # Everything below the oldest in-flight update has completed
+            limit = min(self._refs) - 1 if self._refs else max(self._done)
+            for uid in [u for u in self._done if u <= limit]:
+                self._done.discard(uid)
+                self.offset = max(self.offset, uid)
+            self._dirty = True
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._refs)
+
+    def flush(self):
+        """Atomically write the state file if anything changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            state = {'offset': self.offset, 'done': sorted(self._done)[-MAX_DONE_IDS:]}
+            self._dirty = False
+            self._last_flush = time.monotonic()
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.error(f"Failed to persist update offset: {e}")
+            with self._lock:
+                self._dirty = True
+
+    def install(self, dp: Dispatcher):
+        """Hook into the dispatcher: skip handled updates, release after all groups ran"""
+        def on_begin(update: Update, context: CallbackContext):
+            if not self.begin(update.update_id):
+                raise DispatcherHandlerStop()
+
+        def on_end(update: Update, context: CallbackContext):
+            self.release(update.update_id)
+
+        dp.add_handler(TypeHandler(Update, on_begin), group=-100)
+        dp.add_handler(TypeHandler(Update, on_end), group=100)
+
+
+_tracker: Optional[UpdateTracker] = None
+
+
+def get_tracker() -> UpdateTracker:
+    global _tracker
+    if _tracker is None:
+        _tracker = UpdateTracker(Config.UPDATE_OFFSET_FILE)
+        _tracker.load()
+    return _tracker
@@ -0,0 +1,264 @@
+"""Outbound message queue that stays inside Telegram's flood limits.
+
+Background senders (sudo output, torrent and download notifications, chunked
+command output) hand their messages to the outbox instead of calling the Bot
+API directly. A few sender threads deliver them while respecting:
+
+- a global token bucket (OUTBOX_GLOBAL_RATE messages per second, ~30 allowed)
+- a minimum gap per chat (OUTBOX_CHAT_INTERVAL for private chats,
+  OUTBOX_GROUP_INTERVAL for groups, which Telegram caps at 20 per minute)
+- `retry_after` from a 429: the chat is paused that long and the message is
+  retried first, so order is kept
+
+Messages for one chat are sent in order, one at a time. Consecutive plain
+text messages waiting for the same chat are merged into one (same parse_mode,
+no keyboard, up to 4096 characters), so a burst of small updates becomes a
+single API call once the chat's turn comes.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+from telegram.error import BadRequest, RetryAfter
+
+from bot.config import Config
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+
+
+class _Item:
+    __slots__ = ('chat_id', 'fn', 'args', 'kwargs', 'bot', 'text', 'parse_mode', 'future', 'queued_at')
+
+    def __init__(self, chat_id, fn=None, args=(), kwargs=None, bot=None, text=None, parse_mode=None):
+        self.chat_id = chat_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.bot = bot
+        self.text = text  # set for send_message items; merged when there are no kwargs
+        self.parse_mode = parse_mode
+        self.future = Future()
+        self.queued_at = time.monotonic()
+
+    def mergeable(self) -> bool:
+        return self.text is not None and not self.kwargs
+
+    def mergeable_with(self, other: '_Item', length: int, limit: int) -> bool:
+        return (other.mergeable() and other.bot is self.bot and other.parse_mode == self.parse_mode
+                and length + 1 + len(other.text) <= limit)
+
+
+class Outbox:
+    """Rate-limited, per-chat ordered sender for Bot API calls"""
+
+    def __init__(self, global_rate: float = 30.0, chat_interval: float = 1.0, group_interval: float = 3.0,
+                 workers: int = 4, max_length: int = MAX_MESSAGE_LENGTH):
+        self.rate = max(float(global_rate), 1e-6)
+        self.capacity = max(self.rate, 1.0)
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.workers = max(1, workers)
+        self.max_length = max_length
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._chats: Dict[int, deque] = {}
+        self._next_at: Dict[int, float] = {}
+        self._sending = set()
+        self._threads = []
+        self.sent = 0        # API calls made
+        self.delivered = 0   # queued items completed (merged items count once each)
+        self.coalesced = 0   # items folded into another message
+        self.retry_after = 0
+        self.errors = 0
+        self._waits = deque(maxlen=500)
+        self._max_wait = 0.0
+
+    def start(self):
+        with self._cond:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._work, name=f"outbox-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    # -- queueing ---------------------------------------------------------
+
+    def send_message(self, bot, chat_id: int, text: str, parse_mode: Optional[str] = None, **kwargs) -> Future:
+        """Queue bot.send_message; the Future resolves to the sent Message.
+
+        Messages with extra options (keyboards, replies) are never merged.
+        """
+        return self._put(_Item(chat_id, kwargs=kwargs, bot=bot, text=text, parse_mode=parse_mode))
+
+    def call(self, chat_id: int, fn: Callable, /, *args, **kwargs) -> Future:
+        """Queue any other Bot API call for chat_id (edits, documents); never merged.
+        fn may take chat_id as a keyword too, e.g. call(chat_id, bot.send_document, chat_id=chat_id, ...)"""
+        return self._put(_Item(chat_id, fn, args, kwargs))
+
+    def _put(self, item: _Item) -> Future:
+        with self._cond:
+            self._chats.setdefault(item.chat_id, deque()).append(item)
+            self._cond.notify()
+        return item.future
+
+    # -- sending ----------------------------------------------------------
+
+    def _interval(self, chat_id: int) -> float:
+        return self.group_interval if chat_id is not None and chat_id < 0 else self.chat_interval
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _next_batch(self):
+        """With the condition held: pop the next sendable batch, or return the seconds to wait"""
+        now = time.monotonic()
+        self._refill(now)
+        best, wait = None, None
+        for chat_id, items in self._chats.items():
+            if chat_id in self._sending:
+                continue
+            ready_at = self._next_at.get(chat_id, 0.0)
+            if ready_at > now:
+                wait = ready_at - now if wait is None else min(wait, ready_at - now)
+            elif best is None or items[0].queued_at < self._chats[best][0].queued_at:
+                best = chat_id
+        if best is None:
+            return wait
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+
+        self._tokens -= 1
+        items = self._chats[best]
+        batch = [items.popleft()]
+        if batch[0].mergeable():
+            length = len(batch[0].text)
+            while items and batch[0].mergeable_with(items[0], length, self.max_length):
+                length += 1 + len(items[0].text)
+                batch.append(items.popleft())
+        if not items:
+            del self._chats[best]
+        self._sending.add(best)
+        return batch
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while True:
+                    batch = self._next_batch()
+                    if isinstance(batch, list):
+                        break
+                    self._cond.wait(batch)
+            self._send(batch)
+
+    def _send(self, batch):
+        head = batch[0]
+        chat_id = head.chat_id
+        started = time.monotonic()
+        result, error, retry = None, None, None
+        try:
+            if head.text is not None:
+                text = '\n'.join(item.text for item in batch)
+                try:
+                    result = head.bot.send_message(chat_id=chat_id, text=text, parse_mode=head.parse_mode,
+                                                   **head.kwargs)
+                except BadRequest:
+                    if head.parse_mode is None:
+                        raise
+                    # Markup rejected (sometimes only after merging): deliver it as plain text
+                    result = head.bot.send_message(chat_id=chat_id, text=text, **head.kwargs)
+            else:
+                result = head.fn(*head.args, **head.kwargs)
+        except RetryAfter as e:
+            retry = float(e.retry_after)
+        except Exception as e:
+            error = e
+
+        with self._cond:
+            self._sending.discard(chat_id)
+            if retry is not None:
+                # Flood control: pause the chat and retry the same items first
+                self.retry_after += 1
+                self._chats.setdefault(chat_id, deque()).extendleft(reversed(batch))
+                self._next_at[chat_id] = time.monotonic() + retry
+                logger.warning(f"Flood control for chat {chat_id}: retrying in {retry:.0f}s")
+            else:
+                self.sent += 1
+                self.delivered += len(batch)
+                self.coalesced += len(batch) - 1
+                if error is not None:
+                    self.errors += 1
+                for item in batch:
+                    wait = started - item.queued_at
+                    self._waits.append(wait)
+                    self._max_wait = max(self._max_wait, wait)
+                self._next_at[chat_id] = time.monotonic() + self._interval(chat_id)
+                if chat_id not in self._chats:
+                    # Forget idle chats once their interval is over
+                    for idle in [c for c, t in self._next_at.items() if t < started and c not in self._chats]:
+                        del self._next_at[idle]
+            self._cond.notify_all()
+
+        if retry is None:
+            for item in batch:
+                if error is not None:
+                    item.future.set_exception(error)
+                else:
+                    item.future.set_result(result)
+            if error is not None:
+                logger.error(f"Outbox send to chat {chat_id} failed: {error}")
+
+    def drain(self, timeout: float) -> bool:
+        """Wait until every queued message was handed to Telegram; False on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._chats or self._sending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def stats(self) -> Dict[str, float]:
+        """Queue depth, throughput counters and queue latency (seconds)"""
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                'depth': sum(len(items) for items in self._chats.values()),
+                'chats': len(self._chats),
+                'sent': self.sent,
+                'delivered': self.delivered,
+                'coalesced': self.coalesced,
+                'retry_after': self.retry_after,
+                'errors': self.errors,
+                'p50_wait': waits[len(waits) // 2] if waits else 0.0,
+                'p95_wait': waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+                'max_wait': self._max_wait,
+            }
+
+
+_outbox: Optional[Outbox] = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox() -> Outbox:
+    """Return the process-wide outbox configured from Config.OUTBOX_*"""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = Outbox(global_rate=Config.OUTBOX_GLOBAL_RATE, chat_interval=Config.OUTBOX_CHAT_INTERVAL,
+                             group_interval=Config.OUTBOX_GROUP_INTERVAL, workers=Config.OUTBOX_WORKERS)
+            _outbox.start()
+        return _outbox
+
+
+def send_message(bot, chat_id: int, text: str, parse_mode: Optional[str] = None, **kwargs) -> Future:
+    """Queue a message on the process-wide outbox"""
+    return get_outbox().send_message(bot, chat_id, text, parse_mode, **kwargs)
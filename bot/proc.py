@@ -0,0 +1,215 @@
+"""Shared subprocess engine for commands that run programs.
+
+Process starts the child in its own session and reads stdout and stderr
+through one selector, so neither pipe can fill up and block the child while
+the other is being waited on, and no reader threads are needed. Output is
+decoded incrementally (UTF-8, invalid bytes replaced) and handed to
+`on_output` in batches: when FLUSH_BYTES characters are pending or
+FLUSH_INTERVAL seconds passed since the last batch, whichever comes first.
+
+A timeout kills the whole process group with SIGKILL; terminate() sends
+SIGTERM to the group and SIGKILL after `kill_grace` seconds. The waiting is
+counted as the subprocess phase in /metrics.
+
+run(), check_output() and check_call() are the short forms for commands that
+just need the result; they raise subprocess.CalledProcessError and
+subprocess.TimeoutExpired like the subprocess functions they replace.
+"""
+import codecs
+import os
+import selectors
+import signal
+import subprocess
+import threading
+import time
+from typing import Callable, List, Optional
+
+from bot import command_metrics
+
+FLUSH_INTERVAL = 0.5
+FLUSH_BYTES = 4096
+KILL_GRACE = 3.0
+
+# Longest sleep in the read loop, so terminate() is noticed quickly
+_TICK = 0.25
+
+
+class Result:
+    __slots__ = ('args', 'returncode', 'stdout', 'stderr', 'output', 'timed_out', 'terminated', 'duration')
+
+    def __init__(self, args, returncode: int, stdout: str, stderr: str, output: str, timed_out: bool,
+                 terminated: bool, duration: float):
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.output = output  # stdout and stderr interleaved in arrival order
+        self.timed_out = timed_out
+        self.terminated = terminated
+        self.duration = duration
+
+
+class Process:
+    """One child process whose stdout and stderr are read through a selector"""
+
+    def __init__(self, args, shell: bool = False, cwd: Optional[str] = None, env: Optional[dict] = None,
+                 timeout: Optional[float] = None, preexec_fn: Optional[Callable[[], None]] = None,
+                 on_output: Optional[Callable[[str], None]] = None, flush_interval: float = FLUSH_INTERVAL,
+                 flush_bytes: int = FLUSH_BYTES, capture: bool = True, kill_grace: float = KILL_GRACE):
+        self.args = args
+        self.shell = shell
+        self.cwd = cwd
+        self.env = env
+        self.timeout = timeout
+        self.preexec_fn = preexec_fn
+        self.on_output = on_output
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.capture = capture
+        self.kill_grace = kill_grace
+        self.popen: Optional[subprocess.Popen] = None
+        self._terminate = threading.Event()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.popen.pid if self.popen is not None else None
+
+    def start(self) -> 'Process':
+        self.popen = subprocess.Popen(self.args, shell=self.shell, cwd=self.cwd, env=self.env,
+                                      stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                      bufsize=0, start_new_session=True, preexec_fn=self.preexec_fn)
+        return self
+
+    def terminate(self):
+        """Ask the process group to stop (SIGTERM, SIGKILL after kill_grace); safe from any thread"""
+        self._terminate.set()
+
+    def _signal(self, sig: int):
+        try:
+            os.killpg(self.popen.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def run(self) -> Result:
+        """Start if needed, pump output until the pipes close and the process exits"""
+        if self.popen is None:
+            self.start()
+        with command_metrics.phase('subprocess'):
+            return self._pump()
+
+    def _pump(self) -> Result:
+        started = time.monotonic()
+        deadline = started + self.timeout if self.timeout else None
+        selector = selectors.DefaultSelector()
+        decoders = {}
+        for name, stream in (('stdout', self.popen.stdout), ('stderr', self.popen.stderr)):
+            selector.register(stream, selectors.EVENT_READ, name)
+            decoders[name] = codecs.getincrementaldecoder('utf-8')('replace')
+        captured = {'stdout': [], 'stderr': []}
+        combined: List[str] = []
+        pending: List[str] = []
+        pending_size = 0
+        last_flush = started
+        timed_out = False
+        terminated_at = None
+        killed = False
+
+        def take(name: str, text: str):
+            nonlocal pending_size
+            if not text:
+                return
+            if self.capture:
+                captured[name].append(text)
+                combined.append(text)
+            if self.on_output is not None:
+                pending.append(text)
+                pending_size += len(text)
+
+        def flush(now: float):
+            nonlocal pending_size, last_flush
+            last_flush = now
+            if pending:
+                text = ''.join(pending)
+                pending.clear()
+                pending_size = 0
+                self.on_output(text)
+
+        def enforce(now: float):
+            # Timeout and terminate() both end in SIGKILL for the whole group
+            nonlocal timed_out, terminated_at, killed
+            if killed:
+                return
+            if deadline is not None and now >= deadline:
+                timed_out = True
+                killed = True
+                self._signal(signal.SIGKILL)
+            elif self._terminate.is_set():
+                if terminated_at is None:
+                    terminated_at = now
+                    self._signal(signal.SIGTERM)
+                elif now - terminated_at >= self.kill_grace:
+                    killed = True
+                    self._signal(signal.SIGKILL)
+
+        try:
+            while selector.get_map():
+                now = time.monotonic()
+                wait = _TICK
+                if deadline is not None:
+                    wait = min(wait, max(0.0, deadline - now))
+                if pending:
+                    wait = min(wait, max(0.0, last_flush + self.flush_interval - now))
+                for key, _ in selector.select(wait):
+                    data = os.read(key.fileobj.fileno(), 65536)
+                    if data:
+                        take(key.data, decoders[key.data].decode(data))
+                    else:
+                        take(key.data, decoders[key.data].decode(b'', final=True))
+                        selector.unregister(key.fileobj)
+                        key.fileobj.close()
+                now = time.monotonic()
+                if pending and (pending_size >= self.flush_bytes or now - last_flush >= self.flush_interval):
+                    flush(now)
+                enforce(now)
+            # Pipes are closed; the process may still be exiting
+            while True:
+                try:
+                    returncode = self.popen.wait(_TICK)
+                    break
+                except subprocess.TimeoutExpired:
+                    enforce(time.monotonic())
+        finally:
+            selector.close()
+            if self.popen.poll() is None:
+                # Left early (on_output raised): do not leave the group running
+                self._signal(signal.SIGKILL)
+                self.popen.wait()
+            for stream in (self.popen.stdout, self.popen.stderr):
+                if not stream.closed:
+                    stream.close()
+        flush(time.monotonic())
+        return Result(self.args, returncode, ''.join(captured['stdout']), ''.join(captured['stderr']),
+                      ''.join(combined), timed_out, terminated_at is not None and not timed_out,
+                      time.monotonic() - started)
+
+
+def run(args, shell: bool = False, cwd: Optional[str] = None, timeout: Optional[float] = None,
+        **kwargs) -> Result:
+    """Run to completion and return the Result (never raises for a non-zero exit)"""
+    return Process(args, shell=shell, cwd=cwd, timeout=timeout, **kwargs).run()
+
+
+def check_output(args, cwd: Optional[str] = None, timeout: Optional[float] = None, merge: bool = False,
+                 shell: bool = False) -> str:
+    """stdout of a successful run (stdout and stderr interleaved with `merge`)"""
+    result = run(args, shell=shell, cwd=cwd, timeout=timeout)
+    output = result.output if merge else result.stdout
+    if result.timed_out:
+        raise subprocess.TimeoutExpired(args, timeout, output=output, stderr=result.stderr)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, args, output=output, stderr=result.stderr)
+    return output
+
+
+def check_call(args, cwd: Optional[str] = None, timeout: Optional[float] = None, shell: bool = False):
+    check_output(args, cwd=cwd, timeout=timeout, shell=shell)
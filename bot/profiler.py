@@ -0,0 +1,122 @@
+"""In-process profilers for the running bot (/profile, /memprofile).
+
+sample_stacks() is a sampling profiler: a thread wakes every
+PROFILE_SAMPLE_INTERVAL seconds, reads the current frame of every other
+thread (dispatch workers, the torrent worker, download monitors, the
+telegram dispatcher) and counts identical stacks. Handlers are not traced,
+so the overhead is one stack walk per thread per sample. The result is in
+the collapsed format used by flamegraph.pl, speedscope and inferno: one line
+per stack, `thread;outer;...;inner count`.
+
+trace_allocations() runs tracemalloc for a window and reports the lines that
+allocated the most memory during it, plus the largest live allocations.
+"""
+import linecache
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from bot.config import Config
+
+# Only one profiler runs at a time; both slow the bot down a little
+_busy = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Another /profile or /memprofile is still running"""
+
+
+def _label(code) -> str:
+    path = code.co_filename
+    if path.startswith(Config.BASE_DIR):
+        path = os.path.relpath(path, Config.BASE_DIR)
+    else:
+        path = os.path.basename(path)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+def _collapse(frame) -> List[str]:
+    stack = []
+    while frame is not None:
+        stack.append(_label(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def sample_stacks(seconds: float, interval: float = None) -> Tuple[Counter, int]:
+    """Sample every thread for `seconds`; returns (collapsed stack -> count, samples taken)"""
+    interval = Config.PROFILE_SAMPLE_INTERVAL if interval is None else interval
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy()
+    try:
+        me = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                thread = names.get(ident, f"thread-{ident}").replace(';', ':').replace(' ', '_')
+                stacks[';'.join([thread] + _collapse(frame))] += 1
+            samples += 1
+            time.sleep(interval)
+        return stacks, samples
+    finally:
+        _busy.release()
+
+
+def format_collapsed(stacks: Counter) -> str:
+    return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def top_functions(stacks: Counter, limit: int = 10) -> List[Tuple[str, int]]:
+    """Innermost frames by sample count (idle threads show up in wait/select)"""
+    counts: Dict[str, int] = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')
+        if len(frames) > 1:
+            counts[frames[-1]] += count
+    return counts.most_common(limit)
+
+
+def trace_allocations(seconds: float, limit: int = 30) -> str:
+    """Trace allocations for `seconds` and return a text report"""
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy()
+    started_here = not tracemalloc.is_tracing()
+    try:
+        if started_here:
+            tracemalloc.start(Config.PROFILE_TRACEMALLOC_FRAMES)
+        before = tracemalloc.take_snapshot()
+        time.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+        _busy.release()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, '<frozen *>')]
+    before, after = before.filter_traces(filters), after.filter_traces(filters)
+    lines = [f"tracemalloc {seconds:.0f}s window, traced now {current / 1024:.0f} KiB, peak {peak / 1024:.0f} KiB",
+             "", f"Top {limit} lines by growth during the window:"]
+    for stat in after.compare_to(before, 'lineno')[:limit]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  "
+                     f"{frame.filename}:{frame.lineno}  {linecache.getline(frame.filename, frame.lineno).strip()}")
+    lines += ["", f"Top {limit} lines by live size at the end:"]
+    for stat in after.statistics('lineno')[:limit]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {frame.filename}:{frame.lineno}")
+    lines += ["", "Largest growth by traceback:"]
+    for stat in after.compare_to(before, 'traceback')[:5]:
+        lines.append(f"{stat.size_diff / 1024:+.1f} KiB")
+        lines.extend("    " + line for line in stat.traceback.format())
+    return '\n'.join(lines) + '\n'
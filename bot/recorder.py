@@ -0,0 +1,225 @@
+"""Anonymised recording of the incoming update stream (RECORD_UPDATES).
+
+Every update the dispatcher receives is written, with its arrival time, to
+RECORD_DIR/updates-<time>.jsonl.gz so production load can be replayed
+locally with bench/replay.py. Nothing identifying leaves the server:
+
+- user and chat ids are replaced by keyed hashes; the key is random per
+  recording and never written, so ids map consistently within one file
+  (private chat == user, the owner stays the owner) but cannot be reversed
+- names, usernames, phone numbers and file ids are dropped, also from
+  text_mention entities; only the fields the handlers read are kept (text,
+  entities, callback data, document name and size, reply structure)
+- bot tokens, Gemini keys, URL credentials and /ai_api arguments in texts
+  are replaced with <redacted>
+
+The first line is a header with the pseudonymised owner, users and
+superusers so the replay can rebuild user.csv. Lines are buffered and
+appended as separate gzip members, so a crash loses at most the last second
+and the file stays readable. Recording stops at RECORD_MAX_MB.
+"""
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from typing import List, Optional
+
+from telegram import Update
+from telegram.ext import CallbackContext, Dispatcher, TypeHandler
+
+from bot.config import Config
+
+logger = logging.getLogger(__name__)
+
+REDACTED = '<redacted>'
+_SECRETS = (
+    re.compile(r'\b\d{6,12}:[A-Za-z0-9_-]{30,}'),  # Telegram bot token
+    re.compile(r'\bAIza[0-9A-Za-z_-]{30,}'),  # Google API key
+    re.compile(r'(?<=://)[^/\s:@]+:[^/\s@]+(?=@)'),  # user:password@ in URLs
+    re.compile(r'(?i)(?<=/ai_api )\S+|(?<=/ai-api )\S+'),  # /ai_api <key>
+)
+
+_MESSAGE_FIELDS = ('message_id', 'date', 'text', 'caption')
+_ENTITY_FIELDS = ('type', 'offset', 'length', 'url', 'language')
+_DOCUMENT_FIELDS = ('file_name', 'file_size', 'mime_type')
+
+
+def redact(text: str) -> str:
+    for pattern in _SECRETS:
+        text = pattern.sub(REDACTED, text)
+    return text
+
+
+class Anonymiser:
+    """Maps ids to stable pseudonyms with a per-instance secret key"""
+
+    def __init__(self, key: bytes = None):
+        self._key = key or secrets.token_bytes(32)
+
+    def id(self, value: int) -> int:
+        digest = hmac.new(self._key, str(abs(value)).encode(), hashlib.sha256).digest()
+        pseudonym = 10 ** 9 + int.from_bytes(digest[:4], 'big') % 10 ** 9
+        return -pseudonym if value < 0 else pseudonym
+
+    def _user(self, user: dict) -> dict:
+        return {'id': self.id(user['id']), 'is_bot': user.get('is_bot', False), 'first_name': 'user'}
+
+    def _chat(self, chat: dict) -> dict:
+        return {'id': self.id(chat['id']), 'type': chat.get('type', 'private')}
+
+    def _entity(self, entity: dict) -> dict:
+        # text_mention entities carry the mentioned user in full
+        out = {k: entity[k] for k in _ENTITY_FIELDS if k in entity}
+        if 'url' in out:
+            out['url'] = redact(out['url'])
+        if 'user' in entity:
+            out['user'] = self._user(entity['user'])
+        return out
+
+    def message(self, message: dict) -> dict:
+        out = {k: message[k] for k in _MESSAGE_FIELDS if k in message}
+        for k in ('text', 'caption'):
+            if k in out:
+                out[k] = redact(out[k])
+        for k in ('entities', 'caption_entities'):
+            if k in message:
+                out[k] = [self._entity(entity) for entity in message[k]]
+        out['chat'] = self._chat(message['chat'])
+        if 'from' in message:
+            out['from'] = self._user(message['from'])
+        if 'document' in message:
+            document = {k: message['document'][k] for k in _DOCUMENT_FIELDS if k in message['document']}
+            out['document'] = dict(document, file_id='recorded', file_unique_id='recorded')
+        if 'reply_to_message' in message:
+            out['reply_to_message'] = self.message(message['reply_to_message'])
+        return out
+
+    def update(self, update: dict) -> Optional[dict]:
+        """Minimal anonymised copy of a raw update; None for kinds the bot does not handle"""
+        out = {'update_id': update['update_id']}
+        if 'message' in update:
+            out['message'] = self.message(update['message'])
+        elif 'callback_query' in update:
+            query = update['callback_query']
+            out['callback_query'] = {'id': query['id'], 'chat_instance': 'recorded',
+                                     'from': self._user(query['from']), 'data': query.get('data')}
+            if 'message' in query:
+                out['callback_query']['message'] = self.message(query['message'])
+        else:
+            return None
+        return out
+
+
+class UpdateRecorder:
+    """Appends anonymised updates with their arrival offset to a gzip JSON-lines file"""
+
+    def __init__(self, path: str, max_bytes: int, flush_interval: float = 1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.anonymiser = Anonymiser()
+        self.recorded = 0
+        self.stopped = False
+        self._started = time.monotonic()
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+        self._written = 0
+        self._thread = None
+
+    def write_header(self, owner: Optional[int], users, superusers):
+        self._buffer.append(json.dumps({
+            'recording': 1,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'owner': self.anonymiser.id(owner) if owner is not None else None,
+            'users': sorted(self.anonymiser.id(u) for u in users),
+            'superusers': sorted(self.anonymiser.id(u) for u in superusers),
+        }, separators=(',', ':')))
+        self.flush()
+
+    def record(self, update: Update):
+        if self.stopped:
+            return
+        data = self.anonymiser.update(update.to_dict())
+        if data is None:
+            return
+        line = json.dumps({'t': round(time.monotonic() - self._started, 4), 'update': data},
+                          separators=(',', ':'), ensure_ascii=False)
+        with self._lock:
+            self._buffer.append(line)
+            self.recorded += 1
+
+    def flush(self):
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+        if not lines:
+            return
+        chunk = gzip.compress(('\n'.join(lines) + '\n').encode('utf-8'))
+        try:
+            with open(self.path, 'ab') as f:
+                f.write(chunk)
+        except OSError as e:
+            logger.error(f"Update recording stopped, cannot write {self.path}: {e}")
+            self.stopped = True
+            return
+        self._written += len(chunk)
+        if self._written >= self.max_bytes and not self.stopped:
+            logger.warning(f"Update recording reached {self.max_bytes // 2 ** 20} MB, stopped")
+            self.stopped = True
+
+    def _flush_loop(self):
+        while not self.stopped:
+            time.sleep(self.flush_interval)
+            self.flush()
+        self.flush()
+
+    def install(self, dp: Dispatcher):
+        """Record every update before any other handler group sees it"""
+        def on_update(update: Update, context: CallbackContext):
+            self.record(update)
+
+        dp.add_handler(TypeHandler(Update, on_update), group=-200)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._flush_loop, name='update-recorder', daemon=True)
+            self._thread.start()
+
+
+_recorder: Optional[UpdateRecorder] = None
+
+
+def start_recording(dp: Dispatcher) -> Optional[UpdateRecorder]:
+    """Install the recorder on dp when RECORD_UPDATES is set; None otherwise or on failure"""
+    global _recorder
+    if _recorder is not None:
+        # run_bot() retried with a new updater: keep writing to the same file
+        _recorder.install(dp)
+        return _recorder
+    if not Config.RECORD_UPDATES:
+        return None
+    from bot.identity import identity
+
+    path = os.path.join(Config.RECORD_DIR, f"updates-{time.strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+    try:
+        os.makedirs(Config.RECORD_DIR, exist_ok=True)
+    except OSError as e:
+        logger.error(f"Cannot record updates to {Config.RECORD_DIR}: {e}")
+        return None
+    recorder = UpdateRecorder(path, int(Config.RECORD_MAX_MB * 2 ** 20))
+    ident = identity()
+    recorder.write_header(ident.owner, ident.users, ident.superusers)
+    recorder.install(dp)
+    logger.info(f"Recording anonymised updates to {path}")
+    _recorder = recorder
+    return recorder
+
+
+def flush():
+    """Write buffered updates now (called before the process exits)"""
+    if _recorder is not None:
+        _recorder.flush()
+
@@ -0,0 +1,125 @@
+"""Declarative command registry.
+
+Every bot command is described once here: name, aliases, who may use it,
+its dispatch concurrency class and a short description. install() turns the
+table into telegram handlers; the implementing module is only imported when
+the command is first used, so startup does not pay for apscheduler, ntplib,
+psutil or the modules' import-time side effects. /help and the Telegram
+command menu are generated from the same table.
+"""
+import re
+from typing import Iterable, List, Tuple
+
+from telegram import BotCommand
+from telegram.ext import CallbackQueryHandler, CommandHandler, Dispatcher, Filters, MessageHandler
+
+from bot.dispatch import CommandDispatcher, INSTANT, IO, LONG, PRIVILEGED
+from bot.identity import USER, SUPERUSER, OWNER
+
+ROLE_LABELS = {SUPERUSER: 'superuser', OWNER: 'owner'}
+
+_COMMAND_NAME = re.compile(r'^[a-z0-9_]{1,32}$')
+
+
+class CommandSpec:
+    __slots__ = ('name', 'target', 'cls', 'roles', 'aliases', 'args', 'description')
+
+    def __init__(self, name: str, target: str, cls: str, description: str,
+                 roles: Tuple[str, ...] = (USER,), aliases: Tuple[str, ...] = (), args: str = ''):
+        self.name = name
+        self.target = target  # "package.module:function", imported on first use
+        self.cls = cls
+        self.roles = roles
+        self.aliases = aliases
+        self.args = args
+        self.description = description
+
+
+COMMANDS: List[CommandSpec] = [
+    CommandSpec('start', 'bot.commands.start:start', INSTANT, 'Menu utama dan tombol cepat'),
+    CommandSpec('help', 'bot.commands.help:help_command', INSTANT, 'Daftar perintah'),
+    CommandSpec('bash', 'bot.commands.bash:bash', LONG, 'Jalankan perintah shell non-interaktif', args='<perintah>'),
+    CommandSpec('jobs', 'bot.commands.jobs:jobs_command', INSTANT, 'Daftar job /bash dan /sudo'),
+    CommandSpec('kill', 'bot.commands.jobs:kill_command', INSTANT, 'Hentikan job', args='<id>'),
+    CommandSpec('output', 'bot.commands.jobs:output_command', INSTANT, 'Output job per halaman', args='<id> [halaman]'),
+    CommandSpec('sudo', 'bot.commands.sudo:sudo', PRIVILEGED, 'Jalankan perintah dengan hak khusus',
+                roles=(SUPERUSER,), args='<perintah>'),
+    CommandSpec('download', 'bot.commands.download:download', IO, 'Unduh file dari URL ke Downloads', args='<url>'),
+    CommandSpec('downloads', 'bot.commands.download:download_command', IO, 'Unduh via aria2c dengan progres', args='<url>'),
+    CommandSpec('download_status', 'bot.commands.download:download_status', INSTANT, 'Status download aktif'),
+    CommandSpec('uploads', 'bot.commands.uploads:uploads', IO, 'Simpan file kiriman atau ambil file dari server',
+                args='[/path/file]'),
+    CommandSpec('kirim', 'bot.commands.kirim:kirim', IO, 'Simpan file dari pesan yang dibalas'),
+    CommandSpec('torrent', 'bot.commands.torrent:torrent', IO, 'Tambah magnet/.torrent ke antrian', args='<magnet>'),
+    CommandSpec('torrent_status', 'bot.commands.torrent:torrent_status_cmd', IO, 'Status torrent dan antrian'),
+    CommandSpec('zero_tier_status', 'bot.commands.zerotier:zero_tier_status', IO, 'Status ZeroTier',
+                aliases=('zero-tier-status',)),
+    CommandSpec('git_info', 'bot.commands.git_info:git_info', IO, 'Info repository git'),
+    CommandSpec('ai', 'bot.commands.ai:ai_command', IO, 'Tanya AI onee-san (streaming)', args='<prompt>'),
+    CommandSpec('ai_api', 'bot.commands.ai:ai_api_command', INSTANT, 'Simpan API key Gemini', aliases=('ai-api',),
+                args='<key>'),
+    CommandSpec('ai_reset', 'bot.commands.ai:ai_reset_command', INSTANT, 'Hapus riwayat percakapan /ai'),
+    CommandSpec('ai_status', 'bot.commands.ai:ai_status_command', INSTANT, 'Status renderer AI'),
+    CommandSpec('jadwal', 'bot.commands.jadwal:jadwal', IO, 'Lihat jadwal hari ini atau semua'),
+    CommandSpec('upload_jadwal', 'bot.commands.jadwal:upload_jadwal', IO, 'Unggah jadwal.csv'),
+    CommandSpec('reminder_on', 'bot.commands.jadwal:reminder_on', INSTANT, 'Aktifkan pengingat jadwal'),
+    CommandSpec('reminder_off', 'bot.commands.jadwal:reminder_off', INSTANT, 'Matikan pengingat jadwal'),
+    CommandSpec('update', 'bot.commands.update:update', PRIVILEGED, 'Tarik update dari GitHub', roles=(OWNER,)),
+    CommandSpec('shutdown', 'bot.commands.shutdown:shutdown', PRIVILEGED, 'Matikan bot',
+                roles=(OWNER, SUPERUSER)),
+    CommandSpec('metrics', 'bot.commands.metrics:metrics_command', INSTANT, 'Latency perintah dan Bot API',
+                roles=(OWNER,), args='[json]'),
+    CommandSpec('profile', 'bot.commands.profile:profile_command', INSTANT, 'Sampling profiler semua thread',
+                roles=(OWNER,), args='[detik]'),
+    CommandSpec('memprofile', 'bot.commands.profile:memprofile_command', INSTANT, 'Alokasi memori (tracemalloc)',
+                roles=(OWNER,), args='[detik]'),
+]
+
+# Inline keyboard callbacks from /start
+START_CALLBACK = 'bot.commands.start:handle_start_callback'
+
+
+def install(dp: Dispatcher, dispatcher: CommandDispatcher, register=None, eager: bool = False):
+    """Add a handler per command (and alias) to dp; `register(name, callback)`
+    also receives every name. With `eager` all modules are imported now."""
+    for spec in COMMANDS:
+        callback = dispatcher.wrap(spec.name, spec.target, spec.cls)
+        if eager:
+            callback.resolve()
+        names = [spec.name] + [a for a in spec.aliases if _COMMAND_NAME.match(a)]
+        dp.add_handler(CommandHandler(names, callback))
+        for alias in spec.aliases:
+            if not _COMMAND_NAME.match(alias):
+                # Telegram only tags [a-z0-9_] as bot commands; match legacy forms by regex
+                dp.add_handler(MessageHandler(Filters.regex(rf'^/{re.escape(alias)}(\s|@|$)'), callback))
+        if register is not None:
+            for name in [spec.name] + list(spec.aliases):
+                register(name, callback)
+
+    # Status view samples CPU for a second, so callbacks run on the io pool
+    callback = dispatcher.wrap('start_callback', START_CALLBACK, IO)
+    if eager:
+        callback.resolve()
+    dp.add_handler(CallbackQueryHandler(callback))
+
+
+def visible_commands(roles: Iterable[str]) -> List[CommandSpec]:
+    """Commands usable by someone holding `roles`"""
+    held = set(roles) | {USER}
+    return [spec for spec in COMMANDS if held.intersection(spec.roles)]
+
+
+def help_text(roles: Iterable[str] = (USER,)) -> str:
+    """Command list in the bot's markdown dialect"""
+    lines = ['**📖 Daftar Perintah**', '']
+    for spec in visible_commands(roles):
+        usage = f"/{spec.name}" + (f" {spec.args}" if spec.args else '')
+        restricted = [ROLE_LABELS[r] for r in spec.roles if r in ROLE_LABELS]
+        suffix = f" _({'/'.join(restricted)})_" if restricted else ''
+        lines.append(f"- `{usage}` — {spec.description}{suffix}")
+    return '\n'.join(lines)
+
+
+def bot_commands() -> List[BotCommand]:
+    """Commands for setMyCommands (the Telegram command menu)"""
+    return [BotCommand(spec.name, spec.description) for spec in COMMANDS if spec.roles == (USER,)]
@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+
+class RenderCache:
+    """Thread-safe LRU cache with a per-entry TTL, used for ai_render output.
+
+    Entries are evicted in least-recently-used order once `max_size` is reached
+    and are treated as missing once they are older than `ttl` seconds.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 3600.0):
+        self.max_size = max(0, int(max_size))
+        self.ttl = float(ttl)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[str]:
+        """Return the cached value for key or None if missing/expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at = entry
+            if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: Hashable) -> Optional[str]:
+        """Like get() but without touching LRU order or hit/miss counters"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (self.ttl > 0 and time.monotonic() - entry[1] > self.ttl):
+                return None
+            return entry[0]
+
+    def put(self, key: Hashable, value: str):
+        """Store value under key, evicting the oldest entries if needed"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False
+            return self.ttl <= 0 or time.monotonic() - entry[1] <= self.ttl
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Return counters for reporting (size, hits, misses, hit ratio)"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits / total) if total else 0.0,
+            }
@@ -0,0 +1,146 @@
+import hmac
+import json
+import logging
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from telegram import Update
+from telegram.ext import Updater
+
+from bot.config import Config
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+# Telegram updates are small; refuse anything bigger than this
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class WebhookServer:
+    """Embedded HTTP endpoint receiving Telegram updates.
+
+    Requests must carry the secret token given to setWebhook in the
+    X-Telegram-Bot-Api-Secret-Token header. Valid updates are decoded and put
+    on the updater's update_queue, where the dispatcher picks them up exactly
+    like polled updates. At most `max_connections` requests are handled at
+    once; Telegram is told the same limit.
+    """
+
+    def __init__(self, updater: Updater, listen: str, port: int, path: str,
+                 secret_token: str, max_connections: int = 40):
+        self.updater = updater
+        self.path = '/' + path.strip('/')
+        self.secret_token = secret_token
+        self.max_connections = max(1, max_connections)
+        self.received = 0
+        self.rejected = 0
+        self.errors = 0
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((listen, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                with server._slots:
+                    self._handle_update()
+
+            def _handle_update(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                token = self.headers.get(SECRET_HEADER, '')
+                if self.path != server.path or not hmac.compare_digest(token, server.secret_token):
+                    server._count('rejected')
+                    self._reply(403)
+                    return
+                if length <= 0 or length > MAX_BODY_BYTES:
+                    server._count('rejected')
+                    self._reply(413 if length > 0 else 400)
+                    return
+                try:
+                    data = json.loads(self.rfile.read(length))
+                    update = Update.de_json(data, server.updater.bot)
+                except Exception as e:
+                    logger.warning(f"Invalid webhook payload: {e}")
+                    server._count('errors')
+                    self._reply(400)
+                    return
+                server.updater.update_queue.put(update)
+                server._count('received')
+                self._reply(200)
+
+            def do_GET(self):
+                self._reply(405)
+
+            def _reply(self, status: int):
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        return Handler
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='webhook', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'received': self.received, 'rejected': self.rejected, 'errors': self.errors}
+
+
+def start_webhook(updater: Updater) -> Optional[WebhookServer]:
+    """Start the embedded webhook server and register it with Telegram.
+
+    Returns None (after cleaning up) when the server cannot bind or setWebhook
+    fails, so the caller can fall back to long polling.
+    """
+    secret = Config.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    url = Config.WEBHOOK_URL.rstrip('/') + '/' + Config.WEBHOOK_PATH.strip('/')
+    try:
+        server = WebhookServer(updater, Config.WEBHOOK_LISTEN, Config.PORT, Config.WEBHOOK_PATH,
+                               secret, Config.WEBHOOK_MAX_CONNECTIONS)
+    except OSError as e:
+        logger.error(f"Cannot listen on {Config.WEBHOOK_LISTEN}:{Config.PORT} for webhook: {e}")
+        return None
+
+    try:
+        server.start()
+        updater.bot.set_webhook(url=url, secret_token=secret, max_connections=Config.WEBHOOK_MAX_CONNECTIONS)
+    except Exception as e:
+        logger.error(f"setWebhook failed: {e}")
+        server.stop()
+        return None
+
+    # Same startup as Updater.start_polling, minus the polling thread
+    updater.running = True
+    updater.job_queue.start()
+    ready = threading.Event()
+    threading.Thread(target=updater.dispatcher.start, kwargs={'ready': ready}, name='dispatcher', daemon=True).start()
+    ready.wait()
+    logger.info(f"Receiving updates via webhook {url} (listening on port {server.port})")
+    return server
@@ -39,7 +39,11 @@ cd "$TMPDIR"
 rm -rf build dist *.spec || true
 
 echo "Running PyInstaller (onefile)..."
-$PYTHON -m PyInstaller --onefile --clean --noconfirm "$APP"
+# Command modules are imported lazily by bot/registry.py (by name), so PyInstaller
+# cannot see them through static analysis: bundle the whole package explicitly
+$PYTHON -m PyInstaller --onefile --clean --noconfirm \
+  --collect-submodules bot.commands \
+  "$APP"
 
 # Ensure output directory exists in original project
 mkdir -p "$OUT_DIR"
@@ -50,6 +54,11 @@ cp -v dist/* "$OUT_DIR/"
 
 echo "Build finished. Artifacts available in: $OUT_DIR"
 
+# Optional: compare cold start of the binary and the source tree (BENCH_STARTUP=1 ./build.sh)
+if [ "${BENCH_STARTUP:-0}" = "1" ]; then
+  (cd "$PROJECT_ROOT" && $PYTHON -m bench.startup --binary "$OUT_DIR/main")
+fi
+
 echo "Cleaning temporary build dir..."
 cd "$PROJECT_ROOT"
 rm -rf "$TMPDIR"
@@ -1,4 +1,11 @@
+import sys
+
 from bot.bot import main
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if '--startup-check' in sys.argv:
+        # Build the handlers and exit; bench/startup.py times this
+        from bot.command_handler import startup_check
+        startup_check(eager='--eager' in sys.argv)
+    else:
+        main()